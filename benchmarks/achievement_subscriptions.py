@@ -0,0 +1,58 @@
+"""Handlers evaluated per achievement check, with and without event subscriptions.
+
+The catalog has genre milestones for every genre plus a few count,
+comment and contrarian tiers, the way a large catalog grows. As in
+AchievementService the catalog is indexed once; each check selects the
+achievements subscribed to its event and evaluates them against one
+snapshot. The unfiltered run passes no event, which selects all of them.
+Usage: python -m benchmarks.achievement_subscriptions
+"""
+import itertools
+import time
+
+from model.AchievementORM import AchievementORM
+from model.DTOs.MovieDTO import MovieGenre
+from service.AchievementHandlers import HandlerRegistry, UserStatsSnapshot, rating_event
+
+TIERS = 200
+CHECKS = 200
+
+
+def build_catalog():
+    ids = itertools.count(1)
+    catalog = []
+    for tier in range(1, TIERS + 1):
+        for genre in MovieGenre:
+            catalog.append(AchievementORM(id=next(ids), condition_type="GENRE_MASTER",
+                                          condition_params={"genre": genre.value, "threshold": tier * 5}))
+        if tier % 10 == 0:
+            catalog.append(AchievementORM(id=next(ids), condition_type="COUNT_REVIEWS", condition_params={"threshold": tier * 5}))
+            catalog.append(AchievementORM(id=next(ids), condition_type="COMMENT_COUNT", condition_params={"threshold": tier * 5}))
+            catalog.append(AchievementORM(id=next(ids), condition_type="CONTRARIAN",
+                                          condition_params={"min_user_rating": 9, "max_movie_avg": tier / 40, "threshold": 1}))
+    return catalog
+
+
+def run(label: str, index, events) -> None:
+    snapshot = UserStatsSnapshot(1, 40, 10, {genre.value: 6 for genre in MovieGenre}, {})
+    evaluated = 0
+    started = time.perf_counter()
+    for event in itertools.islice(itertools.cycle(events), CHECKS):
+        pending = index.select(event)
+        evaluated += len(pending)
+        for achievement, handler in pending:
+            handler.evaluate(snapshot, achievement.condition_params, None)
+    elapsed = time.perf_counter() - started
+    print(f"{label:<12} handlers/check {evaluated / CHECKS:7.1f}  {elapsed / CHECKS * 1e6:8.1f} us/check")
+
+
+def main() -> None:
+    started = time.perf_counter()
+    index = HandlerRegistry.index(build_catalog())
+    print(f"{len(index)} achievements, indexed in {(time.perf_counter() - started) * 1000:.1f} ms")
+    run("every rule", index, [None])
+    run("subscribed", index, [rating_event(genre, commented=False) for genre in MovieGenre])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""Loads per cache expiry when many requests miss the same page at once.
+
+Each round expires one key and releases CALLERS threads on it together; the
+loader sleeps like a list query would. Prints CacheService.stats() for the
+plain read-through path, single flight, and single flight with a stale
+window, refreshed by the first caller inline or by a background worker as
+CacheRefresher does. Usage: python -m benchmarks.cache_stampede
+"""
+import threading
+import time
+
+from service.CacheService import CacheService
+
+CALLERS = 32
+ROUNDS = 20
+QUERY_SECONDS = 0.02
+
+
+class Config(dict):
+    def get(self, key, default=None):
+        return super().get(key, default)
+
+
+def run(label: str, background: bool = False, **config) -> None:
+    cache = CacheService(Config(cache_ttl_seconds=0.05, **config))
+    if background:
+        # Stands in for CacheRefresher, which needs the app's event loop
+        cache.schedule_refresh = lambda job: threading.Thread(target=job, args=(None,)).start() or True
+
+    def load():
+        time.sleep(QUERY_SECONDS)
+        return list(range(100))
+
+    latencies = []
+    started = time.perf_counter()
+    for _ in range(ROUNDS):
+        # Let the page go stale/expired, then have every caller ask for it at once
+        time.sleep(0.06)
+        barrier = threading.Barrier(CALLERS)
+
+        def request():
+            barrier.wait()
+            begin = time.perf_counter()
+            cache.get_or_load("movies_list__skip_0_limit_10", load, refresh=lambda db: load())
+            latencies.append(time.perf_counter() - begin)
+
+        threads = [threading.Thread(target=request) for _ in range(CALLERS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    elapsed = time.perf_counter() - started
+
+    stats = cache.stats()
+    latencies.sort()
+    p99 = latencies[int(len(latencies) * 0.99) - 1]
+    print(f"{label:<17} loads/expiry {stats['loads'] / ROUNDS:5.1f}  coalesced {stats['coalesced']:4}  "
+          f"stale {stats['stale_hits']:4}  p99 {p99 * 1000:5.1f} ms  total {elapsed:.2f} s")
+
+
+def main() -> None:
+    run("read-through", cache_single_flight=False)
+    run("single flight", cache_single_flight=True)
+    run("stale+inline", cache_single_flight=True, cache_stale_seconds=60)
+    run("stale+background", background=True, cache_single_flight=True, cache_stale_seconds=60)
+
+
+if __name__ == "__main__":
+    main()
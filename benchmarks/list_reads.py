@@ -0,0 +1,68 @@
+"""Per-row cost of the list read path: full ORM entities vs. column projection.
+
+Runs against an in-memory SQLite database by default, or against the URL given
+as the first argument. Usage: python -m benchmarks.list_reads [database_url]
+"""
+import sys
+import time
+
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import Session
+
+from db import Base
+from model.MovieORM import MovieORM
+from model.UserORM import UserORM  # noqa: F401 (user_ratings references users)
+from model.DTOs.MovieDTO import MovieGenre, MovieOut
+from repository.MovieRepository import MovieRepository
+
+ROWS = 5000
+PAGE_SIZE = 100
+ROUNDS = 20
+
+
+def seed(db: Session) -> None:
+    db.add_all([
+        MovieORM(title=f"Benchmark movie {i}", year=2000, genre=MovieGenre.DRAMA,
+                 description="A fairly long plot summary. " * 40, director="Someone")
+        for i in range(ROWS)
+    ])
+    db.commit()
+
+
+def orm_page(db: Session, skip: int):
+    # The previous read path: hydrate full entities, then validate from attributes
+    movies = db.query(MovieORM).order_by(MovieORM.id).offset(skip).limit(PAGE_SIZE).all()
+    return [MovieOut.model_validate(movie) for movie in movies]
+
+
+def projected_page(db: Session, skip: int):
+    rows = MovieRepository(db).get_paginated(skip, PAGE_SIZE)
+    return [MovieOut.model_validate(row) for row in rows]
+
+
+def measure(label: str, engine, read_page) -> None:
+    rows = 0
+    started = time.perf_counter()
+    for _ in range(ROUNDS):
+        # A fresh session per round, like a request, so the identity map starts empty
+        with Session(engine) as db:
+            for skip in range(0, ROWS, PAGE_SIZE):
+                rows += len(read_page(db, skip))
+    elapsed = time.perf_counter() - started
+    print(f"{label:<12} {rows} rows  {elapsed * 1e6 / rows:6.2f} us/row")
+
+
+def main() -> None:
+    url = sys.argv[1] if len(sys.argv) > 1 else "sqlite://"
+    engine = create_engine(url)
+    Base.metadata.create_all(engine)
+    with Session(engine) as db:
+        if db.scalar(select(MovieORM.id).limit(1)) is None:
+            seed(db)
+
+    measure("orm", engine, orm_page)
+    measure("projection", engine, projected_page)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""Cache hit latency of a list page: cached DTOs vs. cached encoded bytes.
+
+Both routes serve one page of PAGE_SIZE movies from a warm CacheService. The
+object route returns the DTO list through its response_model, so FastAPI
+validates and encodes it on every hit; the bytes route sends the cached body
+as is, gzipped when the client accepts it. Usage: python -m benchmarks.response_cache
+"""
+import statistics
+import time
+from typing import List
+
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+from model.DTOs.MovieDTO import MovieGenre, MovieOut
+from service.CacheService import CacheService
+from service.EncodedResponse import encode_body, encoded_response
+from service.MovieService import MOVIE_LIST
+
+PAGE_SIZE = 100
+REQUESTS = 2000
+
+
+class Config(dict):
+    def get(self, key, default=None):
+        return super().get(key, default)
+
+
+def build_app() -> FastAPI:
+    cache = CacheService(Config())
+    items = [
+        MovieOut(id=i, title=f"Benchmark movie {i}", year=2000, genre=MovieGenre.DRAMA, view_count=i,
+                 description="A fairly long plot summary. " * 10, director="Someone", average_rating=7.5)
+        for i in range(PAGE_SIZE)
+    ]
+    app = FastAPI()
+
+    @app.get("/objects", response_model=List[MovieOut])
+    def objects():
+        return cache.get_or_load("objects", lambda: items)
+
+    @app.get("/bytes")
+    def encoded(request: Request):
+        return encoded_response(cache.get_or_load("bytes", lambda: encode_body(items, MOVIE_LIST, 1024)), request)
+
+    return app
+
+
+def measure(client: TestClient, label: str, path: str, accept_encoding: str) -> None:
+    headers = {"Accept-Encoding": accept_encoding}
+    client.get(path, headers=headers)  # fill the cache
+    latencies = []
+    size = 0
+    for _ in range(REQUESTS):
+        begin = time.perf_counter()
+        response = client.get(path, headers=headers)
+        latencies.append(time.perf_counter() - begin)
+        size = response.num_bytes_downloaded
+    latencies.sort()
+    print(f"{label:<14} median {statistics.median(latencies) * 1e6:7.1f} us  "
+          f"p99 {latencies[int(len(latencies) * 0.99) - 1] * 1e6:7.1f} us  body {size:6} bytes")
+
+
+def main() -> None:
+    with TestClient(build_app()) as client:
+        measure(client, "objects", "/objects", "identity")
+        measure(client, "bytes", "/bytes", "identity")
+        measure(client, "bytes+gzip", "/bytes", "gzip")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,12 @@
+from fastapi import APIRouter, Depends
+
+from model.DTOs.CacheDTO import CacheStats
+from service.CacheService import CacheService
+from dependencies import get_cache_service
+
+router = APIRouter(tags=["Cache methods"])
+
+@router.get("/cache/stats", response_model=CacheStats)
+async def get_cache_stats(cache: CacheService = Depends(get_cache_service)):
+    # Counters are per worker process
+    return cache.stats()
@@ -1,56 +1,174 @@
-from typing import List, Optional
+from typing import List, Literal, Optional
 
-from fastapi import APIRouter, Depends, status
+from fastapi import APIRouter, Depends, Query, Request, Response, status
 from sqlalchemy.orm import Session
 
 from db import get_db
 from repository.MovieRepository import MovieRepository
-from service.MovieService import MovieService
-from model.DTOs.MovieDTO import MovieOut, MovieCreate, MovieUpdate, MovieGenre
-from dependencies import get_movie_service
+from service.MovieService import MOVIE_LIST, MovieService
+from model.DTOs.MovieDTO import (MovieOut, MovieCreate, MovieUpdate, MovieGenre, MovieFilter, MovieSort, SortOrder,
+                                 MovieSuggestion, RatingHistogram, BulkImportReport)
+from dependencies import get_async_movie_service, get_config_service
+from service.ConfigService import ConfigService
+from service.MovieImport import MovieImportParser
+from service.AsyncProxy import AsyncProxy
+from service.ConditionalGet import content_version, not_modified, validators
+from service.EncodedResponse import encoded_response
 
 
 router = APIRouter(tags=["Movie methods"])
 
+@router.get("/movies/search", response_model=List[MovieOut])
+async def search_movies(
+    response: Response,
+    q: str = Query(min_length=1, max_length=200),
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    service: AsyncProxy = Depends(get_async_movie_service)
+):
+    page = await service.search_movies(q, limit, cursor)
+    if page.next_cursor:
+        response.headers["X-Next-Cursor"] = page.next_cursor
+    return page.items
+
+
+@router.get("/movies/autocomplete", response_model=List[MovieSuggestion])
+async def autocomplete_movies(
+    prefix: str = Query(min_length=1, max_length=100),
+    limit: Optional[int] = Query(None, ge=1),
+    by: Literal["view_count", "average_rating"] = "view_count",
+    service: AsyncProxy = Depends(get_async_movie_service)
+):
+    return await service.autocomplete(prefix, limit, by)
+
+
+@router.get("/movies/top", response_model=List[MovieOut])
+async def get_top_movies(
+    by: Literal["average_rating", "view_count"] = "average_rating",
+    genre: Optional[MovieGenre] = None,
+    n: int = Query(10, ge=1),
+    service: AsyncProxy = Depends(get_async_movie_service)
+):
+    return await service.get_top_movies(by, genre, n)
+
+
 @router.get("/movies/{id}", response_model=MovieOut)
-async def get_movie(id: int, service: MovieService = Depends(get_movie_service)):
-    return service.get_movie(id)
+async def get_movie(
+    id: int,
+    request: Request,
+    response: Response,
+    service: AsyncProxy = Depends(get_async_movie_service),
+    config: ConfigService = Depends(get_config_service)
+):
+    # The version is read before the movie, so a 304 needs neither the movie nor its serialization
+    headers = validators(await service.get_movie_version(id), config, "/movies/{id}")
+    unchanged = not_modified(request, headers)
+    if unchanged is not None:
+        return unchanged
+    movie = await service.get_movie(id)
+    response.headers.update(headers)
+    return movie
 
 
 @router.get("/movies/{id}/rating", response_model=float)
-async def get_movie_rating(id: int, service: MovieService = Depends(get_movie_service)):
-    return service.get_movie_rating(id)
+async def get_movie_rating(id: int, service: AsyncProxy = Depends(get_async_movie_service)):
+    return await service.get_movie_rating(id)
+
+
+@router.get("/movies/{id}/rating/histogram", response_model=RatingHistogram)
+async def get_movie_rating_histogram(id: int, service: AsyncProxy = Depends(get_async_movie_service)):
+    return await service.get_rating_histogram(id)
 
 
 @router.post("/movies", response_model=MovieOut)
-async def create_movie(dto: MovieCreate, service: MovieService = Depends(get_movie_service)):
-    return service.create_movie(dto)
+async def create_movie(dto: MovieCreate, service: AsyncProxy = Depends(get_async_movie_service)):
+    return await service.create_movie(dto)
+
+
+@router.post("/movies/bulk", response_model=BulkImportReport)
+async def import_movies(
+    request: Request,
+    service: AsyncProxy = Depends(get_async_movie_service),
+    config: ConfigService = Depends(get_config_service)
+):
+    # The body is consumed as a stream and inserted chunk by chunk, so memory
+    # use does not depend on the size of the upload.
+    batch_size = config.get("bulk_import_batch_size", 1000)
+    parser = MovieImportParser(request.headers.get("content-type", ""))
+    report = BulkImportReport()
+    pending = []
+    async for chunk in request.stream():
+        pending.extend(parser.feed(chunk))
+        while len(pending) >= batch_size:
+            await service.import_movies(pending[:batch_size], report)
+            pending = pending[batch_size:]
+    pending.extend(parser.close())
+    if pending:
+        await service.import_movies(pending, report)
+    return await service.finish_import(report)
 
 
 @router.put("/movies/{id}", response_model=MovieOut)
-async def update_movie(id: int, dto: MovieUpdate, service: MovieService = Depends(get_movie_service)):
-    return service.update_movie(id, dto)
+async def update_movie(id: int, dto: MovieUpdate, service: AsyncProxy = Depends(get_async_movie_service)):
+    return await service.update_movie(id, dto)
 
 
 @router.delete("/movies/{id}")
-async def delete_movie(id: int, service: MovieService = Depends(get_movie_service)):
-    service.delete_movie(id)
+async def delete_movie(id: int, service: AsyncProxy = Depends(get_async_movie_service)):
+    await service.delete_movie(id)
+
+
+def movie_filters(
+    year_min: Optional[int] = None,
+    year_max: Optional[int] = None,
+    director: Optional[str] = None,
+    min_rating: Optional[float] = Query(None, ge=0, le=10),
+    duration_min: Optional[int] = Query(None, ge=0),
+    duration_max: Optional[int] = Query(None, ge=0),
+    sort: Optional[MovieSort] = None,
+    order: SortOrder = SortOrder.ASC
+) -> MovieFilter:
+    return MovieFilter(year_min=year_min, year_max=year_max, director=director, min_rating=min_rating,
+                       duration_min=duration_min, duration_max=duration_max, sort=sort, order=order)
 
 
 @router.get("/movies", response_model=List[MovieOut])
 async def get_movies(
+    response: Response,
+    request: Request,
     skip: int = 0,
     limit: Optional[int] = None,
     genre: Optional[MovieGenre] = None,
-    service: MovieService = Depends(get_movie_service)
+    cursor: Optional[str] = None,
+    filters: MovieFilter = Depends(movie_filters),
+    service: AsyncProxy = Depends(get_async_movie_service),
+    config: ConfigService = Depends(get_config_service)
 ):
-    return service.get_all_movies(skip, limit, genre)
+    if config.get("cache_encoded_responses", True):
+        # The cached bytes go out as they are, skipping response_model validation and encoding
+        encoded = await service.get_movies_page_encoded(skip, limit, genre, cursor, filters)
+        headers = validators(encoded.version, config, "/movies")
+        unchanged = not_modified(request, headers)
+        if unchanged is not None:
+            return unchanged
+        encoded_page = encoded_response(encoded, request)
+        encoded_page.headers.update(headers)
+        return encoded_page
+    page = await service.get_movies_page(skip, limit, genre, cursor, filters)
+    headers = validators(content_version(MOVIE_LIST.dump_json(page.items)), config, "/movies")
+    unchanged = not_modified(request, headers)
+    if unchanged is not None:
+        return unchanged
+    response.headers.update(headers)
+    if page.next_cursor:
+        response.headers["X-Next-Cursor"] = page.next_cursor
+    return page.items
 
 
 @router.delete("/movies")
-async def delete_movies(service: MovieService = Depends(get_movie_service)):
-    return  service.delete_all_movies()
+async def delete_movies(service: AsyncProxy = Depends(get_async_movie_service)):
+    return await service.delete_all_movies()
 
-# @router.post("/movies/{movie_id}/watch/{user_id}")
-# async def watch_movie(movie_id: int, user_id: int):
-#     return MovieService.watch_movie(movie_id, user_id)
\ No newline at end of file
+@router.post("/movies/{id}/watch", status_code=status.HTTP_202_ACCEPTED)
+async def watch_movie(id: int, service: AsyncProxy = Depends(get_async_movie_service)):
+    await service.watch_movie(id)
@@ -1,45 +1,74 @@
 import logging
-from fastapi import APIRouter
+from typing import Optional
+from fastapi import APIRouter, Request, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from db import get_db
 from fastapi import Depends
 
-from model.DTOs.UserDTO import UserCreate, UserOut, UserUpdate
+from model.DTOs.UserDTO import UserCreate, UserOut, UserUpdate, UserStatsOut
 from service.UserService import UserService
 from service.AchievementService import AchievementService
 from model.DTOs.AchievementDTO import UserAchievementOut, AchievementStatusOut
-from dependencies import get_user_service, get_achievement_service
+from dependencies import get_async_user_service, get_async_achievement_service, get_config_service
+from service.ConditionalGet import not_modified, validators
+from service.ConfigService import ConfigService
+from service.AsyncProxy import AsyncProxy
 
 router = APIRouter(tags=["User methods"])
 
+@router.get("/users/export")
+async def export_users(service: AsyncProxy = Depends(get_async_user_service)):
+    return StreamingResponse(service.export_users(), media_type="application/x-ndjson")
+
 @router.get("/users/{id}", response_model=UserOut)
-async def get_user(id: int, service: UserService = Depends(get_user_service)):
-    return service.get_user(id)
+async def get_user(id: int, service: AsyncProxy = Depends(get_async_user_service)):
+    return await service.get_user(id)
+
+@router.get("/users/{id}/stats", response_model=UserStatsOut)
+async def get_user_stats(id: int, service: AsyncProxy = Depends(get_async_user_service)):
+    return await service.get_user_stats(id)
 
 @router.post("/users", response_model=UserOut)
-async def create_user(dto: UserCreate, service: UserService = Depends(get_user_service)):
-    return service.create_user(dto)
+async def create_user(dto: UserCreate, service: AsyncProxy = Depends(get_async_user_service)):
+    return await service.create_user(dto)
 
 @router.put("/users/{id}", response_model=UserOut)
-async def update_user(id: int, dto: UserUpdate, service: UserService = Depends(get_user_service)):
-    return service.update_user(id, dto)
+async def update_user(id: int, dto: UserUpdate, service: AsyncProxy = Depends(get_async_user_service)):
+    return await service.update_user(id, dto)
 
 @router.delete("/users/{id}", response_model=None)
-async def delete_user(id: int, service: UserService = Depends(get_user_service)):
-    return service.delete_user(id)
+async def delete_user(id: int, service: AsyncProxy = Depends(get_async_user_service)):
+    return await service.delete_user(id)
 
 @router.get("/users", response_model=list[UserOut])
-async def get_users(service: UserService = Depends(get_user_service)) -> list[UserOut]:
-    return service.get_all_users()
+async def get_users(
+    skip: int = 0,
+    limit: Optional[int] = None,
+    service: AsyncProxy = Depends(get_async_user_service)
+) -> list[UserOut]:
+    return await service.get_all_users(skip, limit)
     
 @router.delete("/users", response_model=None)
-async def delete_all_users(service: UserService = Depends(get_user_service)) -> None:
-    service.delete_all_users()
+async def delete_all_users(service: AsyncProxy = Depends(get_async_user_service)) -> None:
+    await service.delete_all_users()
 
 @router.get("/users/{id}/achievements", response_model=list[UserAchievementOut])
-async def get_user_achievements(id: int, service: AchievementService = Depends(get_achievement_service)):
-    return service.get_user_achievements(id)
+async def get_user_achievements(id: int, service: AsyncProxy = Depends(get_async_achievement_service)):
+    return await service.get_user_achievements(id)
 
 @router.get("/users/{id}/achievements/status", response_model=list[AchievementStatusOut])
-async def get_achievements_status(id: int, service: AchievementService = Depends(get_achievement_service)):
-    return service.get_achievements_status(id)
+async def get_achievements_status(
+    id: int,
+    request: Request,
+    response: Response,
+    service: AsyncProxy = Depends(get_async_achievement_service),
+    config: ConfigService = Depends(get_config_service)
+):
+    headers = validators(await service.get_achievements_version(id), config, "/users/{id}/achievements/status")
+    unchanged = not_modified(request, headers)
+    if unchanged is not None:
+        return unchanged
+    achievements = await service.get_achievements_status(id)
+    response.headers.update(headers)
+    return achievements
@@ -1,10 +1,13 @@
-from typing import List
+from typing import List, Optional
 from fastapi import APIRouter, Depends
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from db import get_db
 
+from model.DTOs.MovieDTO import BulkImportReport
 from model.DTOs.UserRatingDTO import UserRatingCreate, UserRatingOut, UserRatingUpdate
-from dependencies import get_user_rating_service
+from dependencies import get_async_user_rating_service
+from service.AsyncProxy import AsyncProxy
 from service.UserRatingService import UserRatingService
 from service.AchievementService import AchievementService
 from repository.UserRatingRepository import UserRatingRepository
@@ -16,40 +19,55 @@ router = APIRouter(tags=["User Ratings methods"])
 @router.post("/userRating", response_model=UserRatingOut)
 async def create_userRating(
     dto: UserRatingCreate,
-    service: UserRatingService = Depends(get_user_rating_service)
+    service: AsyncProxy = Depends(get_async_user_rating_service)
 ):
-    return service.create_rating(dto)
+    return await service.create_rating(dto)
+
+@router.post("/userRating/bulk", response_model=BulkImportReport)
+async def create_userRatings_bulk(
+    dtos: List[UserRatingCreate],
+    service: AsyncProxy = Depends(get_async_user_rating_service)
+):
+    return await service.bulk_create_ratings(dtos)
+
+@router.get("/userRating/export")
+async def export_userRatings(
+    service: AsyncProxy = Depends(get_async_user_rating_service)
+):
+    return StreamingResponse(service.export_ratings(), media_type="application/x-ndjson")
 
 @router.get("/userRating/{id}", response_model=UserRatingOut)
 async def get_userRating(
     id: int,
-    service: UserRatingService = Depends(get_user_rating_service)
+    service: AsyncProxy = Depends(get_async_user_rating_service)
 ):
-    return service.get_rating(id)
+    return await service.get_rating(id)
 
 @router.put("/userRating/{id}", response_model=UserRatingOut)
 async def update_userRating(
     id: int,
     dto: UserRatingUpdate,
-    service: UserRatingService = Depends(get_user_rating_service)
+    service: AsyncProxy = Depends(get_async_user_rating_service)
 ):
-    return service.update_rating(id, dto)
+    return await service.update_rating(id, dto)
 
 @router.delete("/userRating/{id}")
 async def delete_userRating(
     id: int,
-    service: UserRatingService = Depends(get_user_rating_service)
+    service: AsyncProxy = Depends(get_async_user_rating_service)
 ):
-    service.delete_rating(id)
+    await service.delete_rating(id)
 
 @router.get("/userRating", response_model=List[UserRatingOut])
 async def get_userRatings(
-    service: UserRatingService = Depends(get_user_rating_service)
+    skip: int = 0,
+    limit: Optional[int] = None,
+    service: AsyncProxy = Depends(get_async_user_rating_service)
 ):
-    return service.get_all_ratings()
+    return await service.get_all_ratings(skip, limit)
 
 @router.delete("/userRating")
 async def delete_all_user_ratings(
-    service: UserRatingService = Depends(get_user_rating_service)
+    service: AsyncProxy = Depends(get_async_user_rating_service)
 ):
-    service.delete_all_ratings()
\ No newline at end of file
+    await service.delete_all_ratings()
\ No newline at end of file
@@ -1,17 +1,41 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.orm import sessionmaker, declarative_base
 from service.ConfigService import ConfigService
 
 config_service = ConfigService()
 DATABASE_URL = config_service.get("database_url")
+ASYNC_DB_ENABLED = config_service.get("async_db_enabled", False)
+ASYNC_DATABASE_URL = config_service.get("async_database_url", DATABASE_URL.replace("+psycopg2", "+asyncpg"))
 
 engine = create_engine(DATABASE_URL, pool_pre_ping=True)
 SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)
 Base = declarative_base()
 
+# The async engine is only created when the async path is switched on,
+# so the sync deployment does not need the async driver installed.
+async_engine = create_async_engine(ASYNC_DATABASE_URL, pool_pre_ping=True) if ASYNC_DB_ENABLED else None
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False)
+
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+get_session = get_async_db if ASYNC_DB_ENABLED else get_db
+
+def after_commit(db, callback):
+    """Runs callback once, after the session's current transaction commits.
+
+    Without a session (e.g. a service built on mocked repositories) it runs right away.
+    """
+    if db is None:
+        callback()
+        return
+    event.listen(db, "after_commit", lambda _session: callback(), once=True)
@@ -1,19 +1,52 @@
 from functools import lru_cache
+from typing import Union
 from fastapi import Depends
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from db import get_db
+from starlette.concurrency import run_in_threadpool
+from db import SessionLocal, get_session
 
+from service.AsyncProxy import AsyncProxy
 from service.ConfigService import ConfigService
 from service.CacheService import CacheService
+from service.CacheBackend import create_cache_backend
 from service.MovieService import MovieService
 from service.UserService import UserService
 from service.AchievementService import AchievementService
+from service.AchievementQueue import AchievementQueue
 from service.UserRatingService import UserRatingService
+from service.Leaderboards import Leaderboards
+from service.TitlePrefixIndex import TitlePrefixIndex
+from service.ViewCounterBuffer import ViewCounterBuffer
 
 from repository.MovieRepository import MovieRepository
 from repository.UserRepository import UserRepository
 from repository.UserRatingRepository import UserRatingRepository
 from repository.AchievementRepository import AchievementRepository
+from repository.UserStatsRepository import UserStatsRepository
+
+DbSession = Union[Session, AsyncSession]
+
+def _sync_session(db: DbSession) -> Session:
+    # Repositories are written against the sync API; on the async path they run
+    # on the AsyncSession's underlying Session inside run_sync.
+    return db.sync_session if isinstance(db, AsyncSession) else db
+
+async def get_unit_of_work(db: DbSession = Depends(get_session)):
+    # Repositories only flush; everything a request wrote is committed here in one
+    # transaction once the endpoint returns, or rolled back if it raised.
+    try:
+        yield db
+    except Exception:
+        if isinstance(db, AsyncSession):
+            await db.rollback()
+        else:
+            await run_in_threadpool(db.rollback)
+        raise
+    if isinstance(db, AsyncSession):
+        await db.commit()
+    else:
+        await run_in_threadpool(db.commit)
 
 # Config
 @lru_cache()
@@ -23,46 +56,125 @@ def get_config_service() -> ConfigService:
 # Cache
 @lru_cache()
 def get_cache_service(config: ConfigService = Depends(get_config_service)) -> CacheService:
-    return CacheService(config)
+    return CacheService(config, create_cache_backend(config))
+
+# View counter
+@lru_cache()
+def get_view_counter() -> ViewCounterBuffer:
+    config = get_config_service()
+    return ViewCounterBuffer(
+        shards=config.get("view_counter_shards", 16),
+        flush_threshold=config.get("view_flush_threshold", 1000)
+    )
+
+# Title autocomplete index, filled at startup by the app lifespan
+@lru_cache()
+def get_title_index() -> TitlePrefixIndex:
+    return TitlePrefixIndex()
+
+# Leaderboards, rebuilt at startup and periodically by the app lifespan
+@lru_cache()
+def get_leaderboards() -> Leaderboards:
+    return Leaderboards(size=get_config_service().get("leaderboard_size", 100))
+
+# Background achievement checks, started and stopped by the app lifespan
+@lru_cache()
+def get_achievement_queue() -> AchievementQueue:
+    config = get_config_service()
+    return AchievementQueue(
+        SessionLocal,
+        get_cache_service(config=config),
+        workers=config.get("achievement_queue_workers", 2),
+        dedupe_window=config.get("achievement_dedupe_window_seconds", 0.5),
+        outbox=config.get("achievement_outbox_enabled", False)
+    )
+
+# Repositories share the request's unit of work. It is function-scoped so the
+# commit happens before the response is sent.
+UnitOfWork = Depends(get_unit_of_work, scope="function")
+
+def get_movie_repo(db: DbSession = UnitOfWork) -> MovieRepository:
+    return MovieRepository(_sync_session(db))
 
-# Repositories
-def get_movie_repo(db: Session = Depends(get_db)) -> MovieRepository:
-    return MovieRepository(db)
+def get_user_repo(db: DbSession = UnitOfWork) -> UserRepository:
+    return UserRepository(_sync_session(db))
 
-def get_user_repo(db: Session = Depends(get_db)) -> UserRepository:
-    return UserRepository(db)
+def get_rating_repo(db: DbSession = UnitOfWork) -> UserRatingRepository:
+    return UserRatingRepository(_sync_session(db))
 
-def get_rating_repo(db: Session = Depends(get_db)) -> UserRatingRepository:
-    return UserRatingRepository(db)
+def get_achievement_repo(db: DbSession = UnitOfWork) -> AchievementRepository:
+    return AchievementRepository(_sync_session(db))
 
-def get_achievement_repo(db: Session = Depends(get_db)) -> AchievementRepository:
-    return AchievementRepository(db)
+def get_user_stats_repo(db: DbSession = UnitOfWork) -> UserStatsRepository:
+    return UserStatsRepository(_sync_session(db))
 
 # Services
 def get_movie_service(
     repo: MovieRepository = Depends(get_movie_repo),
     rating_repo: UserRatingRepository = Depends(get_rating_repo),
     cache: CacheService = Depends(get_cache_service),
-    config: ConfigService = Depends(get_config_service)
+    config: ConfigService = Depends(get_config_service),
+    view_counter: ViewCounterBuffer = Depends(get_view_counter),
+    title_index: TitlePrefixIndex = Depends(get_title_index),
+    leaderboards: Leaderboards = Depends(get_leaderboards),
+    stats_repo: UserStatsRepository = Depends(get_user_stats_repo)
 ) -> MovieService:
-    return MovieService(repo, rating_repo, cache, config)
+    return MovieService(repo, rating_repo, cache, config, view_counter, title_index, leaderboards, stats_repo)
 
 def get_user_service(
     repo: UserRepository = Depends(get_user_repo),
-    config: ConfigService = Depends(get_config_service)
+    config: ConfigService = Depends(get_config_service),
+    movie_repo: MovieRepository = Depends(get_movie_repo),
+    cache: CacheService = Depends(get_cache_service),
+    stats_repo: UserStatsRepository = Depends(get_user_stats_repo)
 ) -> UserService:
-    return UserService(repo, config)
+    return UserService(repo, config, movie_repo, cache, stats_repo)
 
 def get_achievement_service(
     repo: AchievementRepository = Depends(get_achievement_repo),
-    db: Session = Depends(get_db)
+    db: DbSession = UnitOfWork,
+    cache: CacheService = Depends(get_cache_service)
 ) -> AchievementService:
-    return AchievementService(repo, db)
+    return AchievementService(repo, _sync_session(db), cache)
 
 def get_user_rating_service(
     rating_repo: UserRatingRepository = Depends(get_rating_repo),
     user_repo: UserRepository = Depends(get_user_repo),
     movie_repo: MovieRepository = Depends(get_movie_repo),
-    achievement_service: AchievementService = Depends(get_achievement_service)
+    achievement_service: AchievementService = Depends(get_achievement_service),
+    config: ConfigService = Depends(get_config_service),
+    leaderboards: Leaderboards = Depends(get_leaderboards),
+    cache: CacheService = Depends(get_cache_service),
+    stats_repo: UserStatsRepository = Depends(get_user_stats_repo),
+    title_index: TitlePrefixIndex = Depends(get_title_index)
 ) -> UserRatingService:
-    return UserRatingService(rating_repo, user_repo, movie_repo, achievement_service)
+    achievement_queue = get_achievement_queue() if config.get("achievement_queue_enabled", False) else None
+    return UserRatingService(rating_repo, user_repo, movie_repo, achievement_service, config, leaderboards, cache, stats_repo,
+                             achievement_queue, title_index)
+
+# Async facades used by the controllers. Every service method becomes awaitable
+# and runs either on the async driver or in the threadpool, depending on the
+# "async_db_enabled" switch, so no request blocks the event loop.
+def get_async_movie_service(
+    service: MovieService = Depends(get_movie_service),
+    db: DbSession = Depends(get_session)
+) -> AsyncProxy:
+    return AsyncProxy(service, db)
+
+def get_async_user_service(
+    service: UserService = Depends(get_user_service),
+    db: DbSession = Depends(get_session)
+) -> AsyncProxy:
+    return AsyncProxy(service, db)
+
+def get_async_achievement_service(
+    service: AchievementService = Depends(get_achievement_service),
+    db: DbSession = Depends(get_session)
+) -> AsyncProxy:
+    return AsyncProxy(service, db)
+
+def get_async_user_rating_service(
+    service: UserRatingService = Depends(get_user_rating_service),
+    db: DbSession = Depends(get_session)
+) -> AsyncProxy:
+    return AsyncProxy(service, db)
@@ -1,15 +1,26 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from starlette.concurrency import run_in_threadpool
 import logging
 
-from dependencies import get_config_service
+from dependencies import (get_config_service, get_cache_service, get_view_counter, get_title_index, get_leaderboards,
+                          get_achievement_queue)
 
-from controller import UserController, MovieController, UserRatingController
-from db import engine, Base
+from controller import UserController, MovieController, UserRatingController, CacheController
+from db import engine, Base, SessionLocal
 import model
+from model.MovieORM import MovieORM
+from repository.MovieRepository import MovieRepository
+from repository.UserStatsRepository import UserStatsRepository
+from repository.fulltext import install_movie_search
 from repository.exceptions import (UsernameExistsException, EmailExistsException, UserNotFoundException,
                                    MovieTitleExistsException, MovieNotFoundException, UserRatingNotFoundException,
                                    UserRatingExistsException)
+from service.exceptions import InvalidCursorException
+from service.CacheRefresher import CacheRefresher
+from service.Leaderboards import LeaderboardRebuilder
+from service.ViewCounterBuffer import ViewCountFlusher
 from fastapi.responses import JSONResponse
 
 config_service = get_config_service()
@@ -18,7 +29,77 @@ logging.basicConfig(
     format="%(levelname)s:  %(asctime)s - %(message)s - %(name)s",
 )
 
-app = FastAPI()
+def backfill_rating_histograms():
+    # Databases that predate rating_histograms get their buckets computed once
+    db = SessionLocal()
+    try:
+        repository = MovieRepository(db)
+        if repository.has_unbuilt_histograms():
+            repository.rebuild_histograms()
+            db.commit()
+    finally:
+        db.close()
+
+def backfill_user_stats():
+    # Databases that predate user_stats get their counters computed once
+    db = SessionLocal()
+    try:
+        repository = UserStatsRepository(db)
+        if repository.has_unbuilt_stats():
+            repository.rebuild()
+            db.commit()
+    finally:
+        db.close()
+
+def load_title_index():
+    db = SessionLocal()
+    try:
+        get_title_index().load(MovieRepository(db).get_title_entries())
+    finally:
+        db.close()
+
+@asynccontextmanager
+async def lifespan(_: FastAPI):
+    await run_in_threadpool(backfill_rating_histograms)
+    await run_in_threadpool(backfill_user_stats)
+    await run_in_threadpool(load_title_index)
+    view_flusher = ViewCountFlusher(
+        get_view_counter(),
+        SessionLocal,
+        interval=config_service.get("view_flush_interval_seconds", 5),
+        leaderboards=get_leaderboards()
+    )
+    leaderboard_rebuilder = LeaderboardRebuilder(
+        get_leaderboards(),
+        SessionLocal,
+        interval=config_service.get("leaderboard_rebuild_interval_seconds", 300)
+    )
+    achievement_queue = get_achievement_queue() if config_service.get("achievement_queue_enabled", False) else None
+    # Reloads entries kept past their TTL in the background instead of in the request
+    cache_refresher = CacheRefresher(
+        get_cache_service(config=config_service),
+        SessionLocal,
+        workers=config_service.get("cache_refresh_workers", 2)
+    ) if config_service.get("cache_stale_seconds", 0) > 0 else None
+    await leaderboard_rebuilder.start()
+    await view_flusher.start()
+    if achievement_queue is not None:
+        await achievement_queue.start()
+    if cache_refresher is not None:
+        await cache_refresher.start()
+    try:
+        yield
+    finally:
+        if cache_refresher is not None:
+            await cache_refresher.stop()
+        if achievement_queue is not None:
+            # Run the checks still owed before the process goes away
+            await achievement_queue.stop()
+        # Drain buffered views so a restart does not lose them
+        await view_flusher.stop()
+        await leaderboard_rebuilder.stop()
+
+app = FastAPI(lifespan=lifespan)
 
 origins = ["*"]
 
@@ -34,7 +115,13 @@ app.add_middleware(
 app.include_router(UserController.router)
 app.include_router(MovieController.router)
 app.include_router(UserRatingController.router)
+app.include_router(CacheController.router)
 Base.metadata.create_all(bind=engine)
+# create_all skips tables that already exist, so add search and newer indexes to older databases here
+with engine.begin() as connection:
+    install_movie_search(connection)
+    for index in MovieORM.__table__.indexes:
+        index.create(connection, checkfirst=True)
 
 @app.exception_handler(UsernameExistsException)
 async def username_exists_handler(_, exc: UsernameExistsException):
@@ -62,4 +149,8 @@ async def user_rating_not_found_handler(_, exc: UserRatingNotFoundException):
 
 @app.exception_handler(UserRatingExistsException)
 async def user_rating_exists_handler(_, exc: UserRatingExistsException):
-    return JSONResponse(status_code=409, content={"detail": str(exc)})
\ No newline at end of file
+    return JSONResponse(status_code=409, content={"detail": str(exc)})
+
+@app.exception_handler(InvalidCursorException)
+async def invalid_cursor_handler(_, exc: InvalidCursorException):
+    return JSONResponse(status_code=400, content={"detail": str(exc)})
\ No newline at end of file
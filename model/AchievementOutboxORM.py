@@ -0,0 +1,11 @@
+from sqlalchemy import Column, Integer, ForeignKey, DateTime
+from sqlalchemy.sql import func
+from db import Base
+
+class AchievementOutboxORM(Base):
+    """A pending achievement check, written in the transaction of the rating that triggered it."""
+    __tablename__ = "achievement_outbox"
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
@@ -1,6 +1,15 @@
 from pydantic import BaseModel, ConfigDict
 from datetime import datetime
-from typing import Optional
+from typing import Any, Dict, Optional
+
+class AchievementRule(BaseModel):
+    """An achievement and the condition that awards it, as the checks read it."""
+    id: int
+    name: str
+    condition_type: str
+    condition_params: Dict[str, Any]
+
+    model_config = ConfigDict(from_attributes=True)
 
 class UserAchievementOut(BaseModel):
     id: int
@@ -0,0 +1,12 @@
+from pydantic import BaseModel, Field
+
+class CacheStats(BaseModel):
+    hits: int = Field(description="Reads answered from a fresh entry")
+    misses: int = Field(description="Reads that ran the loader themselves")
+    stale_hits: int = Field(description="Reads answered from a stale entry while it was being refreshed")
+    loads: int
+    coalesced: int = Field(description="Reads that waited for another caller's load instead of running their own")
+    load_errors: int
+    in_flight: int
+    entries: int = Field(description="Entries held in process; 0 with a shared backend")
+    bytes: int
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field, ConfigDict
-from typing import Optional
+from typing import Dict, Optional, List
 from datetime import datetime
 import enum
 
@@ -12,6 +12,16 @@ class MovieGenre(str, enum.Enum):
     SCI_FI = "sci-fi"
     THRILLER = "thriller"
 
+class MovieSort(str, enum.Enum):
+    AVERAGE_RATING = "average_rating"
+    VIEW_COUNT = "view_count"
+    YEAR = "year"
+    TITLE = "title"
+
+class SortOrder(str, enum.Enum):
+    ASC = "asc"
+    DESC = "desc"
+
 class MovieCreate(BaseModel):
     title: str = Field(min_length=3, max_length=255, description="Movie title")
     year: int = Field(ge=1900, le=datetime.now().year, description="Movie year")
@@ -37,9 +47,47 @@ class MovieOut(BaseModel):
     year: int
     genre: MovieGenre
     view_count: int = 0
+    average_rating: Optional[float] = None
     description: Optional[str] = None
     director: Optional[str] = None
     duration_minutes: Optional[int] = None
     poster_url: Optional[str] = None
     
-    model_config = ConfigDict(from_attributes=True)
\ No newline at end of file
+    model_config = ConfigDict(from_attributes=True)
+
+class MovieFilter(BaseModel):
+    year_min: Optional[int] = None
+    year_max: Optional[int] = None
+    director: Optional[str] = None
+    min_rating: Optional[float] = Field(None, ge=0, le=10)
+    duration_min: Optional[int] = Field(None, ge=0)
+    duration_max: Optional[int] = Field(None, ge=0)
+    sort: Optional[MovieSort] = None
+    order: SortOrder = SortOrder.ASC
+
+class MoviePage(BaseModel):
+    items: List[MovieOut]
+    next_cursor: Optional[str] = None
+
+class RatingHistogram(BaseModel):
+    movie_id: int
+    buckets: List[int] = Field(description="Number of ratings equal to 0, 1, ..., 10")
+    count: int
+    mean: Optional[float] = None
+    median: Optional[float] = None
+    percentiles: Dict[str, int] = {}
+
+class MovieSuggestion(BaseModel):
+    id: int
+    title: str
+
+
+class BulkRowError(BaseModel):
+    row: int
+    error: str
+
+class BulkImportReport(BaseModel):
+    received: int = 0
+    inserted: int = 0
+    duplicates: int = 0
+    errors: List[BulkRowError] = []
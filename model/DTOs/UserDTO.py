@@ -1,7 +1,8 @@
 from pydantic import BaseModel, EmailStr, Field, ConfigDict
-from typing import Optional
+from typing import List, Optional
 from datetime import datetime
 from model.UserORM import UserRole
+from model.DTOs.MovieDTO import MovieGenre
 
 class UserCreate(BaseModel):
     username: str = Field(min_length=3, max_length=50, description="Username")
@@ -22,4 +23,17 @@ class UserOut(BaseModel):
     avatar_url: Optional[str] = None
     created_at: datetime
     
-    model_config = ConfigDict(from_attributes=True)
\ No newline at end of file
+    model_config = ConfigDict(from_attributes=True)
+
+class UserGenreStats(BaseModel):
+    genre: MovieGenre
+    rating_count: int
+    average_rating: float
+
+class UserStatsOut(BaseModel):
+    user_id: int
+    rating_count: int
+    comment_count: int
+    average_rating: Optional[float] = None
+    distinct_genres: int
+    genres: List[UserGenreStats]
\ No newline at end of file
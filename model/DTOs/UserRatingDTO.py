@@ -16,7 +16,7 @@ class UserRatingOut(BaseModel):
     user_id: int
     movie_id: int
     rating: int
-    comment: str
+    comment: Optional[str] = None
     created_at: datetime
     updated_at: datetime
 
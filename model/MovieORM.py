@@ -1,5 +1,5 @@
 # model/MovieORM.py
-from sqlalchemy import Column, Integer, String, UniqueConstraint, Enum, Float, Text
+from sqlalchemy import Column, Integer, String, UniqueConstraint, Enum, Float, Text, Index
 from db import Base
 from model.DTOs.MovieDTO import MovieGenre
 
@@ -11,7 +11,11 @@ class MovieORM(Base):
     title = Column(String(255), nullable=False)
     year = Column(Integer, nullable=False)
     genre = Column(Enum(MovieGenre), nullable=False)
+    # average_rating is derived from rating_sum / rating_count, which are kept
+    # up to date in the same statement whenever a rating is written.
     average_rating = Column(Float, nullable=False, default=0.0)
+    rating_sum = Column(Float, nullable=False, default=0.0, server_default="0")
+    rating_count = Column(Integer, nullable=False, default=0, server_default="0")
     view_count = Column(Integer, nullable=False, default=0)
     description = Column(Text, nullable=True)
     director = Column(String(255), nullable=True)
@@ -20,4 +24,12 @@ class MovieORM(Base):
 
     __table_args__ = (
         UniqueConstraint("title", name="uq_movies_title"),
+        Index("ix_movies_genre_id", "genre", "id"),
+        # Sorted listings seek on (sort column, id), which these also serve for range filters
+        Index("ix_movies_average_rating_id", "average_rating", "id"),
+        Index("ix_movies_view_count_id", "view_count", "id"),
+        Index("ix_movies_year_id", "year", "id"),
+        Index("ix_movies_title_id", "title", "id"),
+        Index("ix_movies_director", "director"),
+        Index("ix_movies_duration_minutes", "duration_minutes"),
     )
\ No newline at end of file
@@ -0,0 +1,10 @@
+from sqlalchemy import Column, Integer, ForeignKey
+from db import Base
+
+class RatingHistogramORM(Base):
+    """One bucket of a movie's rating distribution: how many ratings equal ``rating``."""
+    __tablename__ = "rating_histograms"
+
+    movie_id = Column(Integer, ForeignKey("movies.id", ondelete="CASCADE"), primary_key=True)
+    rating = Column(Integer, primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
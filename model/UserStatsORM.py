@@ -0,0 +1,13 @@
+from sqlalchemy import Column, Integer, Float, ForeignKey, Enum
+from db import Base
+from model.DTOs.MovieDTO import MovieGenre
+
+class UserStatsORM(Base):
+    """A user's rating counters for one genre, kept in step with user_ratings."""
+    __tablename__ = "user_stats"
+
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    genre = Column(Enum(MovieGenre), primary_key=True)
+    rating_count = Column(Integer, nullable=False, default=0)
+    comment_count = Column(Integer, nullable=False, default=0)
+    rating_sum = Column(Float, nullable=False, default=0.0)
@@ -0,0 +1,17 @@
+from db import SessionLocal
+from repository.MovieRepository import MovieRepository
+
+def repair_rating_counters():
+    db = SessionLocal()
+    try:
+        updated = MovieRepository(db).rebuild_rating_counters()
+        db.commit()
+        print(f"Rebuilt rating counters, {updated} rated movies updated")
+    except Exception as e:
+        print(f"Error repairing rating counters: {e}")
+        db.rollback()
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    repair_rating_counters()
@@ -0,0 +1,32 @@
+import sys
+from db import SessionLocal
+from repository.UserStatsRepository import UserStatsRepository
+
+def repair_user_stats():
+    db = SessionLocal()
+    try:
+        UserStatsRepository(db).rebuild()
+        db.commit()
+        print("Rebuilt user stats from user ratings")
+    except Exception as e:
+        print(f"Error repairing user stats: {e}")
+        db.rollback()
+    finally:
+        db.close()
+
+def check_user_stats() -> int:
+    # Compares the maintained counters with user_ratings without changing anything
+    db = SessionLocal()
+    try:
+        mismatches = UserStatsRepository(db).find_mismatches()
+    finally:
+        db.close()
+    for user_id, genre, stored, actual in mismatches:
+        print(f"User {user_id} {genre.value}: stored (count, comments, sum) {stored}, actual {actual}")
+    print(f"{len(mismatches)} user stats rows out of date")
+    return len(mismatches)
+
+if __name__ == "__main__":
+    if "--check" in sys.argv[1:]:
+        sys.exit(1 if check_user_stats() else 0)
+    repair_user_stats()
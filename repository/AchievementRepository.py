@@ -1,8 +1,14 @@
 import logging
-from typing import List, Set
+from typing import Iterable, List, Optional, Sequence, Set, Tuple
+from sqlalchemy import and_, case, delete, func, insert, select
 from sqlalchemy.orm import Session
 from model.AchievementORM import AchievementORM
+from model.AchievementOutboxORM import AchievementOutboxORM
+from model.MovieORM import MovieORM
 from model.UserAchievementORM import UserAchievementORM
+from model.UserRatingORM import UserRatingORM
+from model.UserStatsORM import UserStatsORM
+from repository.dialect import insert_for
 
 class AchievementRepository:
     def __init__(self, db: Session):
@@ -29,10 +35,56 @@ class AchievementRepository:
             achievement_id=achievement_id
         )
         self.db.add(user_achievement)
-        self.db.commit()
+        self.db.flush()
         self.logger.info(f"User {user_id} earned achievement {achievement_id}")
         return user_achievement
 
+    def add_user_achievements(self, user_id: int, achievement_ids: Iterable[int]) -> List[int]:
+        """Awards ``achievement_ids`` in one INSERT ... ON CONFLICT DO NOTHING.
+
+        Returns the ids actually inserted; ones the user already had, e.g. from a
+        concurrent check, are skipped instead of failing the transaction.
+        """
+        rows = [{"user_id": user_id, "achievement_id": achievement_id} for achievement_id in achievement_ids]
+        if not rows:
+            return []
+        statement = (
+            insert_for(self.db, UserAchievementORM)
+            .on_conflict_do_nothing(index_elements=["user_id", "achievement_id"])
+            .returning(UserAchievementORM.achievement_id)
+        )
+        inserted = [row[0] for row in self.db.execute(statement, rows)]
+        self.logger.info(f"User {user_id} earned achievements {inserted}")
+        return inserted
+
+    def get_genre_counts(self, user_id: int) -> List[tuple]:
+        """(genre, ratings, ratings with a comment) per genre the user rated, read from user_stats by primary key."""
+        statement = (
+            select(UserStatsORM.genre, UserStatsORM.rating_count, UserStatsORM.comment_count)
+            .where(UserStatsORM.user_id == user_id, UserStatsORM.rating_count > 0)
+        )
+        return [tuple(row) for row in self.db.execute(statement)]
+
+    def get_contrarian_counts(self, user_id: int, contrarian_rules: Sequence[Tuple[float, float]]) -> List[int]:
+        """For each (min_user_rating, max_movie_avg) rule, in one query, how many ratings of the user are
+        at least min_user_rating on movies averaging below max_movie_avg.
+
+        Movie averages move with everyone's ratings, so unlike the per-genre
+        counts these cannot be kept as counters.
+        """
+        if not contrarian_rules:
+            return []
+        columns = []
+        for min_user_rating, max_movie_avg in contrarian_rules:
+            contrarian = and_(UserRatingORM.rating >= min_user_rating, MovieORM.average_rating < max_movie_avg)
+            columns.append(func.sum(case((contrarian, 1), else_=0)))
+        statement = (
+            select(*columns)
+            .join(MovieORM, UserRatingORM.movie_id == MovieORM.id)
+            .where(UserRatingORM.user_id == user_id)
+        )
+        return [count or 0 for count in self.db.execute(statement).one()]
+
     def get_user_achievements_with_details(self, user_id: int) -> List[tuple[UserAchievementORM, AchievementORM]]:
         return (
             self.db.query(UserAchievementORM, AchievementORM)
@@ -40,3 +92,21 @@ class AchievementRepository:
             .filter(UserAchievementORM.user_id == user_id)
             .all()
         )
+
+    def add_outbox_events(self, user_ids: Iterable[int]) -> None:
+        rows = [{"user_id": user_id} for user_id in user_ids]
+        if rows:
+            self.db.execute(insert(AchievementOutboxORM), rows)
+
+    def get_outbox_user_ids(self) -> List[int]:
+        return list(self.db.scalars(select(AchievementOutboxORM.user_id).distinct().order_by(AchievementOutboxORM.user_id)))
+
+    def get_last_outbox_id(self, user_id: int) -> Optional[int]:
+        return self.db.scalar(select(func.max(AchievementOutboxORM.id)).where(AchievementOutboxORM.user_id == user_id))
+
+    def delete_outbox_events(self, user_id: int, up_to_id: int) -> None:
+        """Drops the user's events up to ``up_to_id``; ones written after the check started stay queued."""
+        self.db.execute(
+            delete(AchievementOutboxORM)
+            .where(AchievementOutboxORM.user_id == user_id, AchievementOutboxORM.id <= up_to_id)
+        )
@@ -1,13 +1,26 @@
 import logging
-from typing import List
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from sqlalchemy import Integer, Row, bindparam, case, cast, delete, func, select, tuple_, update
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 
 from model.DTOs.UserRatingDTO import UserRatingUpdate
 from model.MovieORM import MovieORM
-from model.DTOs.MovieDTO import MovieCreate, MovieUpdate, MovieGenre
+from model.UserRatingORM import UserRatingORM
+from model.RatingHistogramORM import RatingHistogramORM
+from model.DTOs.MovieDTO import MovieCreate, MovieUpdate, MovieGenre, MovieOut, MovieFilter, MovieSort, SortOrder
+from repository.dialect import insert_for
+from repository.fulltext import search_movies
 from repository.exceptions import MovieNotFoundException, MovieTitleExistsException
 
+MOVIE_LIST_COLUMNS = tuple(getattr(MovieORM, name) for name in MovieOut.model_fields)
+SORT_COLUMNS = {
+    MovieSort.AVERAGE_RATING: MovieORM.average_rating,
+    MovieSort.VIEW_COUNT: MovieORM.view_count,
+    MovieSort.YEAR: MovieORM.year,
+    MovieSort.TITLE: MovieORM.title,
+}
+
 
 class MovieRepository():
     def __init__(self, db: Session):
@@ -26,8 +39,7 @@ class MovieRepository():
                 poster_url=dto.poster_url
             )
             self.db.add(movie)
-            self.db.commit()
-            self.db.refresh(movie)
+            self.db.flush()
             self.logger.info(f"Created movie: {movie.title}")
             return movie
         except IntegrityError as e:
@@ -37,23 +49,149 @@ class MovieRepository():
                 raise MovieTitleExistsException(f"Movie {dto.title} already exists")
             raise e
 
+    def bulk_create_movies(self, dtos: List[MovieCreate]) -> Dict[str, int]:
+        """Inserts the movies as one multi-row INSERT, skipping titles that already exist.
+
+        Returns the titles that were actually inserted, mapped to their new ids.
+        """
+        if not dtos:
+            return {}
+        rows = [
+            {
+                "title": dto.title,
+                "year": dto.year,
+                "genre": dto.genre,
+                "description": dto.description,
+                "director": dto.director,
+                "duration_minutes": dto.duration_minutes,
+                "poster_url": dto.poster_url,
+            }
+            for dto in dtos
+        ]
+        statement = (
+            insert_for(self.db, MovieORM)
+            .on_conflict_do_nothing(index_elements=["title"])  # uq_movies_title
+            .returning(MovieORM.title, MovieORM.id)
+        )
+        inserted = dict(self.db.execute(statement, rows).all())
+        self.db.flush()
+        self.logger.info(f"Bulk inserted {len(inserted)} of {len(rows)} movies")
+        return inserted
+
     def get_movie(self, id: int) -> MovieORM:
         movie = self.db.get(MovieORM, id)
         if not movie:
             raise MovieNotFoundException(f"Movie {id} not found")
         return movie
     
+    def get_existing_ids(self, ids: Set[int]) -> Set[int]:
+        if not ids:
+            return set()
+        return set(self.db.scalars(select(MovieORM.id).where(MovieORM.id.in_(ids))).all())
+
     def get_all(self) -> List[MovieORM]:
         self.logger.info("Fetching all movies")
         return self.db.query(MovieORM).all()
 
-    def get_paginated(self, skip: int, limit: int) -> List[MovieORM]:
+    def get_by_ids(self, ids: List[int]) -> List[Row]:
+        if not ids:
+            return []
+        return self.db.execute(select(*MOVIE_LIST_COLUMNS).where(MovieORM.id.in_(ids))).all()
+
+    def get_top_scores(self, metric: str, genre: Optional[MovieGenre], limit: int) -> List[Tuple[int, float]]:
+        # Served by ix_movies_<metric>_id, read backwards
+        score = getattr(MovieORM, metric)
+        statement = select(MovieORM.id, score)
+        if genre:
+            statement = statement.where(MovieORM.genre == genre)
+        statement = statement.order_by(score.desc(), MovieORM.id).limit(limit)
+        return [(id, value) for id, value in self.db.execute(statement)]
+
+    def get_leaderboard_entries(self, ids: Iterable[int]) -> List[Row]:
+        ids = list(ids)
+        if not ids:
+            return []
+        statement = (
+            select(MovieORM.id, MovieORM.genre, MovieORM.average_rating, MovieORM.view_count)
+            .where(MovieORM.id.in_(ids))
+        )
+        return self.db.execute(statement).all()
+
+    def get_title_entries(self) -> List[Row]:
+        # Everything the autocomplete index needs, without the other columns
+        statement = select(MovieORM.id, MovieORM.title, MovieORM.view_count, MovieORM.average_rating)
+        return self.db.execute(statement).all()
+
+    # The list methods below select only the MovieOut columns and return plain rows,
+    # skipping identity-map and attribute bookkeeping for read-only pages.
+    def get_paginated(self, skip: int, limit: int) -> List[Row]:
         self.logger.info(f"Fetching movies with skip={skip}, limit={limit}")
-        return self.db.query(MovieORM).offset(skip).limit(limit).all()
+        statement = select(*MOVIE_LIST_COLUMNS).order_by(MovieORM.id).offset(skip).limit(limit)
+        return self.db.execute(statement).all()
 
-    def get_by_genre(self, genre: MovieGenre, skip: int, limit: int) -> List[MovieORM]:
+    def get_by_genre(self, genre: MovieGenre, skip: int, limit: int) -> List[Row]:
         self.logger.info(f"Fetching movies with genre={genre}, skip={skip}, limit={limit}")
-        return self.db.query(MovieORM).filter(MovieORM.genre == genre).offset(skip).limit(limit).all()
+        statement = (
+            select(*MOVIE_LIST_COLUMNS)
+            .where(MovieORM.genre == genre)
+            .order_by(MovieORM.id)
+            .offset(skip)
+            .limit(limit)
+        )
+        return self.db.execute(statement).all()
+
+    def get_page_after(self, after_id: int, limit: int, genre: Optional[MovieGenre] = None) -> List[Row]:
+        # Keyset pagination: seeks straight to the cursor through the primary key
+        # (or ix_movies_genre_id) instead of scanning and discarding skipped rows.
+        self.logger.info(f"Fetching movies after id={after_id}, limit={limit}, genre={genre}")
+        statement = select(*MOVIE_LIST_COLUMNS).where(MovieORM.id > after_id)
+        if genre:
+            statement = statement.where(MovieORM.genre == genre)
+        return self.db.execute(statement.order_by(MovieORM.id).limit(limit)).all()
+
+    def get_filtered(self, filters: MovieFilter, genre: Optional[MovieGenre], skip: int, limit: int,
+                     after_id: Optional[int] = None, after_key=None) -> List[Row]:
+        """Filtered and sorted page, by offset or by seeking past (after_key, after_id).
+
+        Rows are ordered by the sort column with id as tie-breaker, both in the
+        requested direction, so the seek is a single row-value comparison.
+        """
+        self.logger.info(f"Fetching movies with filters={filters}, genre={genre}, skip={skip}, limit={limit}, after={after_id}")
+        statement = select(*MOVIE_LIST_COLUMNS)
+        if genre:
+            statement = statement.where(MovieORM.genre == genre)
+        if filters.year_min is not None:
+            statement = statement.where(MovieORM.year >= filters.year_min)
+        if filters.year_max is not None:
+            statement = statement.where(MovieORM.year <= filters.year_max)
+        if filters.director is not None:
+            statement = statement.where(MovieORM.director == filters.director)
+        if filters.min_rating is not None:
+            statement = statement.where(MovieORM.average_rating >= filters.min_rating)
+        if filters.duration_min is not None:
+            statement = statement.where(MovieORM.duration_minutes >= filters.duration_min)
+        if filters.duration_max is not None:
+            statement = statement.where(MovieORM.duration_minutes <= filters.duration_max)
+
+        descending = filters.order == SortOrder.DESC
+        sort_column = SORT_COLUMNS.get(filters.sort)
+        if sort_column is not None:
+            keys = (sort_column, MovieORM.id)
+            position, bound = tuple_(*keys), tuple_(after_key, after_id)
+        else:
+            keys = (MovieORM.id,)
+            position, bound = MovieORM.id, after_id
+
+        if after_id is not None:
+            statement = statement.where(position < bound if descending else position > bound)
+        else:
+            statement = statement.offset(skip)
+        statement = statement.order_by(*(key.desc() if descending else key for key in keys)).limit(limit)
+        return self.db.execute(statement).all()
+
+    def search(self, query: str, limit: int, after: Optional[Tuple[float, int]] = None) -> List[Row]:
+        self.logger.info(f"Searching movies for q={query!r}, limit={limit}, after={after}")
+        return search_movies(self.db, MOVIE_LIST_COLUMNS, query, limit, after)
 
     def update_movie(self, id: int, dto: MovieUpdate) -> MovieORM:
         try:
@@ -73,8 +211,7 @@ class MovieRepository():
             if dto.poster_url is not None:
                 movie.poster_url = dto.poster_url
             
-            self.db.commit()
-            self.db.refresh(movie)
+            self.db.flush()
             self.logger.info(f"Updated movie: {movie.title}")
         except IntegrityError as e:
             self.db.rollback()
@@ -88,26 +225,218 @@ class MovieRepository():
         try:
             movie = self.get_movie(movie_id)
             movie.average_rating = new_average
-            self.db.commit()
-            self.db.refresh(movie)
+            self.db.flush()
             self.logger.info(f"Updated movie rating: {movie.title} -> {movie.average_rating}")
         except IntegrityError as e:
             self.db.rollback()
             raise e
         return movie
 
+    def apply_rating_delta(self, movie_id: int, sum_delta: float, count_delta: int) -> Row:
+        # A single UPDATE adjusts the counters and the derived average, so it is atomic
+        # and costs O(1) no matter how many ratings the movie has. It runs in the same
+        # transaction as the rating write that caused it. Returns the new average_rating
+        # and the genre, which is all the leaderboards need.
+        new_sum = MovieORM.rating_sum + sum_delta
+        new_count = MovieORM.rating_count + count_delta
+        result = self.db.execute(
+            update(MovieORM)
+            .where(MovieORM.id == movie_id)
+            .values(
+                rating_sum=new_sum,
+                rating_count=new_count,
+                average_rating=case((new_count > 0, new_sum / new_count), else_=0.0),
+            )
+            .returning(MovieORM.average_rating, MovieORM.genre)
+            .execution_options(synchronize_session="fetch")
+        ).one_or_none()
+        if result is None:
+            raise MovieNotFoundException(f"Movie {movie_id} not found")
+        return result
+
+    def apply_rating_deltas(self, deltas: Dict[int, Tuple[float, int]]) -> None:
+        """Batched apply_rating_delta: one UPDATE per touched movie, sent as a single executemany."""
+        if not deltas:
+            return
+        movies = MovieORM.__table__
+        new_sum = movies.c.rating_sum + bindparam("sum_delta")
+        new_count = movies.c.rating_count + bindparam("count_delta")
+        statement = (
+            update(movies)
+            .where(movies.c.id == bindparam("movie_id"))
+            .values(
+                rating_sum=new_sum,
+                rating_count=new_count,
+                average_rating=case((new_count > 0, new_sum / new_count), else_=0.0),
+            )
+        )
+        params = [
+            {"movie_id": movie_id, "sum_delta": sum_delta, "count_delta": count_delta}
+            for movie_id, (sum_delta, count_delta) in sorted(deltas.items())
+        ]
+        self.db.execute(statement, params)
+
+    def subtract_user_ratings(self, user_id: int) -> List[int]:
+        # Used before a user is deleted, since their ratings go away through ON DELETE CASCADE.
+        # Returns the ids of the movies the user had rated.
+        totals = (
+            select(
+                UserRatingORM.movie_id,
+                func.sum(UserRatingORM.rating).label("rating_sum"),
+                func.count(UserRatingORM.id).label("rating_count"),
+            )
+            .where(UserRatingORM.user_id == user_id)
+            .group_by(UserRatingORM.movie_id)
+            .subquery()
+        )
+        new_sum = MovieORM.rating_sum - totals.c.rating_sum
+        new_count = MovieORM.rating_count - totals.c.rating_count
+        self.db.execute(
+            update(MovieORM)
+            .where(MovieORM.id == totals.c.movie_id)
+            .values(
+                rating_sum=new_sum,
+                rating_count=new_count,
+                average_rating=case((new_count > 0, new_sum / new_count), else_=0.0),
+            )
+            .execution_options(synchronize_session=False)
+        )
+        ratings = self.db.execute(
+            select(UserRatingORM.movie_id, UserRatingORM.rating).where(UserRatingORM.user_id == user_id)
+        ).all()
+        deltas: Dict[Tuple[int, int], int] = {}
+        for movie_id, rating in ratings:
+            key = (movie_id, round(rating))
+            deltas[key] = deltas.get(key, 0) - 1
+        self.apply_histogram_deltas(deltas)
+        return sorted({movie_id for movie_id, _ in ratings})
+
+    def reset_rating_counters(self) -> None:
+        self.db.execute(
+            update(MovieORM)
+            .values(rating_sum=0.0, rating_count=0, average_rating=0.0)
+            .execution_options(synchronize_session=False)
+        )
+        self.db.execute(delete(RatingHistogramORM))
+
+    def apply_histogram_deltas(self, deltas: Dict[Tuple[int, int], int]) -> None:
+        """Adds ``delta`` to each (movie_id, rating) bucket, creating missing buckets, in one executemany."""
+        deltas = {key: delta for key, delta in deltas.items() if delta}
+        if not deltas:
+            return
+        insert = insert_for(self.db, RatingHistogramORM.__table__)
+        statement = insert.on_conflict_do_update(
+            index_elements=["movie_id", "rating"],
+            set_={"count": RatingHistogramORM.__table__.c.count + insert.excluded.count},
+        )
+        params = [
+            {"movie_id": movie_id, "rating": rating, "count": delta}
+            for (movie_id, rating), delta in sorted(deltas.items())
+        ]
+        self.db.execute(statement, params)
+
+    def get_rating_histogram(self, movie_id: int) -> List[int]:
+        """Counts of ratings 0..10 for the movie, read from at most 11 primary-key rows."""
+        buckets = [0] * 11
+        rows = self.db.execute(
+            select(RatingHistogramORM.rating, RatingHistogramORM.count).where(RatingHistogramORM.movie_id == movie_id)
+        )
+        for rating, count in rows:
+            buckets[rating] = count
+        return buckets
+
+    def has_unbuilt_histograms(self) -> bool:
+        # True for databases that had ratings before the histogram table existed
+        has_ratings = self.db.execute(select(UserRatingORM.id).limit(1)).first() is not None
+        has_buckets = self.db.execute(select(RatingHistogramORM.movie_id).limit(1)).first() is not None
+        return has_ratings and not has_buckets
+
+    def rebuild_rating_counters(self, movie_ids: Optional[Iterable[int]] = None) -> int:
+        """Recomputes rating_sum, rating_count and average_rating from user_ratings in bulk."""
+        reset = update(MovieORM).values(rating_sum=0.0, rating_count=0, average_rating=0.0)
+        totals_query = (
+            select(
+                UserRatingORM.movie_id,
+                func.sum(UserRatingORM.rating).label("rating_sum"),
+                func.count(UserRatingORM.id).label("rating_count"),
+            )
+            .group_by(UserRatingORM.movie_id)
+        )
+        if movie_ids is not None:
+            movie_ids = list(movie_ids)
+            reset = reset.where(MovieORM.id.in_(movie_ids))
+            totals_query = totals_query.where(UserRatingORM.movie_id.in_(movie_ids))
+        totals = totals_query.subquery()
+
+        self.db.execute(reset.execution_options(synchronize_session=False))
+        result = self.db.execute(
+            update(MovieORM)
+            .where(MovieORM.id == totals.c.movie_id)
+            .values(
+                rating_sum=totals.c.rating_sum,
+                rating_count=totals.c.rating_count,
+                average_rating=totals.c.rating_sum / totals.c.rating_count,
+            )
+            .execution_options(synchronize_session=False)
+        )
+        self.rebuild_histograms(movie_ids)
+        self.db.flush()
+        self.logger.info(f"Rebuilt rating counters for {result.rowcount} rated movies")
+        return result.rowcount
+
+    def rebuild_histograms(self, movie_ids: Optional[List[int]] = None) -> None:
+        """Recomputes the rating_histograms buckets from user_ratings in bulk."""
+        clear = delete(RatingHistogramORM)
+        buckets = (
+            select(
+                UserRatingORM.movie_id,
+                cast(func.round(UserRatingORM.rating), Integer).label("rating"),
+                func.count(UserRatingORM.id).label("count"),
+            )
+            .group_by(UserRatingORM.movie_id, cast(func.round(UserRatingORM.rating), Integer))
+        )
+        if movie_ids is not None:
+            clear = clear.where(RatingHistogramORM.movie_id.in_(movie_ids))
+            buckets = buckets.where(UserRatingORM.movie_id.in_(movie_ids))
+        self.db.execute(clear)
+        self.db.execute(
+            insert_for(self.db, RatingHistogramORM.__table__).from_select(["movie_id", "rating", "count"], buckets)
+        )
+
     def delete_movie(self, id: int) -> None:
         movie = self.get_movie(id)
         self.db.delete(movie)
-        self.db.commit()
+        self.db.flush()
             
     def delete_all_movies(self) -> None:
         self.db.query(MovieORM).delete()
-        self.db.commit()
+        self.db.flush()
     
     def increment_view_count(self, id: int) -> MovieORM:
+        # Increment in SQL so concurrent views cannot overwrite each other
         movie = self.get_movie(id)
-        movie.view_count += 1
-        self.db.commit()
+        self.db.execute(
+            update(MovieORM)
+            .where(MovieORM.id == id)
+            .values(view_count=MovieORM.view_count + 1)
+            .execution_options(synchronize_session=False)
+        )
+        self.db.flush()
         self.db.refresh(movie)
-        return movie
\ No newline at end of file
+        return movie
+
+    def add_view_counts(self, deltas: Dict[int, int]) -> None:
+        """Applies buffered view deltas as one batched UPDATE ... SET view_count = view_count + :delta."""
+        if not deltas:
+            return
+        movies = MovieORM.__table__
+        statement = (
+            update(movies)
+            .where(movies.c.id == bindparam("movie_id"))
+            .values(view_count=movies.c.view_count + bindparam("delta"))
+        )
+        # Fixed id order keeps concurrent flushes from different workers deadlock-free
+        params = [{"movie_id": movie_id, "delta": delta} for movie_id, delta in sorted(deltas.items())]
+        self.db.execute(statement, params)
+        self.db.flush()
+        self.logger.info(f"Flushed view counts for {len(params)} movies")
\ No newline at end of file
@@ -1,13 +1,17 @@
 import logging
+from typing import Iterator
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import IntegrityError
-from sqlalchemy import func
+from sqlalchemy import Row, func, select
 
 
 from model.UserRatingORM import UserRatingORM
-from model.DTOs.UserRatingDTO import UserRatingCreate, UserRatingUpdate
+from model.DTOs.UserRatingDTO import UserRatingCreate, UserRatingUpdate, UserRatingOut
+from repository.dialect import insert_for
 from repository.exceptions import UserRatingNotFoundException, UserRatingExistsException
 
+RATING_LIST_COLUMNS = tuple(getattr(UserRatingORM, name) for name in UserRatingOut.model_fields)
+
 
 class UserRatingRepository():
 
@@ -25,8 +29,7 @@ class UserRatingRepository():
                 comment = dto.comment
             )
             self.db.add(rating)
-            self.db.commit()
-            self.db.refresh(rating)
+            self.db.flush()
             self.logger.info(f"Created rating for user {dto.user_id} on movie {dto.movie_id}")
             return rating
         except IntegrityError as e:
@@ -38,15 +41,36 @@ class UserRatingRepository():
                 )
             raise e
 
+    def bulk_create_ratings(self, dtos: list[UserRatingCreate]) -> list[tuple[int, int, float]]:
+        """Inserts the ratings in one multi-row INSERT, skipping pairs that violate uq_user_movie_rating.
+
+        Returns (user_id, movie_id, rating) for the rows actually inserted. Nothing is
+        committed, so the caller can update the movie counters in the same transaction.
+        """
+        if not dtos:
+            return []
+        rows = [
+            {"user_id": dto.user_id, "movie_id": dto.movie_id, "rating": dto.rating, "comment": dto.comment}
+            for dto in dtos
+        ]
+        statement = (
+            insert_for(self.db, UserRatingORM)
+            .on_conflict_do_nothing(index_elements=["user_id", "movie_id"])
+            .returning(UserRatingORM.user_id, UserRatingORM.movie_id, UserRatingORM.rating)
+        )
+        inserted = [tuple(row) for row in self.db.execute(statement, rows)]
+        self.logger.info(f"Bulk inserted {len(inserted)} of {len(rows)} ratings")
+        return inserted
+
     def delete_rating(self, id: int) -> None:
         rating = self.get_rating(id)
         self.db.delete(rating)
-        self.db.commit()
+        self.db.flush()
         self.logger.info(f"Deleted rating with ID: {id}")
 
     def delete_all_ratings(self) -> None:
         self.db.query(UserRatingORM).delete()
-        self.db.commit()
+        self.db.flush()
         self.logger.info("Deleted all ratings.")
 
     def get_rating(self, id: int) -> UserRatingORM:
@@ -61,15 +85,22 @@ class UserRatingRepository():
             movie_id=movie_id
         ).first()
 
-    def get_all_ratings(self) -> list[UserRatingORM]:
-        return self.db.query(UserRatingORM).all()
+    def get_all_ratings(self, skip: int = 0, limit: int = 100) -> list[Row]:
+        # Read-only list: plain rows of the UserRatingOut columns, no ORM hydration
+        statement = select(*RATING_LIST_COLUMNS).order_by(UserRatingORM.id).offset(skip).limit(limit)
+        return self.db.execute(statement).all()
+
+    def stream_all_ratings(self, batch_size: int = 1000) -> Iterator[Row]:
+        # yield_per fetches through a server-side cursor in batches of batch_size,
+        # so memory stays flat however large the table is.
+        statement = select(*RATING_LIST_COLUMNS).order_by(UserRatingORM.id).execution_options(yield_per=batch_size)
+        yield from self.db.execute(statement)
 
     def update_rating(self, id: int, dto: UserRatingUpdate) -> UserRatingORM:
         rating = self.get_rating(id)
         rating.rating = dto.rating
 
-        self.db.commit()
-        self.db.refresh(rating)
+        self.db.flush()
         self.logger.info(f"Updated rating with ID: {id}")
         return rating
 
@@ -1,12 +1,16 @@
 import logging
+from typing import Iterator
 from pydantic import EmailStr
+from sqlalchemy import Row, select
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import IntegrityError
 
-from model.DTOs.UserDTO import UserCreate, UserUpdate
+from model.DTOs.UserDTO import UserCreate, UserUpdate, UserOut
 from model.UserORM import UserORM
 from repository.exceptions import EmailExistsException, UsernameExistsException, UserNotFoundException
 
+USER_LIST_COLUMNS = tuple(getattr(UserORM, name) for name in UserOut.model_fields)
+
 
 class UserRepository():
     def __init__(self, db: Session):
@@ -17,8 +21,7 @@ class UserRepository():
         try:
             user = UserORM(username=dto.username, email=dto.email, password=dto.password)
             self.db.add(user)
-            self.db.commit()
-            self.db.refresh(user)
+            self.db.flush()
             self.logger.info(f"Created user with ID: {user.id}")
             return user
         except IntegrityError as e:
@@ -35,7 +38,7 @@ class UserRepository():
         try:
             user = self.get_user(id)
             self.db.delete(user)
-            self.db.commit()
+            self.db.flush()
             self.logger.info(f"Deleted user with ID: {id}")
         except IntegrityError as e:
             self.logger.error(f"Error deleting user {id}: {e}")
@@ -48,9 +51,20 @@ class UserRepository():
             raise UserNotFoundException(f"User {id} not found")
         return user
 
-    def get_all_users(self) -> list[UserORM]:
-        users = self.db.query(UserORM).all()
-        return users
+    def get_existing_ids(self, ids: set[int]) -> set[int]:
+        if not ids:
+            return set()
+        return set(self.db.scalars(select(UserORM.id).where(UserORM.id.in_(ids))).all())
+
+    def get_all_users(self, skip: int = 0, limit: int = 100) -> list[Row]:
+        # Only the UserOut columns, as plain rows: no password hashes, no ORM hydration
+        statement = select(*USER_LIST_COLUMNS).order_by(UserORM.id).offset(skip).limit(limit)
+        return self.db.execute(statement).all()
+
+    def stream_all_users(self, batch_size: int = 1000) -> Iterator[Row]:
+        # Server-side cursor via yield_per; rows are fetched batch by batch
+        statement = select(*USER_LIST_COLUMNS).order_by(UserORM.id).execution_options(yield_per=batch_size)
+        yield from self.db.execute(statement)
 
     def update_user(self, id: int, dto: UserUpdate) -> UserORM:
         user = self.get_user(id)
@@ -64,7 +78,7 @@ class UserRepository():
             user.avatar_url = dto.avatar_url
             
         try:
-            self.db.commit()
+            self.db.flush()
             self.logger.info(f"Updated user with ID: {id}")
         except IntegrityError as ex:
             self.logger.error(f"Error updating user {id}: {ex}")
@@ -75,13 +89,12 @@ class UserRepository():
             if "uq_users_email" in msg or "email" in msg:
                 raise EmailExistsException(f"Email {dto.email} already exists")
             raise
-        self.db.refresh(user)
         return user
 
     def delete_all_users(self) -> None:
         try:
             self.db.query(UserORM).delete()
-            self.db.commit()
+            self.db.flush()
             self.logger.info("Deleted all users.")
         except IntegrityError as e:
             self.logger.error(f"Error deleting all users: {e}")
@@ -0,0 +1,134 @@
+import logging
+from typing import Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import Row, delete, func, select
+from sqlalchemy.orm import Session
+from model.DTOs.MovieDTO import MovieGenre
+from model.MovieORM import MovieORM
+from model.UserRatingORM import UserRatingORM
+from model.UserStatsORM import UserStatsORM
+from repository.dialect import insert_for
+
+# (user_id, genre) -> (rating_count, comment_count, rating_sum)
+StatsDeltas = Dict[Tuple[int, MovieGenre], Tuple[int, int, float]]
+
+
+class UserStatsRepository:
+    """Per-user, per-genre rating counters in user_stats.
+
+    Writers apply deltas in the transaction of the rating change that causes
+    them, so reads are primary-key lookups instead of aggregates over
+    user_ratings. rebuild and find_mismatches recompute the same numbers from
+    user_ratings for backfills and checks.
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+        self.logger = logging.getLogger(__name__)
+
+    def get_stats(self, user_id: int) -> List[Row]:
+        """(genre, rating_count, comment_count, rating_sum) of each genre the user rated."""
+        statement = (
+            select(UserStatsORM.genre, UserStatsORM.rating_count, UserStatsORM.comment_count, UserStatsORM.rating_sum)
+            .where(UserStatsORM.user_id == user_id, UserStatsORM.rating_count > 0)
+        )
+        return self.db.execute(statement).all()
+
+    def apply_deltas(self, deltas: StatsDeltas) -> None:
+        """Adds each delta to its (user_id, genre) counters, creating missing rows, in one executemany."""
+        deltas = {key: delta for key, delta in deltas.items() if any(delta)}
+        if not deltas:
+            return
+        table = UserStatsORM.__table__
+        insert = insert_for(self.db, table)
+        statement = insert.on_conflict_do_update(
+            index_elements=["user_id", "genre"],
+            set_={
+                "rating_count": table.c.rating_count + insert.excluded.rating_count,
+                "comment_count": table.c.comment_count + insert.excluded.comment_count,
+                "rating_sum": table.c.rating_sum + insert.excluded.rating_sum,
+            },
+        )
+        params = [
+            {"user_id": user_id, "genre": genre, "rating_count": count, "comment_count": comments, "rating_sum": total}
+            for (user_id, genre), (count, comments, total) in sorted(deltas.items(), key=lambda item: (item[0][0], item[0][1].value))
+        ]
+        self.db.execute(statement, params)
+
+    def subtract_movie(self, movie_id: int) -> None:
+        # Used before a movie is deleted, since its ratings go away through ON DELETE CASCADE.
+        self.apply_deltas({key: tuple(-v for v in totals) for key, totals in self._movie_totals(movie_id).items()})
+
+    def move_movie_genre(self, movie_id: int, old_genre: MovieGenre, new_genre: MovieGenre) -> None:
+        """Moves the movie's ratings from ``old_genre`` to ``new_genre`` in its raters' counters."""
+        if old_genre == new_genre:
+            return
+        deltas = {}
+        for (user_id, _), (count, comments, total) in self._movie_totals(movie_id).items():
+            deltas[(user_id, old_genre)] = (-count, -comments, -total)
+            deltas[(user_id, new_genre)] = (count, comments, total)
+        self.apply_deltas(deltas)
+
+    def clear(self) -> None:
+        self.db.execute(delete(UserStatsORM))
+
+    def has_unbuilt_stats(self) -> bool:
+        # True for databases that had ratings before the user_stats table existed
+        has_ratings = self.db.execute(select(UserRatingORM.id).limit(1)).first() is not None
+        has_stats = self.db.execute(select(UserStatsORM.user_id).limit(1)).first() is not None
+        return has_ratings and not has_stats
+
+    def rebuild(self, user_ids: Optional[Iterable[int]] = None) -> None:
+        """Recomputes the counters from user_ratings in bulk."""
+        clear = delete(UserStatsORM)
+        totals = self._totals_query()
+        if user_ids is not None:
+            user_ids = list(user_ids)
+            clear = clear.where(UserStatsORM.user_id.in_(user_ids))
+            totals = totals.where(UserRatingORM.user_id.in_(user_ids))
+        self.db.execute(clear)
+        self.db.execute(
+            insert_for(self.db, UserStatsORM.__table__)
+            .from_select(["user_id", "genre", "rating_count", "comment_count", "rating_sum"], totals)
+        )
+
+    def find_mismatches(self, user_ids: Optional[Iterable[int]] = None) -> List[Tuple[int, MovieGenre, tuple, tuple]]:
+        """(user_id, genre, stored, actual) for every counter row that differs from user_ratings.
+
+        Counters are compared as (rating_count, comment_count, rating_sum); a
+        missing row counts as all zeros.
+        """
+        stored_query = select(UserStatsORM.user_id, UserStatsORM.genre, UserStatsORM.rating_count,
+                              UserStatsORM.comment_count, UserStatsORM.rating_sum)
+        actual_query = self._totals_query()
+        if user_ids is not None:
+            user_ids = list(user_ids)
+            stored_query = stored_query.where(UserStatsORM.user_id.in_(user_ids))
+            actual_query = actual_query.where(UserRatingORM.user_id.in_(user_ids))
+        stored = {(user_id, genre): tuple(totals) for user_id, genre, *totals in self.db.execute(stored_query)}
+        actual = {(user_id, genre): tuple(totals) for user_id, genre, *totals in self.db.execute(actual_query)}
+        mismatches = []
+        for key in sorted(stored.keys() | actual.keys(), key=lambda key: (key[0], key[1].value)):
+            have, want = stored.get(key, (0, 0, 0.0)), actual.get(key, (0, 0, 0.0))
+            if have[:2] != want[:2] or abs(have[2] - want[2]) > 1e-6:
+                mismatches.append((*key, have, want))
+        return mismatches
+
+    def _movie_totals(self, movie_id: int) -> StatsDeltas:
+        # What each rater of the movie contributes to their counters
+        return {(user_id, genre): tuple(totals)
+                for user_id, genre, *totals in self.db.execute(self._totals_query().where(UserRatingORM.movie_id == movie_id))}
+
+    @staticmethod
+    def _totals_query():
+        # Ground truth: the counters recomputed from user_ratings
+        return (
+            select(
+                UserRatingORM.user_id,
+                MovieORM.genre,
+                func.count(UserRatingORM.id),
+                func.count(UserRatingORM.comment),
+                func.sum(UserRatingORM.rating),
+            )
+            .join(MovieORM, UserRatingORM.movie_id == MovieORM.id)
+            .group_by(UserRatingORM.user_id, MovieORM.genre)
+        )
@@ -0,0 +1,130 @@
+import re
+from typing import List, Optional, Tuple
+
+from sqlalchemy import column, event, func, literal_column, or_, select, table, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from model.MovieORM import MovieORM
+
+# Full-text search over movies.title, movies.director and movies.description.
+#
+# On PostgreSQL a generated tsvector column (weighted title > director > description)
+# is kept in sync by the database itself and indexed with GIN. SQLite, used for local
+# and dev setups, gets an external-content FTS5 table kept in sync by triggers.
+# Neither is mapped on MovieORM, so the ORM model stays the same on both backends.
+
+_POSTGRES_DDL = [
+    """
+    ALTER TABLE movies ADD COLUMN IF NOT EXISTS search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(director, '')), 'B') ||
+        setweight(to_tsvector('english', coalesce(description, '')), 'C')
+    ) STORED
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_movies_search_vector ON movies USING GIN (search_vector)",
+]
+
+_SQLITE_DDL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS movies_fts
+    USING fts5(title, director, description, content='movies', content_rowid='id')
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS movies_fts_insert AFTER INSERT ON movies BEGIN
+        INSERT INTO movies_fts(rowid, title, director, description)
+        VALUES (new.id, new.title, new.director, new.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS movies_fts_delete AFTER DELETE ON movies BEGIN
+        INSERT INTO movies_fts(movies_fts, rowid, title, director, description)
+        VALUES ('delete', old.id, old.title, old.director, old.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS movies_fts_update AFTER UPDATE OF title, director, description ON movies BEGIN
+        INSERT INTO movies_fts(movies_fts, rowid, title, director, description)
+        VALUES ('delete', old.id, old.title, old.director, old.description);
+        INSERT INTO movies_fts(rowid, title, director, description)
+        VALUES (new.id, new.title, new.director, new.description);
+    END
+    """,
+    # Index the rows that existed before the FTS table did
+    "INSERT INTO movies_fts(movies_fts) VALUES ('rebuild')",
+]
+
+_movies_fts = table("movies_fts", column("rowid"))
+
+
+def install_movie_search(connection: Connection) -> None:
+    """Creates the full-text search column/table and index for movies if missing."""
+    dialect = connection.dialect.name
+    if dialect == "postgresql":
+        statements = _POSTGRES_DDL
+    elif dialect == "sqlite":
+        exists = connection.exec_driver_sql(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'movies_fts'"
+        ).first()
+        if exists:
+            return
+        statements = _SQLITE_DDL
+    else:
+        return
+    for statement in statements:
+        connection.exec_driver_sql(statement)
+
+
+# Fresh databases get the search structures from create_all; existing ones from
+# the explicit install_movie_search call at startup.
+event.listen(MovieORM.__table__, "after_create", lambda _table, connection, **_: install_movie_search(connection))
+
+
+def search_movies(db: Session, columns, query: str, limit: int,
+                  after: Optional[Tuple[float, int]] = None) -> List:
+    """Returns rows of ``columns`` plus ``rank`` for movies matching ``query``.
+
+    Rows are ordered by rank (higher is better), then id, and ``after`` is the
+    (rank, id) of the last row of the previous page.
+    """
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        tsquery = func.websearch_to_tsquery("english", query)
+        search_vector = literal_column("movies.search_vector")
+        rank = func.ts_rank(search_vector, tsquery)
+        matches = select(*columns, rank.label("rank")).where(search_vector.op("@@")(tsquery))
+    elif dialect == "sqlite":
+        match = _fts5_query(query)
+        if match is None:
+            return []
+        # bm25 is lower-is-better; negate it so both backends sort rank descending.
+        # Weights follow the column order: title, director, description.
+        rank = -func.bm25(literal_column("movies_fts"), 10.0, 4.0, 1.0)
+        matches = (
+            select(*columns, rank.label("rank"))
+            .select_from(_movies_fts.join(MovieORM.__table__, MovieORM.id == _movies_fts.c.rowid))
+            .where(text("movies_fts MATCH :match").bindparams(match=match))
+        )
+    else:
+        raise NotImplementedError(f"Full-text search is not supported on {dialect}")
+
+    ranked = matches.subquery()
+    statement = select(ranked)
+    if after is not None:
+        after_rank, after_id = after
+        statement = statement.where(or_(
+            ranked.c.rank < after_rank,
+            (ranked.c.rank == after_rank) & (ranked.c.id > after_id),
+        ))
+    statement = statement.order_by(ranked.c.rank.desc(), ranked.c.id).limit(limit)
+    return db.execute(statement).all()
+
+
+def _fts5_query(query: str) -> Optional[str]:
+    # Quote every word so user input can never be parsed as FTS5 syntax;
+    # the terms are ANDed, like websearch_to_tsquery does for plain words.
+    words = re.findall(r"\w+", query)
+    if not words:
+        return None
+    return " ".join(f'"{word}"' for word in words)
@@ -1,21 +1,97 @@
 from abc import ABC, abstractmethod
-from typing import Dict, Type
+from typing import Any, Dict, FrozenSet, Iterable, List, NamedTuple, Optional, Sequence, Tuple, Type
 from sqlalchemy.orm import Session
 from sqlalchemy import func
 from model.UserRatingORM import UserRatingORM
 from model.MovieORM import MovieORM
 
+# (min_user_rating, max_movie_avg) of a contrarian count
+ContrarianRule = Tuple[float, float]
+
+# Topics of what changed for a user; handlers subscribe to the ones their condition reads.
+# An event is the set of topics behind one check, None when it is not known.
+RATING_CREATED = "rating_created"
+COMMENT_ADDED = "comment_added"
+MOVIE_AVERAGE_CHANGED = "movie_average_changed"
+AchievementEvent = Optional[FrozenSet[str]]
+
+
+def genre_topic(genre: Any) -> str:
+    return f"genre:{str(getattr(genre, 'value', genre)).lower()}"
+
+
+def rating_event(genre: Any, commented: bool) -> AchievementEvent:
+    """The event of a new rating on a movie of ``genre``, or None when the genre is not known."""
+    if genre is None:
+        return None
+    topics = {RATING_CREATED, MOVIE_AVERAGE_CHANGED, genre_topic(genre)}
+    if commented:
+        topics.add(COMMENT_ADDED)
+    return frozenset(topics)
+
+
+def merge_events(first: AchievementEvent, second: AchievementEvent) -> AchievementEvent:
+    # An unknown event may have touched anything, so it absorbs the other
+    if first is None or second is None:
+        return None
+    return first | second
+
+
+class UserStatsSnapshot(NamedTuple):
+    """Rating aggregates of one user, computed once per achievement check."""
+
+    user_id: int
+    review_count: int
+    comment_count: int
+    # MovieGenre value -> number of ratings
+    genre_counts: Dict[str, int]
+    contrarian_counts: Dict[ContrarianRule, int]
+
+    @property
+    def distinct_genres(self) -> int:
+        return sum(1 for count in self.genre_counts.values() if count > 0)
+
+    @classmethod
+    def from_rows(cls, user_id: int, rows: Iterable[Sequence], contrarian_counts: Dict[ContrarianRule, int]) -> "UserStatsSnapshot":
+        """Folds the (genre, ratings, ratings with a comment) rows of AchievementRepository.get_genre_counts."""
+        genre_counts = {}
+        review_count = comment_count = 0
+        for genre, reviews, comments in rows:
+            genre_counts[getattr(genre, "value", genre)] = reviews
+            review_count += reviews
+            comment_count += comments
+        return cls(user_id, review_count, comment_count, genre_counts, dict(contrarian_counts))
+
+
 class BaseAchievementHandler(ABC):
     @abstractmethod
     def check(self, user_id: int, params: dict, db: Session) -> bool:
         pass
 
+    def evaluate(self, snapshot: UserStatsSnapshot, params: dict, db: Session) -> bool:
+        """Decides from ``snapshot`` alone; handlers that cannot fall back to their own query."""
+        return self.check(snapshot.user_id, params, db)
+
+    def contrarian_rules(self, params: dict) -> List[ContrarianRule]:
+        # Contrarian counts the snapshot has to include for this handler
+        return []
+
+    def subscriptions(self, params: dict) -> Optional[FrozenSet[str]]:
+        """Topics whose events can change the outcome; None evaluates the handler on every event."""
+        return None
+
 class ReviewCountHandler(BaseAchievementHandler):
     def check(self, user_id: int, params: dict, db: Session) -> bool:
         threshold = params.get("threshold", 0)
         count = db.query(func.count(UserRatingORM.id)).filter(UserRatingORM.user_id == user_id).scalar()
         return count >= threshold
 
+    def evaluate(self, snapshot: UserStatsSnapshot, params: dict, db: Session) -> bool:
+        return snapshot.review_count >= params.get("threshold", 0)
+
+    def subscriptions(self, params: dict) -> Optional[FrozenSet[str]]:
+        return frozenset({RATING_CREATED})
+
 class GenreMasterHandler(BaseAchievementHandler):
     def check(self, user_id: int, params: dict, db: Session) -> bool:
         genre = params.get("genre")
@@ -31,6 +107,16 @@ class GenreMasterHandler(BaseAchievementHandler):
             .scalar()
         )
         return count >= threshold
+
+    def evaluate(self, snapshot: UserStatsSnapshot, params: dict, db: Session) -> bool:
+        genre = params.get("genre")
+        if not genre:
+            return False
+        return snapshot.genre_counts.get(str(genre).lower(), 0) >= params.get("threshold", 0)
+
+    def subscriptions(self, params: dict) -> Optional[FrozenSet[str]]:
+        genre = params.get("genre")
+        return frozenset({genre_topic(genre)}) if genre else frozenset()
 class CommentHandler(BaseAchievementHandler):
     def check(self, user_id: int, params: dict, db: Session) -> bool:
         comment = params.get("comment")
@@ -44,6 +130,12 @@ class CommentCountHandler(BaseAchievementHandler):
         ).scalar()
         return count >= threshold
 
+    def evaluate(self, snapshot: UserStatsSnapshot, params: dict, db: Session) -> bool:
+        return snapshot.comment_count >= params.get("threshold", 0)
+
+    def subscriptions(self, params: dict) -> Optional[FrozenSet[str]]:
+        return frozenset({COMMENT_ADDED})
+
 class DistinctGenreHandler(BaseAchievementHandler):
     def check(self, user_id: int, params: dict, db: Session) -> bool:
         threshold = params.get("threshold", 0)
@@ -52,6 +144,13 @@ class DistinctGenreHandler(BaseAchievementHandler):
         ).filter(UserRatingORM.user_id == user_id).scalar()
         return count >= threshold
 
+    def evaluate(self, snapshot: UserStatsSnapshot, params: dict, db: Session) -> bool:
+        return snapshot.distinct_genres >= params.get("threshold", 0)
+
+    def subscriptions(self, params: dict) -> Optional[FrozenSet[str]]:
+        # Only a new rating can add a genre
+        return frozenset({RATING_CREATED})
+
 class ContrarianHandler(BaseAchievementHandler):
     def check(self, user_id: int, params: dict, db: Session) -> bool:
         min_user_rating = params.get("min_user_rating", 10)
@@ -68,6 +167,63 @@ class ContrarianHandler(BaseAchievementHandler):
         
         return count >= threshold
 
+    def evaluate(self, snapshot: UserStatsSnapshot, params: dict, db: Session) -> bool:
+        rule = self.contrarian_rules(params)[0]
+        return snapshot.contrarian_counts.get(rule, 0) >= params.get("threshold", 1)
+
+    def contrarian_rules(self, params: dict) -> List[ContrarianRule]:
+        return [(params.get("min_user_rating", 10), params.get("max_movie_avg", 5.0))]
+
+    def subscriptions(self, params: dict) -> Optional[FrozenSet[str]]:
+        return frozenset({MOVIE_AVERAGE_CHANGED})
+
+class SubscriptionIndex:
+    """The achievements of a catalog grouped by the topics their handlers subscribe to.
+
+    Built once per catalog, so a check looks up the few lists of its event's
+    topics instead of asking every handler. Achievements whose handler
+    subscribes to nothing in particular are selected for every event.
+    """
+
+    def __init__(self, achievements: Iterable[Any]):
+        # (catalog position, achievement, handler)
+        self._all: List[Tuple[int, Any, "BaseAchievementHandler"]] = []
+        self._always = []
+        self._by_topic: Dict[str, list] = {}
+        for achievement in achievements:
+            handler = HandlerRegistry.get_handler(achievement.condition_type)
+            if handler is None:
+                continue
+            entry = (len(self._all), achievement, handler)
+            self._all.append(entry)
+            topics = handler.subscriptions(achievement.condition_params)
+            if topics is None:
+                self._always.append(entry)
+            else:
+                for topic in topics:
+                    self._by_topic.setdefault(topic, []).append(entry)
+
+    def __len__(self) -> int:
+        return len(self._all)
+
+    @property
+    def achievements(self) -> List[Any]:
+        """The indexed achievements, in catalog order."""
+        return [achievement for _, achievement, _ in self._all]
+
+    def select(self, event: AchievementEvent = None, exclude_ids: Iterable[int] = ()) -> List[Tuple[Any, "BaseAchievementHandler"]]:
+        """(achievement, handler) subscribed to ``event``, every one when it is None, in catalog order."""
+        exclude_ids = set(exclude_ids)
+        if event is None:
+            entries = self._all
+        else:
+            selected = {entry[0]: entry for entry in self._always}
+            for topic in event:
+                selected.update((entry[0], entry) for entry in self._by_topic.get(topic, ()))
+            entries = [selected[position] for position in sorted(selected)]
+        return [(achievement, handler) for _, achievement, handler in entries if achievement.id not in exclude_ids]
+
+
 class HandlerRegistry:
     _handlers: Dict[str, BaseAchievementHandler] = {}
 
@@ -79,6 +235,10 @@ class HandlerRegistry:
     def get_handler(cls, condition_type: str) -> BaseAchievementHandler:
         return cls._handlers.get(condition_type)
 
+    @classmethod
+    def index(cls, achievements: Iterable[Any]) -> SubscriptionIndex:
+        return SubscriptionIndex(achievements)
+
 HandlerRegistry.register("COUNT_REVIEWS", ReviewCountHandler())
 HandlerRegistry.register("GENRE_MASTER", GenreMasterHandler())
 HandlerRegistry.register("COMMENT_COUNT", CommentCountHandler())
@@ -0,0 +1,148 @@
+import asyncio
+import logging
+from typing import Callable, Dict, List, Mapping, Optional
+
+from starlette.concurrency import run_in_threadpool
+
+from repository.AchievementRepository import AchievementRepository
+from service.AchievementHandlers import AchievementEvent, merge_events
+from service.AchievementService import AchievementService
+from service.CacheService import CacheService
+
+
+class AchievementQueue:
+    """Runs achievement checks on background workers instead of in the rating request.
+
+    enqueue() is called once a rating has committed, from whichever thread
+    committed it. A user's event is held for ``dedupe_window`` seconds before
+    it is queued, and further events for that user are absorbed until a worker
+    picks it up, so a burst of ratings costs one check of the union of their
+    events. A rating committed while the check runs queues the user again.
+
+    With ``outbox`` the events are also written to achievement_outbox in the
+    rating's transaction. A worker deletes them together with the awards, and
+    start() requeues whatever a crash left behind, as checks of every
+    achievement since the outbox keeps only the user.
+    """
+
+    def __init__(self, session_factory: Callable, cache: Optional[CacheService] = None, workers: int = 2,
+                 dedupe_window: float = 0.5, outbox: bool = False):
+        self.session_factory = session_factory
+        self.cache = cache
+        self.workers = workers
+        self.dedupe_window = dedupe_window
+        self.outbox = outbox
+        self.logger = logging.getLogger(__name__)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Optional[asyncio.Queue] = None
+        # user id -> timer releasing its held event, None once it is in the queue
+        self._pending: Dict[int, Optional[asyncio.TimerHandle]] = {}
+        # user id -> merged event of its pending check
+        self._events: Dict[int, AchievementEvent] = {}
+        self._outstanding = 0
+        self._idle: Optional[asyncio.Event] = None
+        self._tasks: List[asyncio.Task] = []
+
+    async def start(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue()
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+        if self.outbox:
+            self._schedule(dict.fromkeys(await run_in_threadpool(self._read_outbox)), delay=0)
+
+    async def stop(self) -> None:
+        # Finish the checks already owed so a restart does not lose them
+        if self._loop is None:
+            return
+        await self.drain()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._loop = None
+
+    def enqueue(self, events: Mapping[int, AchievementEvent]) -> None:
+        """Queues a check of each user id for its event, see AchievementHandlers."""
+        events = dict(events)
+        loop = self._loop
+        if loop is not None:
+            try:
+                loop.call_soon_threadsafe(self._schedule, events)
+                return
+            except RuntimeError:
+                pass
+        # Not running, e.g. outside the app, so check right here
+        for user_id, event in events.items():
+            self._check(user_id, event)
+
+    async def drain(self) -> None:
+        """Waits until every event enqueued so far has been checked, releasing held ones at once."""
+        for user_id, handle in list(self._pending.items()):
+            if handle is not None:
+                self._release(user_id)
+        await self._idle.wait()
+
+    def wait_drained(self, timeout: Optional[float] = None) -> None:
+        """drain() for callers on other threads, such as tests driving the app through TestClient."""
+        if self._loop is not None:
+            asyncio.run_coroutine_threadsafe(self.drain(), self._loop).result(timeout)
+
+    def pending(self) -> int:
+        return self._outstanding
+
+    def _schedule(self, events: Dict[int, AchievementEvent], delay: Optional[float] = None) -> None:
+        delay = self.dedupe_window if delay is None else delay
+        for user_id, event in events.items():
+            if user_id in self._pending:
+                self._events[user_id] = merge_events(self._events[user_id], event)
+                continue
+            self._events[user_id] = event
+            self._outstanding += 1
+            self._idle.clear()
+            self._pending[user_id] = self._loop.call_later(delay, self._release, user_id)
+
+    def _release(self, user_id: int) -> None:
+        handle = self._pending.get(user_id)
+        if handle is not None:
+            handle.cancel()
+            self._pending[user_id] = None
+            self._queue.put_nowait(user_id)
+
+    async def _work(self) -> None:
+        while True:
+            user_id = await self._queue.get()
+            # From here on a new event for the user needs a check of its own
+            self._pending.pop(user_id, None)
+            event = self._events.pop(user_id, None)
+            try:
+                await run_in_threadpool(self._check, user_id, event)
+            except Exception as e:
+                self.logger.error(f"Achievement check for user {user_id} failed: {e}")
+            finally:
+                self._outstanding -= 1
+                if not self._outstanding:
+                    self._idle.set()
+
+    def _read_outbox(self) -> List[int]:
+        db = self.session_factory()
+        try:
+            return AchievementRepository(db).get_outbox_user_ids()
+        finally:
+            db.close()
+
+    def _check(self, user_id: int, event: AchievementEvent = None) -> None:
+        db = self.session_factory()
+        try:
+            repository = AchievementRepository(db)
+            last_outbox_id = repository.get_last_outbox_id(user_id) if self.outbox else None
+            AchievementService(repository, db, self.cache).check_new_achievements(user_id, event)
+            if last_outbox_id is not None:
+                repository.delete_outbox_events(user_id, last_outbox_id)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
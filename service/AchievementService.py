@@ -1,43 +1,57 @@
 import logging
-from typing import List
+from typing import List, Optional
+from pydantic import TypeAdapter
 from sqlalchemy.orm import Session
-from model.AchievementORM import AchievementORM
 from model.UserAchievementORM import UserAchievementORM
-from model.DTOs.AchievementDTO import UserAchievementOut, AchievementStatusOut
-from service.AchievementHandlers import HandlerRegistry
+from model.DTOs.AchievementDTO import AchievementRule, UserAchievementOut, AchievementStatusOut
+from service.AchievementHandlers import AchievementEvent, HandlerRegistry, SubscriptionIndex, UserStatsSnapshot
+from service.CacheKeys import ACHIEVEMENTS_CATALOG_KEY, achievements_status_key, achievements_version_key, invalidate
+from service.CacheService import CacheService
+from service.ConditionalGet import content_version
 
 from repository.AchievementRepository import AchievementRepository
 
+STATUS_LIST = TypeAdapter(List[AchievementStatusOut])
+
+
 class AchievementService:
-    def __init__(self, repo: AchievementRepository, db: Session):
+    def __init__(self, repo: AchievementRepository, db: Session, cache: Optional[CacheService] = None):
         self.repo = repo
         self.db = db 
+        self.cache = cache
         self.logger = logging.getLogger(__name__)
 
-    def check_new_achievements(self, user_id: int) -> List[AchievementORM]:
-        all_achievements = self.repo.get_all_achievements()
-        user_achievement_ids = self.repo.get_user_achievement_ids(user_id)
+    def check_new_achievements(self, user_id: int, event: AchievementEvent = None) -> List[AchievementRule]:
+        """Awards every achievement the user now meets, with a fixed number of queries.
 
-        newly_earned = []
+        Only achievements whose handlers subscribe to ``event`` are evaluated,
+        all of them when it is None; they are looked up in the catalog's
+        cached subscription index. The user's counters are read once from
+        user_stats into a snapshot that those handlers evaluate against, with
+        one more query only when one needs contrarian counts. The awards go in
+        as one bulk insert.
+        """
+        pending = self._subscription_index().select(event, self.repo.get_user_achievement_ids(user_id))
+        if not pending:
+            return []
 
-        for achievement in all_achievements:
-            if achievement.id in user_achievement_ids:
-                continue
+        rules = sorted({rule for achievement, handler in pending for rule in handler.contrarian_rules(achievement.condition_params)})
+        contrarian_counts = dict(zip(rules, self.repo.get_contrarian_counts(user_id, rules)))
+        snapshot = UserStatsSnapshot.from_rows(user_id, self.repo.get_genre_counts(user_id), contrarian_counts)
+        met = [achievement for achievement, handler in pending if handler.evaluate(snapshot, achievement.condition_params, self.db)]
+        inserted = set(self.repo.add_user_achievements(user_id, [achievement.id for achievement in met]))
 
-            handler = HandlerRegistry.get_handler(achievement.condition_type)
-            if not handler:
-                continue
-
-            if handler.check(user_id, achievement.condition_params, self.db):
-                self.repo.add_user_achievement(user_id, achievement.id)
-                newly_earned.append(achievement)
-                self.logger.info(f"User {user_id} earned new achievement: {achievement.name}")
-                
+        newly_earned = [achievement for achievement in met if achievement.id in inserted]
+        for achievement in newly_earned:
+            self.logger.info(f"User {user_id} earned new achievement: {achievement.name}")
         if newly_earned:
-            self.db.commit()
-            
+            invalidate(self.cache, self.db, [achievements_status_key(user_id), achievements_version_key(user_id)])
         return newly_earned
 
+    def add_pending_checks(self, user_ids: List[int]) -> None:
+        """Records checks owed to ``user_ids`` in the outbox, in the caller's transaction."""
+        self.repo.add_outbox_events(user_ids)
+
     def get_user_achievements(self, user_id: int) -> List[UserAchievementOut]:
         user_achievements = self.repo.get_user_achievements_with_details(user_id)
         
@@ -52,6 +66,28 @@ class AchievementService:
         ]
 
     def get_achievements_status(self, user_id: int) -> List[AchievementStatusOut]:
+        if self.cache is None:
+            return self._load_achievements_status(user_id)
+        return self.cache.get_or_load(achievements_status_key(user_id), lambda: self._load_achievements_status(user_id),
+                                      refresh=lambda db: AchievementService(AchievementRepository(db), db)._load_achievements_status(user_id))
+
+    def get_achievements_version(self, user_id: int) -> Optional[str]:
+        """Hash of the user's achievement status, None when there is no cache to keep it in."""
+        if self.cache is None:
+            return None
+        return self.cache.get_or_load(achievements_version_key(user_id),
+                                      lambda: content_version(STATUS_LIST.dump_json(self.get_achievements_status(user_id))))
+
+    def _subscription_index(self) -> SubscriptionIndex:
+        if self.cache is None:
+            return self._load_subscription_index()
+        return self.cache.get_or_load(ACHIEVEMENTS_CATALOG_KEY, self._load_subscription_index)
+
+    def _load_subscription_index(self) -> SubscriptionIndex:
+        # Plain rules rather than ORM rows, which must not outlive their session
+        return HandlerRegistry.index(AchievementRule.model_validate(achievement) for achievement in self.repo.get_all_achievements())
+
+    def _load_achievements_status(self, user_id: int) -> List[AchievementStatusOut]:
         all_achievements = self.repo.get_all_achievements()
         
         user_achievements = self.repo.get_user_achievements(user_id)
@@ -0,0 +1,50 @@
+import functools
+import inspect
+from typing import Any, Optional
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+
+_EXHAUSTED = object()
+
+
+class AsyncProxy:
+    """Exposes every method of a repository or service as a coroutine.
+
+    With an AsyncSession the call runs inside ``run_sync``, so the sync ORM code
+    talks to the database through the async driver without blocking the event
+    loop. With a plain Session the call is moved to the threadpool instead.
+    Generator methods become async generators that advance one step per call.
+    """
+
+    def __init__(self, target: Any, db: Optional[Any] = None):
+        self._target = target
+        self._session = db if isinstance(db, AsyncSession) else None
+
+    async def _run(self, fn, *args, **kwargs):
+        if self._session is not None:
+            return await self._session.run_sync(lambda _: fn(*args, **kwargs))
+        return await run_in_threadpool(fn, *args, **kwargs)
+
+    def __getattr__(self, name: str) -> Any:
+        attr = getattr(self._target, name)
+        if not callable(attr):
+            return attr
+
+        if inspect.isgeneratorfunction(attr):
+            @functools.wraps(attr)
+            async def iterate(*args, **kwargs):
+                iterator = await self._run(attr, *args, **kwargs)
+                while True:
+                    item = await self._run(next, iterator, _EXHAUSTED)
+                    if item is _EXHAUSTED:
+                        return
+                    yield item
+
+            return iterate
+
+        @functools.wraps(attr)
+        async def call(*args, **kwargs):
+            return await self._run(attr, *args, **kwargs)
+
+        return call
@@ -0,0 +1,449 @@
+import hashlib
+import logging
+import mmap
+import os
+import queue
+import socket
+import struct
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterable, List, Optional
+from urllib.parse import unquote, urlparse
+from service.ConfigService import ConfigService
+
+
+class CacheBackend:
+    """Shared storage behind CacheService for deployments with several workers.
+
+    Backends store already serialized values, so every worker reads what any
+    other worker wrote, and an invalidation in one worker is seen by all.
+    """
+
+    # Whether calls wait on the network; CacheService makes those off the event loop
+    remote = False
+
+    def get(self, key: str) -> Optional[bytes]:
+        raise NotImplementedError
+
+    def set(self, key: str, data: bytes, ttl: float, tags: Iterable[str] = ()) -> None:
+        raise NotImplementedError
+
+    def delete(self, keys: Iterable[str]) -> None:
+        raise NotImplementedError
+
+    def invalidate_tags(self, tags: Iterable[str]) -> int:
+        raise NotImplementedError
+
+    def delete_prefix(self, prefix: str) -> None:
+        raise NotImplementedError
+
+    def clear(self) -> None:
+        raise NotImplementedError
+
+
+def create_cache_backend(config: ConfigService) -> Optional[CacheBackend]:
+    """Builds the backend named by ``cache_backend``; None means the in-process cache.
+
+    Every backend works with both sync and async database sessions
+    (``async_db_enabled``):
+
+    - ``memory``: one cache per worker process.
+    - ``redis``: shared by all workers on all hosts. Threadpool workers each
+      take one of ``cache_redis_pool_size`` connections. Under an async
+      session the calls run on the default executor, so the event loop never
+      waits on the server.
+    - ``mmap``: shared by the workers of one host through ``cache_mmap_path``.
+      Its calls are local memory operations and run inline in both modes.
+    """
+    kind = config.get("cache_backend", "memory")
+    if kind == "memory":
+        return None
+    if kind == "redis":
+        return RedisCacheBackend(config.get("cache_redis_url", "redis://localhost:6379/0"),
+                                 pool_size=config.get("cache_redis_pool_size", 4))
+    if kind == "mmap":
+        return MmapCacheBackend(
+            config.get("cache_mmap_path", "movies_cache.mmap"),
+            slots=config.get("cache_mmap_slots", 4096),
+            slot_size=config.get("cache_mmap_slot_bytes", 16384),
+        )
+    raise ValueError(f"Unknown cache backend: {kind}")
+
+
+class RespError(Exception): pass
+
+
+class RespConnection:
+    """One socket to the server, used by one caller at a time."""
+
+    def __init__(self, host: str, port: int, timeout: float):
+        self._sock = socket.create_connection((host, port), timeout=timeout)
+        self._sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._reader = self._sock.makefile("rb")
+
+    def send(self, payload: bytes) -> None:
+        self._sock.sendall(payload)
+
+    def close(self) -> None:
+        try:
+            self._reader.close()
+            self._sock.close()
+        except OSError:
+            pass
+
+    def read_reply(self):
+        line = self._reader.readline()
+        if not line.endswith(b"\r\n"):
+            raise EOFError("Connection closed by the cache server")
+        kind, rest = line[:1], line[1:-2]
+        if kind == b"+":
+            return rest.decode()
+        if kind == b"-":
+            return RespError(rest.decode())
+        if kind == b":":
+            return int(rest)
+        if kind == b"$":
+            length = int(rest)
+            if length < 0:
+                return None
+            data = self._reader.read(length + 2)
+            if len(data) != length + 2:
+                raise EOFError("Connection closed by the cache server")
+            return data[:-2]
+        if kind == b"*":
+            length = int(rest)
+            return None if length < 0 else [self.read_reply() for _ in range(length)]
+        raise RespError(f"Unexpected reply type {kind!r}")
+
+
+class RespClient:
+    """Minimal client for the Redis serialization protocol (RESP2).
+
+    Keeps a pool of up to ``pool_size`` connections, so that concurrent
+    callers each get their own instead of queueing behind one socket; a
+    caller beyond that waits for a connection to come back. pipeline() sends
+    a batch of commands in one write and reads the replies back, one round
+    trip in total.
+    """
+
+    def __init__(self, url: str, timeout: float = 2.0, pool_size: int = 4):
+        parsed = urlparse(url)
+        self.host = parsed.hostname or "localhost"
+        self.port = parsed.port or 6379
+        self.password = unquote(parsed.password) if parsed.password else None
+        self.db = int(parsed.path.lstrip("/") or 0)
+        self.timeout = timeout
+        # Held while a caller has a connection, which bounds how many are open
+        self._slots = threading.BoundedSemaphore(max(1, pool_size))
+        # Most recently returned first, so a quiet pool keeps using warm sockets
+        self._idle: "queue.LifoQueue[RespConnection]" = queue.LifoQueue()
+
+    def execute(self, *args):
+        return self.pipeline([args])[0]
+
+    def pipeline(self, commands: List[tuple]) -> list:
+        payload = b"".join(self._encode(command) for command in commands)
+        with self._slots:
+            connection = self._acquire()
+            try:
+                connection.send(payload)
+                replies = [connection.read_reply() for _ in commands]
+            except (OSError, EOFError):
+                # Dropped rather than returned; the next caller opens a new one
+                connection.close()
+                raise
+            self._idle.put(connection)
+        for reply in replies:
+            if isinstance(reply, RespError):
+                raise reply
+        return replies
+
+    def close(self) -> None:
+        """Closes the idle connections; ones in use are closed when they come back broken or on exit."""
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+    def _acquire(self) -> RespConnection:
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        connection = RespConnection(self.host, self.port, self.timeout)
+        setup = []
+        if self.password:
+            setup.append(("AUTH", self.password))
+        if self.db:
+            setup.append(("SELECT", self.db))
+        if setup:
+            try:
+                connection.send(b"".join(self._encode(command) for command in setup))
+                replies = [connection.read_reply() for _ in setup]
+            except (OSError, EOFError):
+                connection.close()
+                raise
+            for reply in replies:
+                if isinstance(reply, RespError):
+                    connection.close()
+                    raise reply
+        return connection
+
+    @staticmethod
+    def _encode(command: tuple) -> bytes:
+        parts = [b"*%d\r\n" % len(command)]
+        for arg in command:
+            if isinstance(arg, str):
+                arg = arg.encode()
+            elif not isinstance(arg, bytes):
+                arg = str(arg).encode()
+            parts.append(b"$%d\r\n%s\r\n" % (len(arg), arg))
+        return b"".join(parts)
+
+
+class RedisCacheBackend(CacheBackend):
+    """Cache entries in a Redis (or Redis-compatible) server shared by all workers.
+
+    Each tag is a Redis set of the keys tagged with it. invalidate_tags reads
+    and deletes those sets in one Lua script, so a key another worker tags in
+    the meantime is never dropped from its set while it stays cached. Every
+    key lives under ``namespace`` so clear() only touches this cache's keys.
+    """
+
+    # DEL takes the members in chunks, since unpack() is limited to a few thousand values
+    INVALIDATE_TAGS = """
+local removed = 0
+for _, tag in ipairs(KEYS) do
+  local members = redis.call('SMEMBERS', tag)
+  for i = 1, #members, 1000 do
+    removed = removed + redis.call('DEL', unpack(members, i, math.min(i + 999, #members)))
+  end
+  redis.call('DEL', tag)
+end
+return removed
+"""
+
+    remote = True
+
+    def __init__(self, url: str, namespace: str = "cache:", client: Optional[RespClient] = None, pool_size: int = 4):
+        self.client = client or RespClient(url, pool_size=pool_size)
+        self.namespace = namespace
+        # Tag sets must outlive every key in them; this tracks the longest TTL used
+        self._tag_ttl_ms = 0
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self.client.execute("GET", self._key(key))
+
+    def set(self, key: str, data: bytes, ttl: float, tags: Iterable[str] = ()) -> None:
+        ttl_ms = max(1, int(ttl * 1000))
+        self._tag_ttl_ms = max(self._tag_ttl_ms, ttl_ms)
+        commands = [("SET", self._key(key), data, "PX", ttl_ms)]
+        for tag in tags:
+            commands.append(("SADD", self._tag(tag), self._key(key)))
+            commands.append(("PEXPIRE", self._tag(tag), self._tag_ttl_ms))
+        self.client.pipeline(commands)
+
+    def delete(self, keys: Iterable[str]) -> None:
+        keys = [self._key(key) for key in keys]
+        if keys:
+            self.client.execute("DEL", *keys)
+
+    def invalidate_tags(self, tags: Iterable[str]) -> int:
+        tag_keys = [self._tag(tag) for tag in tags]
+        if not tag_keys:
+            return 0
+        return self.client.execute("EVAL", self.INVALIDATE_TAGS, len(tag_keys), *tag_keys)
+
+    def delete_prefix(self, prefix: str) -> None:
+        pattern = self._key(_glob_escape(prefix)) + "*"
+        cursor = b"0"
+        while True:
+            cursor, keys = self.client.execute("SCAN", cursor, "MATCH", pattern, "COUNT", 1000)
+            if keys:
+                self.client.execute("DEL", *keys)
+            if cursor == b"0":
+                break
+
+    def clear(self) -> None:
+        # Tag sets live under the same namespace, so they go too
+        self.delete_prefix("")
+
+    def _key(self, key: str) -> str:
+        return self.namespace + key
+
+    def _tag(self, tag: str) -> str:
+        return f"{self.namespace}tag:{tag}"
+
+
+def _glob_escape(value: str) -> str:
+    return "".join("\\" + c if c in "*?[]\\" else c for c in value)
+
+
+def _stable_hash(value: str) -> int:
+    # hash() is salted per process; workers must agree on slot and tag positions
+    return int.from_bytes(hashlib.blake2b(value.encode(), digest_size=8).digest(), "little")
+
+
+class MmapCacheBackend(CacheBackend):
+    """Cache in a memory-mapped file shared by the workers of one host.
+
+    The file holds a header, a table of tag generations and ``slots``
+    fixed-size slots. A key may live in any of the WAYS slots of its set
+    (picked by a stable hash); a full set evicts its entry that expires first.
+    Values that do not fit a slot are not cached.
+
+    Invalidation never touches the entries: each entry records the generation
+    of its tags (and the global epoch) when written, invalidate_tags bumps the
+    generations, and get() treats an entry with an outdated generation as a
+    miss. Tags share TAG_BUCKETS counters, so a colliding tag at worst
+    invalidates a few extra entries. delete_prefix and clear bump the epoch,
+    which drops every entry. Writers hold an exclusive flock on the file,
+    readers a shared one.
+    """
+
+    MAGIC = b"MVCACHE1"
+    WAYS = 4
+    TAG_BUCKETS = 4096
+    # magic, slots, slot_size, epoch
+    _HEADER = struct.Struct("<8sIIQ")
+    _GENERATION = struct.Struct("<Q")
+    # key hash, expires_at (wall clock), epoch, payload length, key length, tag count
+    _SLOT = struct.Struct("<QdQIHH")
+    # tag bucket, generation
+    _TAG = struct.Struct("<IQ")
+
+    def __init__(self, path: str, slots: int = 4096, slot_size: int = 16384):
+        import fcntl
+        self._fcntl = fcntl
+        self.path = path
+        self.slots = max(self.WAYS, slots - slots % self.WAYS)
+        self.slot_size = slot_size
+        self._tags_offset = self._HEADER.size
+        self._slots_offset = self._tags_offset + self.TAG_BUCKETS * self._GENERATION.size
+        self._size = self._slots_offset + self.slots * self.slot_size
+        self._lock = threading.Lock()
+        self.logger = logging.getLogger(__name__)
+
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        with self._locked(exclusive=True):
+            if os.fstat(self._fd).st_size != self._size or not self._header_matches():
+                os.ftruncate(self._fd, 0)
+                os.ftruncate(self._fd, self._size)
+                os.pwrite(self._fd, self._HEADER.pack(self.MAGIC, self.slots, self.slot_size, 0), 0)
+        self._map = mmap.mmap(self._fd, self._size)
+
+    def get(self, key: str) -> Optional[bytes]:
+        key_hash = _stable_hash(key)
+        encoded_key = key.encode()
+        with self._locked(exclusive=False):
+            offset = self._find(key_hash, encoded_key)
+            if offset is None:
+                return None
+            _, expires_at, slot_epoch, length, key_length, tag_count = self._SLOT.unpack_from(self._map, offset)
+            if expires_at <= time.time() or slot_epoch != self._epoch():
+                return None
+            tags_start = offset + self._SLOT.size + key_length
+            for i in range(tag_count):
+                bucket, generation = self._TAG.unpack_from(self._map, tags_start + i * self._TAG.size)
+                if self._generation(bucket) != generation:
+                    return None
+            data_start = tags_start + tag_count * self._TAG.size
+            return bytes(self._map[data_start:offset + self._SLOT.size + length])
+
+    def set(self, key: str, data: bytes, ttl: float, tags: Iterable[str] = ()) -> None:
+        key_hash = _stable_hash(key)
+        encoded_key = key.encode()
+        buckets = sorted({_stable_hash(tag) % self.TAG_BUCKETS for tag in tags})
+        length = len(encoded_key) + len(buckets) * self._TAG.size + len(data)
+        if self._SLOT.size + length > self.slot_size:
+            self.logger.debug(f"Cache value for key='{key}' does not fit a slot, not stored")
+            return
+        with self._locked(exclusive=True):
+            offset = self._pick_slot(key_hash, encoded_key)
+            tag_bytes = b"".join(self._TAG.pack(bucket, self._generation(bucket)) for bucket in buckets)
+            start = offset + self._SLOT.size
+            self._map[start:start + length] = encoded_key + tag_bytes + data
+            self._SLOT.pack_into(self._map, offset, key_hash, time.time() + ttl, self._epoch(), length,
+                                 len(encoded_key), len(buckets))
+
+    def delete(self, keys: Iterable[str]) -> None:
+        with self._locked(exclusive=True):
+            for key in keys:
+                offset = self._find(_stable_hash(key), key.encode())
+                if offset is not None:
+                    # A zero length marks the slot empty
+                    self._SLOT.pack_into(self._map, offset, 0, 0.0, 0, 0, 0, 0)
+
+    def invalidate_tags(self, tags: Iterable[str]) -> int:
+        buckets = {_stable_hash(tag) % self.TAG_BUCKETS for tag in tags}
+        with self._locked(exclusive=True):
+            for bucket in buckets:
+                offset = self._tags_offset + bucket * self._GENERATION.size
+                self._GENERATION.pack_into(self._map, offset, self._generation(bucket) + 1)
+        # Entries are dropped lazily, so their number is unknown here
+        return 0
+
+    def delete_prefix(self, prefix: str) -> None:
+        self.clear()
+
+    def clear(self) -> None:
+        with self._locked(exclusive=True):
+            magic, slots, slot_size, epoch = self._HEADER.unpack_from(self._map, 0)
+            self._HEADER.pack_into(self._map, 0, magic, slots, slot_size, epoch + 1)
+
+    def close(self) -> None:
+        self._map.close()
+        os.close(self._fd)
+
+    def _find(self, key_hash: int, encoded_key: bytes) -> Optional[int]:
+        for offset in self._set_offsets(key_hash):
+            slot_hash, _, _, length, key_length, _ = self._SLOT.unpack_from(self._map, offset)
+            start = offset + self._SLOT.size
+            if length and slot_hash == key_hash and bytes(self._map[start:start + key_length]) == encoded_key:
+                return offset
+        return None
+
+    def _pick_slot(self, key_hash: int, encoded_key: bytes) -> int:
+        # Same key, else an empty or dead slot, else the one expiring first
+        offset = self._find(key_hash, encoded_key)
+        if offset is not None:
+            return offset
+        now = time.time()
+        epoch = self._epoch()
+        victim, victim_expiry = None, None
+        for offset in self._set_offsets(key_hash):
+            _, expires_at, slot_epoch, length, _, _ = self._SLOT.unpack_from(self._map, offset)
+            if length == 0 or expires_at <= now or slot_epoch != epoch:
+                expires_at = float("-inf")
+            if victim is None or expires_at < victim_expiry:
+                victim, victim_expiry = offset, expires_at
+        return victim
+
+    def _set_offsets(self, key_hash: int) -> List[int]:
+        first = (key_hash % (self.slots // self.WAYS)) * self.WAYS
+        return [self._slots_offset + (first + way) * self.slot_size for way in range(self.WAYS)]
+
+    def _epoch(self) -> int:
+        return self._HEADER.unpack_from(self._map, 0)[3]
+
+    def _generation(self, bucket: int) -> int:
+        return self._GENERATION.unpack_from(self._map, self._tags_offset + bucket * self._GENERATION.size)[0]
+
+    def _header_matches(self) -> bool:
+        header = os.pread(self._fd, self._HEADER.size, 0)
+        if len(header) != self._HEADER.size:
+            return False
+        magic, slots, slot_size, _ = self._HEADER.unpack(header)
+        return magic == self.MAGIC and slots == self.slots and slot_size == self.slot_size
+
+    @contextmanager
+    def _locked(self, exclusive: bool):
+        # flock only excludes other processes; the thread lock covers this one's threads
+        with self._lock:
+            self._fcntl.flock(self._fd, self._fcntl.LOCK_EX if exclusive else self._fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                self._fcntl.flock(self._fd, self._fcntl.LOCK_UN)
@@ -0,0 +1,110 @@
+import json
+import struct
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from pydantic import BaseModel
+from model.DTOs.AchievementDTO import AchievementRule, AchievementStatusOut
+from model.DTOs.MovieDTO import MovieOut, MoviePage
+from model.DTOs.UserDTO import UserOut
+from service.AchievementHandlers import SubscriptionIndex
+from service.EncodedResponse import EncodedBody
+
+MAGIC = b"CJ1"
+# Length of the JSON document; the raw byte strings it refers to follow it
+_LENGTH = struct.Struct("<I")
+
+# name -> (type, dump to an encodable value, rebuild from the decoded one)
+_TYPES: Dict[str, Tuple[type, Callable[[Any], Any], Callable[[Any], Any]]] = {}
+_NAMES: Dict[type, str] = {}
+
+
+class CacheCodecError(ValueError): pass
+
+
+def register(cls: type, dump: Optional[Callable[[Any], Any]] = None, load: Optional[Callable[[Any], Any]] = None) -> None:
+    """Allows instances of ``cls`` in values stored in a shared cache backend.
+
+    ``dump`` turns an instance into something encodable and ``load`` rebuilds
+    it. Pydantic models default to their JSON-mode dump and model_validate.
+    """
+    if dump is None or load is None:
+        if not issubclass(cls, BaseModel):
+            raise TypeError(f"{cls.__name__} needs dump and load functions")
+        dump, load = (lambda model: model.model_dump(mode="json")), cls.model_validate
+    name = cls.__name__
+    if _TYPES.get(name, (cls,))[0] is not cls:
+        raise ValueError(f"Another type is already registered as {name}")
+    _TYPES[name] = (cls, dump, load)
+    _NAMES[cls] = name
+
+
+def encode(value: Any) -> bytes:
+    """Encodes ``value`` as JSON tagged with registered type names; bytes are appended raw."""
+    blobs: List[bytes] = []
+    document = json.dumps(_encode(value, blobs), separators=(",", ":")).encode()
+    return b"".join([MAGIC, _LENGTH.pack(len(document)), document, *blobs])
+
+
+def decode(data: bytes) -> Any:
+    """Rebuilds a value written by encode. Only registered types are ever constructed."""
+    data = memoryview(data)
+    start = len(MAGIC) + _LENGTH.size
+    if bytes(data[:len(MAGIC)]) != MAGIC or len(data) < start:
+        raise CacheCodecError("Not an encoded cache value")
+    (length,) = _LENGTH.unpack_from(data, len(MAGIC))
+    try:
+        document = json.loads(bytes(data[start:start + length]))
+        return _decode(document, data[start + length:])
+    except CacheCodecError:
+        raise
+    except (ValueError, TypeError, KeyError, IndexError) as e:
+        raise CacheCodecError(f"Corrupt cache value: {e}") from e
+
+
+def _encode(value: Any, blobs: List[bytes]) -> Any:
+    # Registered types first: EncodedBody is a tuple, and models must keep their type
+    name = _NAMES.get(type(value))
+    if name is not None:
+        return {"$": name, "v": _encode(_TYPES[name][1](value), blobs)}
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, bytes):
+        offset = sum(len(blob) for blob in blobs)
+        blobs.append(value)
+        return {"$": "bytes", "v": [offset, len(value)]}
+    if isinstance(value, (list, tuple)):
+        return {"$": type(value).__name__, "v": [_encode(item, blobs) for item in value]}
+    if isinstance(value, dict) and all(isinstance(key, str) for key in value):
+        return {"$": "dict", "v": {key: _encode(item, blobs) for key, item in value.items()}}
+    raise CacheCodecError(f"Cannot encode {type(value).__name__} for a shared cache")
+
+
+def _decode(document: Any, blobs: memoryview) -> Any:
+    if not isinstance(document, dict):
+        return document
+    kind, value = document["$"], document["v"]
+    if kind == "bytes":
+        offset, length = value
+        if offset + length > len(blobs):
+            raise CacheCodecError("Truncated cache value")
+        return bytes(blobs[offset:offset + length])
+    if kind == "list":
+        return [_decode(item, blobs) for item in value]
+    if kind == "tuple":
+        return tuple(_decode(item, blobs) for item in value)
+    if kind == "dict":
+        return {key: _decode(item, blobs) for key, item in value.items()}
+    registered = _TYPES.get(kind)
+    if registered is None:
+        raise CacheCodecError(f"Unknown cached type {kind}")
+    return registered[2](_decode(value, blobs))
+
+
+# The types the services cache. Encoded bodies keep their bytes raw; the catalog
+# index travels as its rules and is rebuilt against this worker's handlers.
+register(MovieOut)
+register(MoviePage)
+register(UserOut)
+register(AchievementStatusOut)
+register(AchievementRule)
+register(EncodedBody, tuple, lambda fields: EncodedBody(*fields))
+register(SubscriptionIndex, lambda index: index.achievements, SubscriptionIndex)
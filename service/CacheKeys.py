@@ -0,0 +1,73 @@
+from typing import Iterable, List, Optional
+from db import after_commit
+from service.CacheService import CacheService
+
+# Keys and tags of the per-entity cache entries, shared by every service that
+# reads or writes those entities. Keys start with the prefix the bulk paths
+# clear ("movies_", "users_", "achievements_").
+
+# Carried by every entry that shows a movie's rating, so bulk rating changes
+# can drop them all at once
+RATINGS_TAG = "movies:ratings"
+
+
+def movie_tag(id: int) -> str:
+    # Also carried by the list and search pages holding the movie
+    return f"movie:{id}"
+
+
+def movie_key(id: int) -> str:
+    return f"movies_id_{id}"
+
+
+def movie_rating_key(id: int) -> str:
+    return f"movies_rating_{id}"
+
+
+def user_key(id: int) -> str:
+    return f"users_id_{id}"
+
+
+# The achievement catalog's subscription index; achievements only change by seeding
+ACHIEVEMENTS_CATALOG_KEY = "achievements_catalog"
+
+
+def achievements_status_key(user_id: int) -> str:
+    return f"achievements_status_{user_id}"
+
+
+def rated_movie_keys(movie_ids: Iterable[int]) -> List[str]:
+    """Keys of everything showing the rating of ``movie_ids``, for when it changes."""
+    return [key for id in movie_ids for key in (movie_key(id), movie_rating_key(id), movie_version_key(id))]
+
+
+# Versions behind the ETags of conditional GETs, derived from the resource's
+# content (see ConditionalGet.content_version). They are cached so a 304 needs
+# no query and are dropped with the entries they describe; reloading one after
+# an eviction or expiry yields the same token as long as the data is unchanged.
+def movie_version_key(id: int) -> str:
+    return f"movies_version_{id}"
+
+
+def achievements_version_key(user_id: int) -> str:
+    return f"achievements_version_{user_id}"
+
+
+def invalidate(cache: Optional[CacheService], db, keys: Iterable[str] = (), tags: Iterable[str] = ()) -> None:
+    """Drops ``keys`` and ``tags`` now, and again once ``db`` commits.
+
+    The second pass catches entries refilled with the old data by reads that
+    ran while the write was still uncommitted.
+    """
+    if cache is None:
+        return
+    keys, tags = list(keys), list(tags)
+
+    def drop():
+        if keys:
+            cache.delete(*keys)
+        if tags:
+            cache.invalidate_tags(tags)
+    drop()
+    if db is not None:
+        after_commit(db, drop)
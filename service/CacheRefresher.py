@@ -0,0 +1,76 @@
+import asyncio
+import logging
+from typing import Any, Callable, List, Optional
+
+from starlette.concurrency import run_in_threadpool
+
+from service.CacheService import CacheService
+
+
+class CacheRefresher:
+    """Background workers that reload stale cache entries off the request path.
+
+    While running it is the cache's schedule_refresh: get_or_load hands it a
+    job for a stale entry and returns the stale value right away. A worker
+    runs the job in the threadpool on a session of its own, since the
+    request's session is gone by then. stop() runs the jobs already queued,
+    as their keys stay in flight until they finish.
+    """
+
+    def __init__(self, cache: CacheService, session_factory: Callable, workers: int = 2):
+        self.cache = cache
+        self.session_factory = session_factory
+        self.workers = workers
+        self.logger = logging.getLogger(__name__)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+
+    async def start(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue()
+        self._tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+        self.cache.schedule_refresh = self.schedule
+
+    async def stop(self) -> None:
+        if self._loop is None:
+            return
+        self.cache.schedule_refresh = None
+        self._loop = None
+        # Lets jobs handed over just before this land in the queue
+        await asyncio.sleep(0)
+        await self._queue.join()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def schedule(self, job: Callable[[Any], None]) -> bool:
+        """Queues ``job`` to run with a fresh session; False when not running, so the caller loads inline."""
+        loop = self._loop
+        if loop is None:
+            return False
+        try:
+            # Called from threadpool workers as well as from the loop itself
+            loop.call_soon_threadsafe(self._queue.put_nowait, job)
+        except RuntimeError:
+            return False
+        return True
+
+    async def _work(self) -> None:
+        while True:
+            job = await self._queue.get()
+            try:
+                await run_in_threadpool(self._run, job)
+            except Exception as e:
+                self.logger.error(f"Cache refresh failed: {e}")
+            finally:
+                self._queue.task_done()
+
+    def _run(self, job: Callable[[Any], None]) -> None:
+        db = self.session_factory()
+        try:
+            job(db)
+        finally:
+            # Refreshes only read, so there is nothing to commit
+            db.close()
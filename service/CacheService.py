@@ -1,39 +1,419 @@
+import asyncio
+import functools
+import sys
 import time
 import logging
-from typing import Any, Optional
+import threading
+from collections import Counter
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Iterable, Optional, Set, Tuple, Type
+from pydantic import BaseModel
+from sqlalchemy.util.concurrency import await_only, in_greenlet
+from service import CacheCodec
+from service.CacheBackend import CacheBackend
 from service.ConfigService import ConfigService
 
+STATS = ("hits", "misses", "stale_hits", "loads", "coalesced", "load_errors")
+
+
+class NegativeEntry:
+    """Cached in place of a value whose lookup raised a not-found error."""
+
+    def __init__(self, message: str):
+        self.message = message
+
+
+CacheCodec.register(NegativeEntry, lambda entry: entry.message, NegativeEntry)
+
+
+class PendingLoad:
+    """A load in progress and the invalidations that touched it while it ran."""
+
+    __slots__ = ("key", "dropped", "tags")
+
+    def __init__(self, key: str):
+        self.key = key
+        # Set when the key itself was deleted, cleared by prefix or with the whole cache
+        self.dropped = False
+        self.tags: Set[str] = set()
+
+    def outdated(self, tags: Iterable[str]) -> bool:
+        """Whether a result stored under ``tags`` may predate an invalidation."""
+        return self.dropped or not self.tags.isdisjoint(tags)
+
+
+def estimate_size(value: Any, _depth: int = 0) -> int:
+    """Approximate deep size in bytes of a cached value.
+
+    Containers and pydantic models are walked a few levels deep, which is
+    enough for the lists of DTOs this cache holds; it is a budget, not an audit.
+    """
+    size = sys.getsizeof(value)
+    if _depth >= 4:
+        return size
+    if isinstance(value, BaseModel):
+        return size + sum(estimate_size(v, _depth + 1) for v in value.__dict__.values())
+    if isinstance(value, dict):
+        return size + sum(estimate_size(k, _depth + 1) + estimate_size(v, _depth + 1) for k, v in value.items())
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return size + sum(estimate_size(v, _depth + 1) for v in value)
+    return size
+
 
 class CacheService:
-    def __init__(self, config_service: ConfigService):
+    """In-process LRU cache with TTL expiry, bounded by entry count and bytes.
+
+    Entries live in a plain dict, whose insertion order doubles as recency
+    order: a hit re-inserts its key at the end and eviction pops from the
+    front, both O(1). Expired entries are dropped when read and by a sweep
+    that set() runs at most every ``cache_sweep_interval_seconds``.
+
+    Entries may carry tags; a reverse index from tag to keys lets
+    invalidate_tags drop exactly the tagged entries without scanning the rest.
+
+    With a ``backend`` the entries live there instead, encoded by CacheCodec,
+    so that all workers share them and see each other's invalidations. Only
+    types registered with the codec can be stored there. Backend errors are
+    logged and treated as misses; the cache never fails a request.
+
+    get_or_load runs at most one loader per key at a time (single flight).
+    With ``cache_stale_seconds`` > 0 an entry stays servable that long past
+    its TTL. Callers that pass a ``refresh`` function get the stale value at
+    once while a CacheRefresher reloads it in the background on its own
+    session; without one, or while no refresher is running, the first caller
+    to see it stale reloads it inline and everyone else gets the stale value
+    without waiting. It can also cache "not found" outcomes for
+    ``cache_negative_ttl_seconds``.
+    """
+
+    def __init__(self, config_service: ConfigService, backend: Optional[CacheBackend] = None):
         self.config_service = config_service
+        self.backend = backend
+        # key -> (value, expires_at, size, tags, fresh_until)
         self._cache = {}
+        self._tags: Dict[str, Set[str]] = {}
+        self._bytes = 0
         self._ttl = self.config_service.get("cache_ttl_seconds", 60)
+        self._max_entries = self.config_service.get("cache_max_entries", 10000)
+        self._max_bytes = self.config_service.get("cache_max_bytes", 64 * 1024 * 1024)
+        self._sweep_interval = self.config_service.get("cache_sweep_interval_seconds", 30)
+        self._next_sweep = time.monotonic() + self._sweep_interval
+        self._single_flight = self.config_service.get("cache_single_flight", True)
+        self._stale_seconds = self.config_service.get("cache_stale_seconds", 0)
+        self._load_timeout = self.config_service.get("cache_load_timeout_seconds", 10)
+        self._negative_ttl = self.config_service.get("cache_negative_ttl_seconds", 5)
+        self._lock = threading.Lock()
+        # key -> future of the load in progress
+        self._flights: Dict[str, Future] = {}
+        # Loads in progress; an invalidation marks those it touches so their results are not stored
+        self._pending: Set[PendingLoad] = set()
+        self._stats = Counter()
+        # Set by a running CacheRefresher: takes a job(session) and returns whether it was queued
+        self.schedule_refresh: Optional[Callable[[Callable[[Any], None]], bool]] = None
         self.logger = logging.getLogger(__name__)
         self.logger.debug(f"CacheService initialized. ID: {id(self)}")
 
     def get(self, key: str) -> Optional[Any]:
-        self.logger.debug(f"Cache GET key='{key}'. Cache keys: {list(self._cache.keys())}")
-        if key in self._cache:
-            data, timestamp = self._cache[key]
-            if time.time() - timestamp < self._ttl:
-                self.logger.debug("Cache HIT")
-                return data
-            else:
-                self.logger.debug("Cache EXPIRED")
-                del self._cache[key]
-        else:
-            self.logger.debug("Cache MISS")
-        return None
+        value, stale = self._lookup(key)
+        return None if stale else value
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None, tags: Iterable[str] = ()):
+        """Stores ``value`` for ``ttl`` seconds, or for ``cache_ttl_seconds`` when not given.
 
-    def set(self, key: str, value: Any):
+        The entry is dropped by invalidate_tags for any of ``tags``.
+        """
+        tags = tuple(set(tags))
+        ttl = self._ttl if ttl is None else ttl
         self.logger.debug(f"Cache SET key='{key}'")
-        self._cache[key] = (value, time.time())
+        if self.backend is not None:
+            # The value travels with its fresh-until time; the backend keeps it through the stale window
+            try:
+                data = CacheCodec.encode((time.time() + ttl, value))
+            except CacheCodec.CacheCodecError as e:
+                self.logger.warning(f"Cache value for key='{key}' not stored: {e}")
+                return
+            self._call_backend("set", key, data, ttl + self._stale_seconds, tags)
+            return
+        size = estimate_size(key) + estimate_size(value)
+        now = time.monotonic()
+        with self._lock:
+            self._discard(key)
+            if size > self._max_bytes:
+                self.logger.debug(f"Cache value for key='{key}' exceeds the byte budget, not stored")
+                return
+            if now >= self._next_sweep:
+                self._sweep(now)
+            self._cache[key] = (value, now + ttl + self._stale_seconds, size, tags, now + ttl)
+            self._bytes += size
+            for tag in tags:
+                self._tags.setdefault(tag, set()).add(key)
+            while len(self._cache) > self._max_entries or self._bytes > self._max_bytes:
+                self._discard(next(iter(self._cache)))
+
+    def get_or_load(self, key: str, loader: Callable[[], Any], ttl: Optional[float] = None,
+                    tags_of: Optional[Callable[[Any], Iterable[str]]] = None,
+                    not_found: Optional[Type[Exception]] = None,
+                    refresh: Optional[Callable[[Any], Any]] = None) -> Any:
+        """Returns the cached value for ``key``, calling ``loader`` to fill it on a miss.
+
+        Concurrent misses on one key share a single loader call. ``tags_of``
+        maps the loaded value to the tags it is stored with. When the loader
+        raises ``not_found``, that outcome is cached for the negative TTL and
+        re-raised on hits. ``refresh`` is the loader as a function of a
+        database session, used to reload a stale entry in the background.
+        """
+        value, stale = self._lookup(key)
+        if value is not None and not stale:
+            self._count("hits")
+            return self._unwrap(value, not_found)
+        load = functools.partial(self._load, key, loader, ttl, tags_of, not_found)
+        if not self._single_flight:
+            self._count("misses")
+            return load()
+
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = Future()
+        if not leader:
+            if value is not None:
+                self._count("stale_hits")
+                return self._unwrap(value, not_found)
+            self._count("coalesced")
+            return self._wait(flight, key, load)
+
+        if value is not None and refresh is not None and self._refresh_later(key, flight, refresh, ttl, tags_of, not_found):
+            self._count("stale_hits")
+            return self._unwrap(value, not_found)
+
+        # Without a background refresh the leader reloads even when it found a stale value
+        self._count("misses")
+        try:
+            result = load()
+        except BaseException as e:
+            flight.set_exception(e)
+            raise
+        else:
+            flight.set_result(result)
+            return result
+        finally:
+            # Callers from here on find the stored value or start a new load
+            with self._lock:
+                self._flights.pop(key, None)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            stats = {name: self._stats[name] for name in STATS}
+            stats["in_flight"] = len(self._flights)
+            stats["entries"] = len(self._cache)
+            stats["bytes"] = self._bytes
+        return stats
+
+    def delete(self, *keys: str) -> None:
+        self._outdate_loads(set(keys).__contains__)
+        if self.backend is not None:
+            self._call_backend("delete", list(keys))
+            return
+        with self._lock:
+            for key in keys:
+                self._discard(key)
+
+    def sweep(self) -> int:
+        """Drops every expired entry and returns how many were removed."""
+        with self._lock:
+            return self._sweep(time.monotonic())
+
+    def invalidate_tags(self, tags: Iterable[str]) -> int:
+        """Drops every entry tagged with any of ``tags`` and returns how many were removed."""
+        tags = list(tags)
+        self._outdate_loads(tags=tags)
+        if self.backend is not None:
+            return self._call_backend("invalidate_tags", tags) or 0
+        with self._lock:
+            keys = set()
+            for tag in tags:
+                keys |= self._tags.get(tag, set())
+            for k in keys:
+                self._discard(k)
+        if keys:
+            self.logger.debug(f"Cache invalidated {len(keys)} entries")
+        return len(keys)
 
     def clear_all_starting_with(self, prefix: str):
-        keys_to_delete = [k for k in self._cache.keys() if k.startswith(prefix)]
-        for k in keys_to_delete:
-            del self._cache[k]
+        self._outdate_loads(lambda key: key.startswith(prefix))
+        if self.backend is not None:
+            self._call_backend("delete_prefix", prefix)
+            return
+        with self._lock:
+            keys_to_delete = [k for k in self._cache.keys() if k.startswith(prefix)]
+            for k in keys_to_delete:
+                self._discard(k)
 
     def clear(self):
-        self._cache.clear()
+        self._outdate_loads(lambda key: True)
+        if self.backend is not None:
+            self._call_backend("clear")
+            return
+        with self._lock:
+            self._cache.clear()
+            self._tags.clear()
+            self._bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._cache)
+
+    @property
+    def size_bytes(self) -> int:
+        return self._bytes
+
+    def _lookup(self, key: str) -> Tuple[Optional[Any], bool]:
+        # (value, stale), or (None, False) on a miss
+        if self.backend is not None:
+            data = self._call_backend("get", key)
+            if data is None:
+                self.logger.debug(f"Cache MISS key='{key}'")
+                return None, False
+            try:
+                fresh_until, value = CacheCodec.decode(data)
+            except (TypeError, ValueError) as e:
+                # Written by another version, or not by this cache at all
+                self.logger.warning(f"Cache value for key='{key}' ignored: {e}")
+                return None, False
+            self.logger.debug(f"Cache HIT key='{key}'")
+            return value, time.time() >= fresh_until
+        with self._lock:
+            entry = self._cache.pop(key, None)
+            if entry is None:
+                self.logger.debug(f"Cache MISS key='{key}'")
+                return None, False
+            value, expires_at, _, _, fresh_until = entry
+            now = time.monotonic()
+            if now >= expires_at:
+                self.logger.debug(f"Cache EXPIRED key='{key}'")
+                self._release(key, entry)
+                return None, False
+            # Re-inserting moves the key to the most recently used end
+            self._cache[key] = entry
+            self.logger.debug(f"Cache HIT key='{key}'")
+            return value, now >= fresh_until
+
+    def _load(self, key: str, loader: Callable[[], Any], ttl: Optional[float],
+              tags_of: Optional[Callable[[Any], Iterable[str]]], not_found: Optional[Type[Exception]]) -> Any:
+        self._count("loads")
+        pending = PendingLoad(key)
+        with self._lock:
+            self._pending.add(pending)
+        try:
+            try:
+                value = loader()
+            except Exception as e:
+                if not_found is not None and isinstance(e, not_found):
+                    if not pending.outdated(()):
+                        self.set(key, NegativeEntry(str(e)), self._negative_ttl)
+                else:
+                    self._count("load_errors")
+                raise
+            tags = tuple(tags_of(value)) if tags_of else ()
+            # Only an invalidation of this key or of one of its tags can have made the value stale
+            if not pending.outdated(tags):
+                self.set(key, value, ttl, tags)
+            return value
+        finally:
+            with self._lock:
+                self._pending.discard(pending)
+
+    @staticmethod
+    def _unwrap(value: Any, not_found: Optional[Type[Exception]]) -> Any:
+        if isinstance(value, NegativeEntry):
+            if not_found is None:
+                return None
+            raise not_found(value.message)
+        return value
+
+    def _refresh_later(self, key: str, flight: Future, refresh: Callable[[Any], Any], ttl: Optional[float],
+                       tags_of: Optional[Callable[[Any], Iterable[str]]], not_found: Optional[Type[Exception]]) -> bool:
+        # Hands the reload to the refresher, which completes the flight once it is done
+        schedule = self.schedule_refresh
+        if schedule is None:
+            return False
+
+        def job(db) -> None:
+            try:
+                flight.set_result(self._load(key, functools.partial(refresh, db), ttl, tags_of, not_found))
+            except BaseException as e:
+                flight.set_exception(e)
+                if not_found is None or not isinstance(e, not_found):
+                    raise
+            finally:
+                with self._lock:
+                    self._flights.pop(key, None)
+
+        return schedule(job)
+
+    def _wait(self, flight: Future, key: str, load: Callable[[], Any]) -> Any:
+        try:
+            if in_greenlet():
+                # Inside AsyncSession.run_sync the leader runs on this same event loop,
+                # so wait by yielding to the loop instead of blocking it. shield keeps a
+                # timeout here from cancelling the leader's future.
+                waiter = asyncio.shield(asyncio.wrap_future(flight))
+                return await_only(asyncio.wait_for(waiter, self._load_timeout))
+            try:
+                asyncio.get_running_loop()
+            except RuntimeError:
+                return flight.result(timeout=self._load_timeout)
+        except TimeoutError:
+            self.logger.warning(f"Cache load of key='{key}' timed out, loading again")
+        # Sync code on the event loop thread must not block, so it loads on its own
+        return load()
+
+    def _outdate_loads(self, matches: Callable[[str], bool] = lambda key: False, tags: Iterable[str] = ()) -> None:
+        # Marks the loads in progress whose key ``matches`` and records ``tags`` on all of them,
+        # since a load's tags are only known once its value is
+        with self._lock:
+            for pending in self._pending:
+                if matches(pending.key):
+                    pending.dropped = True
+                pending.tags.update(tags)
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self._stats[name] += 1
+
+    def _call_backend(self, method: str, *args):
+        call = functools.partial(getattr(self.backend, method), *args)
+        try:
+            if self.backend.remote and in_greenlet():
+                # Inside AsyncSession.run_sync this thread runs the event loop, which must
+                # not wait on the network; hand the call to a thread and yield meanwhile
+                return await_only(asyncio.to_thread(call))
+            return call()
+        except Exception as e:
+            self.logger.warning(f"Cache backend {method} failed: {e}")
+            return None
+
+    def _discard(self, key: str) -> None:
+        entry = self._cache.pop(key, None)
+        if entry is not None:
+            self._release(key, entry)
+
+    def _release(self, key: str, entry: tuple) -> None:
+        # Accounting for an entry already popped from _cache
+        _, _, size, tags, _ = entry
+        self._bytes -= size
+        for tag in tags:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+    def _sweep(self, now: float) -> int:
+        self._next_sweep = now + self._sweep_interval
+        expired = [k for k, (_, expires_at, _, _, _) in self._cache.items() if now >= expires_at]
+        for k in expired:
+            self._discard(k)
+        if expired:
+            self.logger.debug(f"Cache sweep removed {len(expired)} expired entries")
+        return len(expired)
@@ -0,0 +1,37 @@
+import hashlib
+from typing import Dict, Optional
+from fastapi import Request, Response, status
+from service.ConfigService import ConfigService
+
+
+def content_version(body: bytes) -> str:
+    """Version token of a serialized resource.
+
+    It depends on nothing but the data, so every worker derives the same
+    token, and it survives cache eviction, expiry and restarts.
+    """
+    return hashlib.blake2b(body, digest_size=8).hexdigest()
+
+
+def validators(version: Optional[str], config: ConfigService, route: str) -> Dict[str, str]:
+    """ETag for a resource ``version``, plus the Cache-Control configured for ``route``."""
+    headers = {}
+    if version is not None:
+        headers["ETag"] = f'W/"{version}"'
+    cache_control = config.get("cache_control", {}).get(route)
+    if cache_control:
+        headers["Cache-Control"] = cache_control
+    return headers
+
+
+def not_modified(request: Request, headers: Dict[str, str]) -> Optional[Response]:
+    """A 304 carrying ``headers`` when the request's If-None-Match has the current ETag, else None."""
+    etag = headers.get("ETag")
+    if_none_match = request.headers.get("if-none-match")
+    if etag is None or not if_none_match:
+        return None
+    # Weak comparison, as GET revalidation calls for
+    candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    if "*" in candidates or etag.removeprefix("W/") in candidates:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return None
@@ -0,0 +1,38 @@
+import gzip
+from typing import Any, NamedTuple, Optional, Tuple
+from fastapi import Request, Response
+from pydantic import TypeAdapter
+from service.ConditionalGet import content_version
+
+
+class EncodedBody(NamedTuple):
+    """A JSON response body as it goes on the wire, cached and sent without re-encoding."""
+
+    body: bytes
+    # Same body gzip-compressed, when it was large enough to be worth it
+    gzipped: Optional[bytes] = None
+    headers: Tuple[Tuple[str, str], ...] = ()
+    # content_version of body, hashed once when the body is encoded
+    version: Optional[str] = None
+
+
+def encode_body(value: Any, adapter: TypeAdapter, gzip_min_bytes: Optional[int] = None,
+                headers: Tuple[Tuple[str, str], ...] = ()) -> EncodedBody:
+    """Serializes ``value`` like its response_model would, and gzips bodies of at least ``gzip_min_bytes``."""
+    body = adapter.dump_json(value)
+    gzipped = None
+    if gzip_min_bytes is not None and len(body) >= gzip_min_bytes:
+        # mtime=0 keeps the compressed bytes identical across workers and reloads
+        gzipped = gzip.compress(body, compresslevel=6, mtime=0)
+    return EncodedBody(body, gzipped, headers, content_version(body))
+
+
+def encoded_response(encoded: EncodedBody, request: Request) -> Response:
+    headers = dict(encoded.headers)
+    if encoded.gzipped is None:
+        return Response(encoded.body, media_type="application/json", headers=headers)
+    headers["Vary"] = "Accept-Encoding"
+    if "gzip" in request.headers.get("accept-encoding", "").lower():
+        headers["Content-Encoding"] = "gzip"
+        return Response(encoded.gzipped, media_type="application/json", headers=headers)
+    return Response(encoded.body, media_type="application/json", headers=headers)
@@ -0,0 +1,157 @@
+import asyncio
+import heapq
+import logging
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from starlette.concurrency import run_in_threadpool
+
+from model.DTOs.MovieDTO import MovieGenre
+from repository.MovieRepository import MovieRepository
+
+METRICS = ("average_rating", "view_count")
+
+
+class _Board:
+    """Top-``capacity`` movies by one score, as a dict of members plus a min-heap.
+
+    The heap holds (score, -id) so its root is the weakest member; entries whose
+    score no longer matches the member are stale and skipped lazily.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.scores: Dict[int, float] = {}
+        self._heap: List[Tuple[float, int]] = []
+        self._ranked: Optional[List[Tuple[int, float]]] = None
+
+    def update(self, movie_id: int, score: float) -> None:
+        if movie_id not in self.scores and len(self.scores) >= self.capacity:
+            self._drop_stale()
+            weakest_score, weakest_neg_id = self._heap[0]
+            if (score, -movie_id) <= (weakest_score, weakest_neg_id):
+                return
+            heapq.heappop(self._heap)
+            del self.scores[-weakest_neg_id]
+        self.scores[movie_id] = score
+        heapq.heappush(self._heap, (score, -movie_id))
+        self._ranked = None
+        if len(self._heap) > 2 * self.capacity + 16:
+            self._compact()
+
+    def remove(self, movie_id: int) -> None:
+        if self.scores.pop(movie_id, None) is not None:
+            self._ranked = None
+
+    def replace(self, entries: Iterable[Tuple[int, float]]) -> None:
+        self.scores = dict(entries)
+        self._ranked = None
+        self._compact()
+
+    def top(self, n: int) -> List[Tuple[int, float]]:
+        if self._ranked is None:
+            self._ranked = sorted(self.scores.items(), key=lambda item: (-item[1], item[0]))
+        return self._ranked[:n]
+
+    def _drop_stale(self) -> None:
+        while self._heap and self.scores.get(-self._heap[0][1]) != self._heap[0][0]:
+            heapq.heappop(self._heap)
+
+    def _compact(self) -> None:
+        self._heap = [(score, -movie_id) for movie_id, score in self.scores.items()]
+        heapq.heapify(self._heap)
+
+
+class Leaderboards:
+    """Top-N movies by average rating and by view count, globally and per genre.
+
+    Each board keeps ``size * slack`` members, so a member whose score drops can
+    usually be replaced from the slack without going back to the database.
+    Drift that incremental updates cannot see (a lowered score of a member while
+    an outsider is better) is cleared by LeaderboardRebuilder.
+    """
+
+    def __init__(self, size: int = 100, slack: int = 2):
+        self.size = size
+        self.capacity = size * slack
+        self._boards: Dict[Tuple[str, Optional[MovieGenre]], _Board] = {
+            (metric, genre): _Board(self.capacity) for metric in METRICS for genre in (None, *MovieGenre)
+        }
+        self._lock = threading.Lock()
+
+    def update(self, metric: str, movie_id: int, genre: MovieGenre, score: float) -> None:
+        with self._lock:
+            self._boards[(metric, None)].update(movie_id, score)
+            self._boards[(metric, MovieGenre(genre))].update(movie_id, score)
+
+    def update_movies(self, rows: Iterable) -> None:
+        """Updates both metrics from rows with id, genre, average_rating and view_count."""
+        for row in rows:
+            for metric in METRICS:
+                self.update(metric, row.id, row.genre, getattr(row, metric) or 0)
+
+    def remove(self, movie_id: int) -> None:
+        with self._lock:
+            for board in self._boards.values():
+                board.remove(movie_id)
+
+    def clear(self, metric: Optional[str] = None) -> None:
+        with self._lock:
+            for (board_metric, _), board in self._boards.items():
+                if metric is None or board_metric == metric:
+                    board.replace([])
+
+    def replace(self, metric: str, genre: Optional[MovieGenre], entries: Iterable[Tuple[int, float]]) -> None:
+        with self._lock:
+            self._boards[(metric, genre)].replace(entries)
+
+    def top(self, metric: str, genre: Optional[MovieGenre] = None, n: int = 10) -> List[Tuple[int, float]]:
+        with self._lock:
+            return self._boards[(metric, genre)].top(min(n, self.size))
+
+    def rebuild(self, repository: MovieRepository) -> None:
+        for metric in METRICS:
+            for genre in (None, *MovieGenre):
+                self.replace(metric, genre, repository.get_top_scores(metric, genre, self.capacity))
+
+
+class LeaderboardRebuilder:
+    """Background task that rebuilds every board from the database on an interval."""
+
+    def __init__(self, leaderboards: Leaderboards, session_factory: Callable, interval: float = 300.0):
+        self.leaderboards = leaderboards
+        self.session_factory = session_factory
+        self.interval = interval
+        self.logger = logging.getLogger(__name__)
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        await self.rebuild()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def rebuild(self) -> None:
+        await run_in_threadpool(self._rebuild)
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.rebuild()
+            except Exception as e:
+                self.logger.error(f"Leaderboard rebuild failed: {e}")
+
+    def _rebuild(self) -> None:
+        db = self.session_factory()
+        try:
+            self.leaderboards.rebuild(MovieRepository(db))
+        finally:
+            db.close()
@@ -0,0 +1,84 @@
+import codecs
+import csv
+import io
+import json
+from typing import List, NamedTuple, Optional
+
+
+class ImportRecord(NamedTuple):
+    row: int
+    data: Optional[dict]
+    error: Optional[str] = None
+
+
+class MovieImportParser:
+    """Turns a streamed NDJSON or CSV request body into records, chunk by chunk.
+
+    Only the unfinished tail of the last line is kept between chunks, so memory
+    stays bounded no matter how large the upload is. CSV input must start with
+    a header row; quoted fields may span lines.
+    """
+
+    def __init__(self, content_type: str):
+        self.format = "csv" if "csv" in (content_type or "").lower() else "ndjson"
+        self._decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        self._tail = ""
+        self._line_no = 0
+        self._header: Optional[List[str]] = None
+        self._open_record: List[str] = []
+        self._record_start = 0
+
+    def feed(self, chunk: bytes) -> List[ImportRecord]:
+        text = self._tail + self._decoder.decode(chunk)
+        *lines, self._tail = text.split("\n")
+        return self._parse_lines(lines)
+
+    def close(self) -> List[ImportRecord]:
+        text = self._tail + self._decoder.decode(b"", final=True)
+        self._tail = ""
+        records = self._parse_lines([text] if text else [])
+        if self._open_record:
+            records.append(ImportRecord(self._record_start, None, "Unterminated quoted field"))
+            self._open_record = []
+        return records
+
+    def _parse_lines(self, lines: List[str]) -> List[ImportRecord]:
+        records = []
+        for line in lines:
+            self._line_no += 1
+            record = self._parse_csv_line(line) if self.format == "csv" else self._parse_ndjson_line(line)
+            if record is not None:
+                records.append(record)
+        return records
+
+    def _parse_ndjson_line(self, line: str) -> Optional[ImportRecord]:
+        if not line.strip():
+            return None
+        try:
+            data = json.loads(line)
+        except ValueError as e:
+            return ImportRecord(self._line_no, None, f"Invalid JSON: {e}")
+        if not isinstance(data, dict):
+            return ImportRecord(self._line_no, None, "Expected a JSON object")
+        return ImportRecord(self._line_no, data)
+
+    def _parse_csv_line(self, line: str) -> Optional[ImportRecord]:
+        # An odd number of quotes means a quoted field continues on the next line.
+        if not self._open_record:
+            self._record_start = self._line_no
+        self._open_record.append(line)
+        text = "\n".join(self._open_record)
+        if text.count('"') % 2:
+            return None
+        self._open_record = []
+        if not text.strip():
+            return None
+
+        values = next(csv.reader(io.StringIO(text)))
+        if self._header is None:
+            self._header = [name.strip() for name in values]
+            return None
+        if len(values) != len(self._header):
+            return ImportRecord(self._record_start, None, f"Expected {len(self._header)} columns, got {len(values)}")
+        # Empty CSV cells mean "not set" for the optional fields
+        return ImportRecord(self._record_start, {k: (v if v != "" else None) for k, v in zip(self._header, values)})
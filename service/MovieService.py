@@ -1,68 +1,374 @@
-from typing import Optional
+from types import SimpleNamespace
+from typing import Any, Callable, Iterable, List, Optional
+from pydantic import TypeAdapter, ValidationError
+from db import after_commit
 from model import MovieORM
-from model.DTOs.MovieDTO import MovieCreate, MovieUpdate, MovieOut, MovieGenre
+from model.DTOs.MovieDTO import (MovieCreate, MovieUpdate, MovieOut, MovieGenre, MovieFilter, MoviePage, MovieSuggestion,
+                                 MovieSort, RatingHistogram, BulkImportReport, BulkRowError)
 from repository.MovieRepository import MovieRepository
 from repository.UserRepository import UserRepository
 from repository.UserRatingRepository import UserRatingRepository
+from repository.UserStatsRepository import UserStatsRepository
+from repository.exceptions import MovieNotFoundException
 from service.CacheService import CacheService
+from service.CacheKeys import RATINGS_TAG, invalidate, movie_key, movie_rating_key, movie_tag, movie_version_key
+from service.ConditionalGet import content_version
 from service.ConfigService import ConfigService
+from service.EncodedResponse import EncodedBody, encode_body
+from service.MovieImport import ImportRecord
+from service.PageCursor import encode_cursor, decode_cursor
+from service.exceptions import InvalidCursorException
+from service.Leaderboards import METRICS, Leaderboards
+from service.RatingHistogram import summarize
+from service.TitlePrefixIndex import RANKINGS, TitlePrefixIndex
+from service.ViewCounterBuffer import ViewCounterBuffer
+
+# Cache tags for movie list and search pages. Every page is tagged with the ids it
+# holds, list pages with their genre ("all" when unfiltered by genre), and filtered
+# or sorted list pages additionally with a filtered tag for their genre.
+SEARCH_TAG = "movies:search"
+SEARCHED_FIELDS = {"title", "director", "description"}
+
+# Encodes list pages exactly as the List[MovieOut] response_model would
+MOVIE_LIST = TypeAdapter(List[MovieOut])
+
+# Sort name of search cursors, whose key is the rank
+SEARCH_SORT = "rank"
+# Types a cursor's sort key may have for each sort; a key of another type would
+# be compared against the wrong column.
+SORT_KEY_TYPES = {
+    MovieSort.AVERAGE_RATING: (int, float),
+    MovieSort.VIEW_COUNT: int,
+    MovieSort.YEAR: int,
+    MovieSort.TITLE: str,
+    SEARCH_SORT: (int, float),
+}
+
+
+def _fits_sort(key, sort) -> bool:
+    if sort is None:
+        return key is None
+    return isinstance(key, SORT_KEY_TYPES[sort]) and not isinstance(key, bool)
+
+
+def _genre_tag(genre: Optional[MovieGenre]) -> str:
+    return f"movies:genre:{getattr(genre, 'value', genre) if genre else 'all'}"
+
+
+def _filtered_tag(genre: Optional[MovieGenre]) -> str:
+    return f"movies:filtered:{getattr(genre, 'value', genre) if genre else 'all'}"
 
 
 class MovieService():
 
-    def __init__(self, repository: MovieRepository, rating_repository: UserRatingRepository, cache: CacheService, config: ConfigService):
+    def __init__(self, repository: MovieRepository, rating_repository: UserRatingRepository, cache: CacheService, config: ConfigService,
+                 view_counter: Optional[ViewCounterBuffer] = None, title_index: Optional[TitlePrefixIndex] = None,
+                 leaderboards: Optional[Leaderboards] = None, stats_repo: Optional[UserStatsRepository] = None):
         self.repository = repository
         self.rating_repository = rating_repository
         self.cache = cache
         self.config = config
+        self.view_counter = view_counter
+        self.title_index = title_index
+        self.leaderboards = leaderboards
+        self.stats_repo = stats_repo
 
     def create_movie(self, dto: MovieCreate) -> MovieOut:
         movie = self.repository.create_movie(dto)
-        self.cache.clear_all_starting_with("movies_")
+        # A new movie can enter any list of its genre, any unfiltered list, and any search;
+        # a lookup of its id may have been cached as not found
+        self._invalidate_movies([_genre_tag(movie.genre), _genre_tag(None), SEARCH_TAG],
+                                keys=[movie_key(movie.id), movie_rating_key(movie.id)])
+        self._index_title(movie.id, movie.title, movie.view_count, movie.average_rating)
+        self._rank_movie(movie)
         return MovieOut.model_validate(movie)
 
+    def import_movies(self, records: List[ImportRecord], report: Optional[BulkImportReport] = None) -> BulkImportReport:
+        """Validates one chunk of a bulk import and inserts the valid rows in a single statement.
+
+        Counts and per-row errors are accumulated into ``report`` across chunks.
+        The movie cache is left alone until finish_import.
+        """
+        report = report if report is not None else BulkImportReport()
+        report.received += len(records)
+
+        valid = {}
+        for record in records:
+            if record.error is not None:
+                report.errors.append(BulkRowError(row=record.row, error=record.error))
+                continue
+            try:
+                dto = MovieCreate.model_validate(record.data)
+            except ValidationError as e:
+                message = "; ".join(f"{'.'.join(str(p) for p in err['loc'])}: {err['msg']}" for err in e.errors())
+                report.errors.append(BulkRowError(row=record.row, error=message))
+                continue
+            if dto.title in valid:
+                report.duplicates += 1
+                report.errors.append(BulkRowError(row=record.row, error=f"Movie {dto.title} already exists"))
+                continue
+            valid[dto.title] = (record.row, dto)
+
+        inserted = self.repository.bulk_create_movies([dto for _, dto in valid.values()])
+        report.inserted += len(inserted)
+        if inserted and self.title_index is not None:
+            # One hook per chunk rather than one per inserted row
+            titles = {id: title for title, id in inserted.items()}
+            self._on_commit(lambda: self.title_index.add_titles(titles))
+        for title, (row, _) in valid.items():
+            if title not in inserted:
+                report.duplicates += 1
+                report.errors.append(BulkRowError(row=row, error=f"Movie {title} already exists"))
+        return report
+
+    def finish_import(self, report: BulkImportReport) -> BulkImportReport:
+        report.errors.sort(key=lambda e: e.row)
+        # One invalidation for the whole import instead of one per row
+        if report.inserted:
+            self._invalidate_movies()
+        return report
+
     def get_movie(self, id: int) -> MovieOut:
-        movie = self.repository.get_movie(id)
-        return MovieOut.model_validate(movie)
+        return self._read(movie_key(id), lambda repository: MovieOut.model_validate(repository.get_movie(id)),
+                          tags_of=lambda _: [movie_tag(id), RATINGS_TAG], not_found=MovieNotFoundException)
+
+    def get_movie_version(self, id: int) -> str:
+        # Hash of the movie get_movie serves, cached with it and dropped by every write that drops it
+        return self.cache.get_or_load(movie_version_key(id), lambda: content_version(self.get_movie(id).model_dump_json().encode()),
+                                      tags_of=lambda _: [movie_tag(id), RATINGS_TAG], not_found=MovieNotFoundException)
+
+    def get_all_movies(self, skip: int = 0, limit: Optional[int] = None, genre: Optional[MovieGenre] = None, cursor: Optional[str] = None,
+                       filters: Optional[MovieFilter] = None) -> list[MovieOut]:
+        if limit is None:
+            limit = self.config.get("default_page_size", 10)
+        cache_key, fetch, tags_of = self._list_read(skip, limit, genre, cursor, filters)
+        # Concurrent misses on one page share a single query
+        return self._read(cache_key, fetch, tags_of=tags_of)
 
-    def get_all_movies(self, skip: int = 0, limit: Optional[int] = None, genre: Optional[MovieGenre] = None) -> list[MovieOut]:
+    def get_movies_page(self, skip: int = 0, limit: Optional[int] = None, genre: Optional[MovieGenre] = None, cursor: Optional[str] = None,
+                        filters: Optional[MovieFilter] = None) -> MoviePage:
         if limit is None:
             limit = self.config.get("default_page_size", 10)
-            
-        cache_key = f"movies_skip_{skip}_limit_{limit}_genre_{genre}"
-        cached_data = self.cache.get(cache_key)
-        if cached_data is not None:
-            return cached_data
-            
+        items = self.get_all_movies(skip, limit, genre, cursor, filters)
+        return MoviePage(items=items, next_cursor=self._next_cursor(items, limit, filters))
+
+    def get_movies_page_encoded(self, skip: int = 0, limit: Optional[int] = None, genre: Optional[MovieGenre] = None,
+                                cursor: Optional[str] = None, filters: Optional[MovieFilter] = None) -> EncodedBody:
+        """get_movies_page as the final JSON body, with the next cursor as a header.
+
+        The encoded bytes are what gets cached, so a hit skips validation and
+        serialization entirely.
+        """
+        if limit is None:
+            limit = self.config.get("default_page_size", 10)
+        cache_key, fetch, tags_of = self._list_read(skip, limit, genre, cursor, filters, prefix="movies_json")
+        tags = []
+
+        def encode(repository: MovieRepository) -> EncodedBody:
+            items = fetch(repository)
+            tags[:] = tags_of(items)
+            next_cursor = self._next_cursor(items, limit, filters)
+            return encode_body(items, MOVIE_LIST, self.config.get("cache_gzip_min_bytes", 1024),
+                               (("X-Next-Cursor", next_cursor),) if next_cursor else ())
+
+        return self._read(cache_key, encode, tags_of=lambda _: tags)
+
+    def _list_read(self, skip: int, limit: int, genre: Optional[MovieGenre], cursor: Optional[str],
+                   filters: Optional[MovieFilter], prefix: str = "movies_list"):
+        # (cache key, fetch from a repository, tags_of) of one list page
+        filters = filters or MovieFilter()
+        after_id, after_key = None, None
+        if cursor:
+            sort = filters.sort.value if filters.sort is not None else None
+            after_id, after_key = decode_cursor(cursor, sort, filters.order.value)
+            if not _fits_sort(after_key, filters.sort):
+                raise InvalidCursorException(f"Invalid cursor: {cursor}")
+
+        def fetch(repository: MovieRepository) -> list[MovieOut]:
+            if filters != MovieFilter():
+                movies = repository.get_filtered(filters, genre, skip, limit, after_id, after_key)
+            elif after_id is not None:
+                movies = repository.get_page_after(after_id, limit, genre)
+            elif genre:
+                movies = repository.get_by_genre(genre, skip, limit)
+            else:
+                movies = repository.get_paginated(skip, limit)
+            return [MovieOut.model_validate(movie) for movie in movies]
+
+        def tags_of(result: list[MovieOut]) -> list[str]:
+            tags = [_genre_tag(genre), *(movie_tag(movie.id) for movie in result)]
+            if filters != MovieFilter():
+                # Which movies a filtered or sorted page holds depends on their field values
+                tags.append(_filtered_tag(genre))
+            return tags
+
+        return self._list_cache_key(skip, limit, genre, filters, after_id, after_key, prefix), fetch, tags_of
+
+    @staticmethod
+    def _next_cursor(items: List[MovieOut], limit: int, filters: Optional[MovieFilter]) -> Optional[str]:
+        # A short page means the end was reached; otherwise hand out the last id (and
+        # sort value, when sorted) to seek from.
+        if not items or len(items) != limit:
+            return None
+        filters = filters or MovieFilter()
+        sort = filters.sort.value if filters.sort is not None else None
+        return encode_cursor(items[-1].id, getattr(items[-1], sort) if sort else None, sort, filters.order.value)
+
+    @staticmethod
+    def _list_cache_key(skip: int, limit: int, genre: Optional[MovieGenre], filters: MovieFilter,
+                        after_id: Optional[int], after_key, prefix: str = "movies_list") -> str:
+        # Only the parameters that were actually set, in a fixed order, so equal
+        # filter sets share one entry however the query string was written.
+        params = filters.model_dump(mode="json", exclude_defaults=True)
         if genre:
-            movies = self.repository.get_by_genre(genre, skip, limit)
-        else:
-            movies = self.repository.get_paginated(skip, limit)
-            
-        result = [MovieOut.model_validate(movie) for movie in movies]
-        
-        self.cache.set(cache_key, result)
-        return result
+            params["genre"] = MovieGenre(genre).value
+        canonical = "&".join(f"{name}={params[name]}" for name in sorted(params))
+        position = f"after_{after_id}_{after_key}" if after_id is not None else f"skip_{skip}"
+        return f"{prefix}_{canonical}_{position}_limit_{limit}"
+
+    def search_movies(self, query: str, limit: Optional[int] = None, cursor: Optional[str] = None) -> MoviePage:
+        """Ranked full-text search over title, director and description."""
+        if limit is None:
+            limit = self.config.get("default_page_size", 10)
+        limit = min(limit, self.config.get("max_page_size", 100))
+        after = None
+        if cursor:
+            after_id, after_rank = decode_cursor(cursor, SEARCH_SORT)
+            if not _fits_sort(after_rank, SEARCH_SORT):
+                raise InvalidCursorException(f"Invalid cursor: {cursor}")
+            after = (after_rank, after_id)
+
+        normalized = " ".join(query.lower().split())
+        def load(repository: MovieRepository) -> MoviePage:
+            rows = repository.search(normalized, limit, after)
+            items = [MovieOut.model_validate(row) for row in rows]
+            # The rank of the last row is part of the cursor, so the next page seeks past it.
+            next_cursor = encode_cursor(rows[-1].id, rows[-1].rank, SEARCH_SORT) if rows and len(rows) == limit else None
+            return MoviePage(items=items, next_cursor=next_cursor)
+
+        cache_key = f"movies_search_{normalized}_after_{after}_limit_{limit}"
+        return self._read(cache_key, load, tags_of=lambda page: [SEARCH_TAG, *(movie_tag(item.id) for item in page.items)])
 
     def update_movie(self, id: int, dto: MovieUpdate) -> MovieOut:
+        old_genre = self.repository.get_movie(id).genre
         movie = self.repository.update_movie(id, dto)
-        self.cache.clear_all_starting_with("movies_")
+        # Pages holding the movie, plus pages whose membership may depend on what changed
+        tags = {movie_tag(id), _filtered_tag(None), _filtered_tag(old_genre), _filtered_tag(movie.genre)}
+        if movie.genre != old_genre:
+            tags |= {_genre_tag(old_genre), _genre_tag(movie.genre)}
+            if self.stats_repo is not None:
+                # Its raters' per-genre counters follow the movie to its new genre
+                self.stats_repo.move_movie_genre(id, old_genre, movie.genre)
+        if dto.model_fields_set & SEARCHED_FIELDS:
+            tags.add(SEARCH_TAG)
+        self._invalidate_movies(tags)
+        self._index_title(movie.id, movie.title, movie.view_count, movie.average_rating)
+        self._rank_movie(movie)
         return MovieOut.model_validate(movie)
 
     def delete_movie(self, id: int) -> None:
+        genre = self.repository.get_movie(id).genre
+        if self.stats_repo is not None:
+            # The movie's ratings go away through ON DELETE CASCADE
+            self.stats_repo.subtract_movie(id)
         self.repository.delete_movie(id)
-        self.cache.clear_all_starting_with("movies_")
+        # Offset pages after the movie shift up, so its genre's lists go too
+        self._invalidate_movies([movie_tag(id), _genre_tag(genre), _genre_tag(None)])
+        if self.title_index is not None:
+            self._on_commit(lambda: self.title_index.remove(id))
+        if self.leaderboards is not None:
+            self._on_commit(lambda: self.leaderboards.remove(id))
 
     def delete_all_movies(self) -> None:
         self.repository.delete_all_movies()
+        if self.stats_repo is not None:
+            self.stats_repo.clear()
+        self._invalidate_movies()
+        if self.title_index is not None:
+            self._on_commit(self.title_index.clear)
+        if self.leaderboards is not None:
+            self._on_commit(self.leaderboards.clear)
+
+    def get_top_movies(self, by: str = "average_rating", genre: Optional[MovieGenre] = None, n: int = 10) -> List[MovieOut]:
+        """Top movies by average rating or view count, read from the in-memory leaderboards."""
+        if by not in METRICS:
+            raise ValueError(f"Unknown leaderboard: {by}")
+        if self.leaderboards is None:
+            return []
+        ids = [movie_id for movie_id, _ in self.leaderboards.top(by, genre, n)]
+        # One primary-key lookup for the details, returned in leaderboard order
+        movies = {row.id: row for row in self.repository.get_by_ids(ids)}
+        return [MovieOut.model_validate(movies[id]) for id in ids if id in movies]
+
+    def autocomplete(self, prefix: str, limit: Optional[int] = None, by: str = "view_count") -> List[MovieSuggestion]:
+        """Top titles starting with prefix, served from the in-memory title index."""
+        if by not in RANKINGS:
+            raise ValueError(f"Unknown ranking: {by}")
+        if limit is None:
+            limit = self.config.get("autocomplete_limit", 10)
+        limit = min(limit, self.config.get("max_page_size", 100))
+        if self.title_index is None:
+            return []
+        return [MovieSuggestion(id=id, title=title) for id, title in self.title_index.search(prefix, limit, by)]
+
+    def _read(self, key: str, load: Callable[[MovieRepository], Any], **kwargs) -> Any:
+        # Cached read through ``load``: on the request's repository when missing, and on one
+        # of its own session when a stale entry is refreshed in the background
+        return self.cache.get_or_load(key, lambda: load(self.repository), refresh=lambda db: load(MovieRepository(db)), **kwargs)
+
+    def _index_title(self, id: int, title: str, view_count: int = 0, average_rating: float = 0.0) -> None:
+        if self.title_index is not None:
+            self._on_commit(lambda: self.title_index.add(id, title, view_count, average_rating))
+
+    def _rank_movie(self, movie: MovieORM.MovieORM) -> None:
+        if self.leaderboards is None:
+            return
+        # Snapshot now: the instance is expired by the time the commit hook runs
+        entry = SimpleNamespace(id=movie.id, genre=movie.genre, average_rating=movie.average_rating,
+                                view_count=movie.view_count)
+
+        def rank():
+            self.leaderboards.remove(entry.id)
+            self.leaderboards.update_movies([entry])
+        self._on_commit(rank)
+
+    def _on_commit(self, callback) -> None:
+        # Applied once the request's transaction commits, so a rolled back write
+        # never reaches in-memory state.
+        after_commit(getattr(self.repository, "db", None), callback)
+
+    def _invalidate_movies(self, tags: Optional[Iterable[str]] = None, keys: Iterable[str] = ()) -> None:
+        """Drops the cached movie entries with any of ``tags`` or ``keys``, or every one when tags is None."""
+        db = getattr(self.repository, "db", None)
+        if tags is not None:
+            invalidate(self.cache, db, keys, tags)
+            return
         self.cache.clear_all_starting_with("movies_")
+        # Clear again once the request commits, so a page read while the write was
+        # still uncommitted does not stay cached.
+        if db is not None:
+            after_commit(db, lambda: self.cache.clear_all_starting_with("movies_"))
 
     def get_movie_rating(self, movie_id: int) -> float:
-        # Ensure movie exists
+        def load(repository: MovieRepository) -> float:
+            # Read the maintained average instead of aggregating every rating
+            movie = repository.get_movie(movie_id)
+            rating = movie.average_rating
+            return rating if rating is not None else 0.0
+
+        return self._read(movie_rating_key(movie_id), load,
+                          tags_of=lambda _: [movie_tag(movie_id), RATINGS_TAG], not_found=MovieNotFoundException)
+
+    def get_rating_histogram(self, movie_id: int) -> RatingHistogram:
+        self.repository.get_movie(movie_id)
+        return summarize(movie_id, self.repository.get_rating_histogram(movie_id))
+
+    def watch_movie(self, movie_id: int) -> None:
+        # Ensure movie exists, then buffer the view; the flusher writes it out in a batch
         self.repository.get_movie(movie_id)
-        rating = self.rating_repository.get_average_rating(movie_id)
-        return rating if rating is not None else 0.0
-    # def watch_movie(self, movie_id: int, user_id: int) -> Movie:
-    #     # Необхідна перевірка на унікальність користувача
-    #     UserRepository.get_user(user_id)
-    #     MovieRepository.increment_view_count(movie_id)
+        if self.title_index is not None:
+            self.title_index.add_views(movie_id)
+        if self.view_counter is None:
+            self.repository.increment_view_count(movie_id)
+            return
+        self.view_counter.increment(movie_id)
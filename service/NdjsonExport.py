@@ -0,0 +1,29 @@
+import json
+import logging
+from typing import Iterable, Iterator, Type
+
+from pydantic import BaseModel
+
+logger = logging.getLogger(__name__)
+
+
+def ndjson_chunks(rows: Iterable, model: Type[BaseModel], rows_per_chunk: int = 500) -> Iterator[bytes]:
+    """Serializes rows one by one into NDJSON, grouped into chunks of rows_per_chunk lines.
+
+    The 200 status has already been sent by the time a row fails, so a failure
+    ends the stream with an {"error": ...} record instead of cutting it short.
+    """
+    lines = []
+    exported = 0
+    try:
+        for row in rows:
+            lines.append(model.model_validate(row).model_dump_json())
+            exported += 1
+            if len(lines) >= rows_per_chunk:
+                yield ("\n".join(lines) + "\n").encode()
+                lines = []
+    except Exception as e:
+        logger.error(f"NDJSON export failed after {exported} rows: {e}")
+        lines.append(json.dumps({"error": "export failed", "exported": exported}))
+    if lines:
+        yield ("\n".join(lines) + "\n").encode()
@@ -0,0 +1,31 @@
+import base64
+import json
+from typing import Any, Optional, Tuple
+
+from service.exceptions import InvalidCursorException
+
+
+def encode_cursor(last_id: int, sort_key: Any = None, sort: Optional[str] = None, order: str = "asc") -> str:
+    """Opaque cursor past ``last_id`` (and ``sort_key``) of a listing sorted by ``sort`` in ``order``."""
+    payload = {"id": last_id, "o": order}
+    if sort is not None:
+        payload["s"] = sort
+    if sort_key is not None:
+        payload["k"] = sort_key
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, sort: Optional[str] = None, order: str = "asc") -> Tuple[int, Optional[Any]]:
+    """(last id, sort key) of ``cursor``, rejecting one issued for another sort or order."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        last_id = payload["id"]
+        if not isinstance(last_id, int) or isinstance(last_id, bool):
+            raise ValueError("cursor id must be an integer")
+        if payload.get("s") != sort or payload.get("o") != order:
+            raise ValueError("cursor belongs to another sort or order")
+        return last_id, payload.get("k")
+    except (ValueError, KeyError, TypeError) as e:
+        raise InvalidCursorException(f"Invalid cursor: {cursor}") from e
@@ -0,0 +1,33 @@
+from typing import List, Optional
+
+from model.DTOs.MovieDTO import RatingHistogram
+
+PERCENTILES = (10, 25, 75, 90)
+
+
+def _nth_rating(buckets: List[int], rank: int) -> int:
+    # The rating at 1-based position rank when all ratings are sorted
+    seen = 0
+    for rating, count in enumerate(buckets):
+        seen += count
+        if seen >= rank:
+            return rating
+    return len(buckets) - 1
+
+
+def summarize(movie_id: int, buckets: List[int]) -> RatingHistogram:
+    """Count, mean, median and nearest-rank percentiles from the 11 buckets alone.
+
+    Every statistic walks the fixed number of buckets, so the cost does not
+    depend on how many ratings the movie has.
+    """
+    count = sum(buckets)
+    if count == 0:
+        return RatingHistogram(movie_id=movie_id, buckets=buckets, count=0)
+
+    mean = sum(rating * n for rating, n in enumerate(buckets)) / count
+    median: Optional[float] = _nth_rating(buckets, (count + 1) // 2)
+    if count % 2 == 0:
+        median = (median + _nth_rating(buckets, count // 2 + 1)) / 2
+    percentiles = {f"p{p}": _nth_rating(buckets, max(1, -(-p * count // 100))) for p in PERCENTILES}
+    return RatingHistogram(movie_id=movie_id, buckets=buckets, count=count, mean=mean, median=median, percentiles=percentiles)
@@ -0,0 +1,127 @@
+import heapq
+import threading
+from bisect import bisect_left, insort
+from typing import Dict, Iterable, List, Mapping, Tuple
+
+RANKINGS = ("view_count", "average_rating")
+# Prefixes this short match a large share of all titles, so their results are
+# memoized until the set of titles changes.
+MEMO_PREFIX_LENGTH = 2
+MEMO_SIZE = 4096
+
+
+def _normalize(title: str) -> str:
+    return " ".join(title.casefold().split())
+
+
+class TitlePrefixIndex:
+    """In-process index of movie titles for autocomplete.
+
+    Titles are kept as a sorted array of (normalized title, id), so the matches
+    for a prefix are one contiguous slice found with two bisects. The best
+    ``limit`` of them are picked by view count or average rating. View counts
+    bumped through add_views do not reset the short-prefix memo, so those
+    rankings may lag slightly until the next title change; rating changes
+    through set_rating drop the memoized average rating rankings.
+    """
+
+    def __init__(self):
+        self._keys: List[Tuple[str, int]] = []
+        # id -> (title, view_count, average_rating)
+        self._movies: Dict[int, Tuple[str, int, float]] = {}
+        self._memo: Dict[Tuple[str, int, str], List[Tuple[int, str]]] = {}
+        self._lock = threading.Lock()
+
+    def load(self, rows: Iterable) -> None:
+        movies = {row.id: (row.title, row.view_count or 0, row.average_rating or 0.0) for row in rows}
+        keys = sorted((_normalize(title), id) for id, (title, _, _) in movies.items())
+        with self._lock:
+            self._movies = movies
+            self._keys = keys
+            self._memo.clear()
+
+    def add(self, id: int, title: str, view_count: int = 0, average_rating: float = 0.0) -> None:
+        with self._lock:
+            self._remove(id)
+            self._movies[id] = (title, view_count or 0, average_rating or 0.0)
+            insort(self._keys, (_normalize(title), id))
+            self._memo.clear()
+
+    def add_titles(self, titles: Mapping[int, str]) -> None:
+        """add() for many new movies at once, with one merge into the sorted titles."""
+        with self._lock:
+            for id in titles:
+                self._remove(id)
+            for id, title in titles.items():
+                self._movies[id] = (title, 0, 0.0)
+            self._keys = list(heapq.merge(self._keys, sorted((_normalize(title), id) for id, title in titles.items())))
+            self._memo.clear()
+
+    def remove(self, id: int) -> None:
+        with self._lock:
+            self._remove(id)
+
+    def add_views(self, id: int, views: int = 1) -> None:
+        with self._lock:
+            movie = self._movies.get(id)
+            if movie is not None:
+                title, view_count, average_rating = movie
+                self._movies[id] = (title, view_count + views, average_rating)
+
+    def set_rating(self, id: int, average_rating: float) -> None:
+        with self._lock:
+            movie = self._movies.get(id)
+            if movie is None or movie[2] == (average_rating or 0.0):
+                return
+            self._movies[id] = (movie[0], movie[1], average_rating or 0.0)
+            self._forget_rankings("average_rating")
+
+    def clear_ratings(self) -> None:
+        with self._lock:
+            self._movies = {id: (title, view_count, 0.0) for id, (title, view_count, _) in self._movies.items()}
+            self._forget_rankings("average_rating")
+
+    def clear(self) -> None:
+        with self._lock:
+            self._movies = {}
+            self._keys = []
+            self._memo.clear()
+
+    def search(self, prefix: str, limit: int = 10, by: str = "view_count") -> List[Tuple[int, str]]:
+        key = _normalize(prefix)
+        if not key or limit <= 0:
+            return []
+        score = RANKINGS.index(by) + 1
+        # Every title starting with key sorts before key with its last character bumped
+        upper = key[:-1] + chr(ord(key[-1]) + 1)
+        memo_key = (key, limit, by)
+        with self._lock:
+            if memo_key in self._memo:
+                return self._memo[memo_key]
+            start = bisect_left(self._keys, (key,))
+            end = bisect_left(self._keys, (upper,), start)
+            movies = self._movies
+            best = heapq.nlargest(limit, self._keys[start:end], key=lambda k: (movies[k[1]][score], -k[1]))
+            result = [(id, movies[id][0]) for _, id in best]
+            if len(key) <= MEMO_PREFIX_LENGTH:
+                if len(self._memo) >= MEMO_SIZE:
+                    self._memo.clear()
+                self._memo[memo_key] = result
+            return result
+
+    def __len__(self) -> int:
+        return len(self._movies)
+
+    def _forget_rankings(self, by: str) -> None:
+        for memo_key in [k for k in self._memo if k[2] == by]:
+            del self._memo[memo_key]
+
+    def _remove(self, id: int) -> None:
+        movie = self._movies.pop(id, None)
+        if movie is None:
+            return
+        entry = (_normalize(movie[0]), id)
+        index = bisect_left(self._keys, entry)
+        if index < len(self._keys) and self._keys[index] == entry:
+            del self._keys[index]
+        self._memo.clear()
@@ -1,20 +1,41 @@
 import logging
-from typing import Optional, List
+from collections import Counter, defaultdict
+from typing import Dict, Iterator, Optional, List
+from db import after_commit
+from model.DTOs.MovieDTO import BulkImportReport, BulkRowError
 from model.DTOs.UserRatingDTO import UserRatingOut, UserRatingUpdate, UserRatingCreate
 from repository.MovieRepository import MovieRepository
 from repository.UserRatingRepository import UserRatingRepository
 from repository.UserRepository import UserRepository
+from repository.UserStatsRepository import UserStatsRepository
 from repository.exceptions import UserRatingExistsException
+from service.AchievementHandlers import AchievementEvent, MOVIE_AVERAGE_CHANGED, merge_events, rating_event
+from service.AchievementQueue import AchievementQueue
 from service.AchievementService import AchievementService
+from service.CacheKeys import RATINGS_TAG, invalidate, rated_movie_keys
+from service.CacheService import CacheService
+from service.ConfigService import ConfigService
+from service.Leaderboards import Leaderboards
+from service.TitlePrefixIndex import TitlePrefixIndex
+from service.NdjsonExport import ndjson_chunks
 
 
 class UserRatingService:
 
-    def __init__(self, rating_repo: UserRatingRepository, user_repo: UserRepository, movie_repo: MovieRepository, achievement_service: AchievementService):
+    def __init__(self, rating_repo: UserRatingRepository, user_repo: UserRepository, movie_repo: MovieRepository, achievement_service: AchievementService,
+                 config: Optional[ConfigService] = None, leaderboards: Optional[Leaderboards] = None,
+                 cache: Optional[CacheService] = None, stats_repo: Optional[UserStatsRepository] = None,
+                 achievement_queue: Optional[AchievementQueue] = None, title_index: Optional[TitlePrefixIndex] = None):
         self.rating_repo = rating_repo
         self.user_repo = user_repo
         self.movie_repo = movie_repo
         self.achievement_service = achievement_service
+        self.config = config if config is not None else ConfigService()
+        self.leaderboards = leaderboards
+        self.cache = cache
+        self.stats_repo = stats_repo
+        self.achievement_queue = achievement_queue
+        self.title_index = title_index
         self.logger = logging.getLogger(__name__)
 
     def create_rating(self, dto: UserRatingCreate) -> UserRatingOut:
@@ -28,35 +49,174 @@ class UserRatingService:
                 f"User {dto.user_id} rating for movie {dto.movie_id} already exists"
             )
 
+        # The counter updates are committed together with the rating insert
+        rated = self.movie_repo.apply_rating_delta(dto.movie_id, dto.rating, 1)
+        self._rank(dto.movie_id, rated)
+        self._count_user_stats(dto.user_id, rated, 1, dto.comment is not None, dto.rating)
+        self.movie_repo.apply_histogram_deltas({(dto.movie_id, dto.rating): 1})
         rating_obj = self.rating_repo.create_rating(dto)
         
-        self.achievement_service.check_new_achievements(dto.user_id)
-        movie = self.movie_repo.get_movie(dto.movie_id)
-        self.movie_repo.update_average_rating(movie.id, self.rating_repo.get_average_rating(dto.movie_id))
+        genre = rated[1] if rated is not None else None
+        self._check_achievements({dto.user_id: rating_event(genre, dto.comment is not None)})
 
         return UserRatingOut.model_validate(rating_obj)
 
+    def bulk_create_ratings(self, dtos: List[UserRatingCreate]) -> BulkImportReport:
+        """Ingests a batch of ratings with a fixed number of queries regardless of its size.
+
+        Users and movies are checked with one IN query each, the ratings go in as one
+        INSERT ... ON CONFLICT DO NOTHING, the movie counters get one delta per touched
+        movie in the same transaction and achievements are checked once per touched user.
+        """
+        report = BulkImportReport(received=len(dtos))
+        existing_users = self.user_repo.get_existing_ids({dto.user_id for dto in dtos})
+        existing_movies = self.movie_repo.get_existing_ids({dto.movie_id for dto in dtos})
+
+        valid = {}
+        for row, dto in enumerate(dtos, start=1):
+            if dto.user_id not in existing_users:
+                report.errors.append(BulkRowError(row=row, error=f"User {dto.user_id} not found"))
+            elif dto.movie_id not in existing_movies:
+                report.errors.append(BulkRowError(row=row, error=f"Movie {dto.movie_id} not found"))
+            elif (dto.user_id, dto.movie_id) in valid:
+                report.duplicates += 1
+                report.errors.append(BulkRowError(
+                    row=row, error=f"User {dto.user_id} rating for movie {dto.movie_id} already exists"
+                ))
+            else:
+                valid[(dto.user_id, dto.movie_id)] = (row, dto)
+
+        inserted = self.rating_repo.bulk_create_ratings([dto for _, dto in valid.values()])
+        deltas = defaultdict(lambda: (0.0, 0))
+        for user_id, movie_id, rating in inserted:
+            sum_delta, count_delta = deltas[movie_id]
+            deltas[movie_id] = (sum_delta + rating, count_delta + 1)
+        self.movie_repo.apply_rating_deltas(dict(deltas))
+        self.movie_repo.apply_histogram_deltas(Counter((movie_id, round(rating)) for _, movie_id, rating in inserted))
+        self._evict_movies(deltas.keys())
+        genres = {}
+        if (self.leaderboards is not None or self.stats_repo is not None or self.title_index is not None) and deltas:
+            entries = self.movie_repo.get_leaderboard_entries(deltas.keys())
+            genres = {entry.id: entry.genre for entry in entries}
+            if self.stats_repo is not None:
+                stats_deltas = defaultdict(lambda: (0, 0, 0.0))
+                for user_id, movie_id, rating in inserted:
+                    count, comments, total = stats_deltas[(user_id, genres[movie_id])]
+                    commented = valid[(user_id, movie_id)][1].comment is not None
+                    stats_deltas[(user_id, genres[movie_id])] = (count + 1, comments + commented, total + rating)
+                self.stats_repo.apply_deltas(dict(stats_deltas))
+            if self.leaderboards is not None:
+                after_commit(getattr(self.movie_repo, "db", None), lambda: self.leaderboards.update_movies(entries))
+            if self.title_index is not None:
+                after_commit(getattr(self.movie_repo, "db", None), lambda: self._index_ratings(entries))
+
+        inserted_pairs = {(user_id, movie_id) for user_id, movie_id, _ in inserted}
+        for pair, (row, dto) in valid.items():
+            if pair not in inserted_pairs:
+                report.duplicates += 1
+                report.errors.append(BulkRowError(
+                    row=row, error=f"User {dto.user_id} rating for movie {dto.movie_id} already exists"
+                ))
+        report.errors.sort(key=lambda e: e.row)
+        report.inserted = len(inserted)
+
+        events = {}
+        for user_id, movie_id, _ in sorted(inserted):
+            event = rating_event(genres.get(movie_id), valid[(user_id, movie_id)][1].comment is not None)
+            events[user_id] = merge_events(events[user_id], event) if user_id in events else event
+        self._check_achievements(events)
+        return report
+
     def delete_rating(self, id: int) -> None:
         rating_obj = self.rating_repo.get_rating(id)
-        movie_id = rating_obj.movie_id
+        rated = self.movie_repo.apply_rating_delta(rating_obj.movie_id, -rating_obj.rating, -1)
+        self._rank(rating_obj.movie_id, rated)
+        self._count_user_stats(rating_obj.user_id, rated, -1, -(rating_obj.comment is not None), -rating_obj.rating)
+        self.movie_repo.apply_histogram_deltas({(rating_obj.movie_id, round(rating_obj.rating)): -1})
         self.rating_repo.delete_rating(id)
-        new_average = self.rating_repo.get_average_rating(movie_id)
-        self.movie_repo.update_average_rating(movie_id, new_average)
 
     def get_rating(self, id: int) -> UserRatingOut:
         rating_obj = self.rating_repo.get_rating(id)
         return UserRatingOut.model_validate(rating_obj)
 
-    def get_all_ratings(self) -> List[UserRatingOut]:
-        ratings = self.rating_repo.get_all_ratings()
+    def get_all_ratings(self, skip: int = 0, limit: Optional[int] = None) -> List[UserRatingOut]:
+        if limit is None:
+            limit = self.config.get("default_page_size", 10)
+        limit = min(limit, self.config.get("max_page_size", 100))
+        ratings = self.rating_repo.get_all_ratings(skip, limit)
         return [UserRatingOut.model_validate(r) for r in ratings]
 
+    def export_ratings(self) -> Iterator[bytes]:
+        batch_size = self.config.get("export_batch_size", 1000)
+        yield from ndjson_chunks(self.rating_repo.stream_all_ratings(batch_size), UserRatingOut)
+
     def update_rating(self, id: int, dto: UserRatingUpdate) -> UserRatingOut:
+        existing = self.rating_repo.get_rating(id)
+        # The repository updates this same identity-mapped row, so keep the old value for the deltas
+        old_rating = existing.rating
+        rated = self.movie_repo.apply_rating_delta(existing.movie_id, dto.rating - old_rating, 0)
+        self._rank(existing.movie_id, rated)
+        self._count_user_stats(existing.user_id, rated, 0, 0, dto.rating - old_rating)
+        # Move one rating between buckets; a zero net change is skipped by the repository
+        histogram_deltas = Counter({(existing.movie_id, dto.rating): 1})
+        histogram_deltas[(existing.movie_id, round(old_rating))] -= 1
+        self.movie_repo.apply_histogram_deltas(histogram_deltas)
         rating_obj = self.rating_repo.update_rating(id, dto)
-        movie_id = rating_obj.movie_id
-        new_average = self.rating_repo.get_average_rating(movie_id)
-        self.movie_repo.update_average_rating(movie_id, new_average)
+        if dto.rating != old_rating:
+            # Counts are unchanged, but the user's rating and the movie's average feed contrarian rules
+            self._check_achievements({existing.user_id: frozenset({MOVIE_AVERAGE_CHANGED})})
         return UserRatingOut.model_validate(rating_obj)
 
     def delete_all_ratings(self) -> None:
-        self.rating_repo.delete_all_ratings()
\ No newline at end of file
+        self.movie_repo.reset_rating_counters()
+        self.rating_repo.delete_all_ratings()
+        if self.stats_repo is not None:
+            self.stats_repo.clear()
+        invalidate(self.cache, getattr(self.movie_repo, "db", None), tags=[RATINGS_TAG])
+        if self.leaderboards is not None:
+            after_commit(getattr(self.movie_repo, "db", None), lambda: self.leaderboards.clear("average_rating"))
+        if self.title_index is not None:
+            after_commit(getattr(self.movie_repo, "db", None), self.title_index.clear_ratings)
+
+    def _rank(self, movie_id: int, rated) -> None:
+        # rated is the (average_rating, genre) row returned by apply_rating_delta;
+        # the leaderboards and title index only see it once the rating is committed.
+        self._evict_movies([movie_id])
+        if rated is None or (self.leaderboards is None and self.title_index is None):
+            return
+        average_rating, genre = rated
+        after_commit(getattr(self.movie_repo, "db", None), lambda: self._apply_rank(movie_id, genre, average_rating))
+
+    def _apply_rank(self, movie_id: int, genre, average_rating: float) -> None:
+        if self.leaderboards is not None:
+            self.leaderboards.update("average_rating", movie_id, genre, average_rating)
+        if self.title_index is not None:
+            self.title_index.set_rating(movie_id, average_rating)
+
+    def _index_ratings(self, entries) -> None:
+        for entry in entries:
+            self.title_index.set_rating(entry.id, entry.average_rating)
+
+    def _check_achievements(self, events: Dict[int, AchievementEvent]) -> None:
+        # Each user is checked against the achievements subscribed to their event. With a
+        # queue the checks run on its workers once the ratings have committed.
+        if self.achievement_queue is None:
+            for user_id, event in events.items():
+                self.achievement_service.check_new_achievements(user_id, event)
+            return
+        if not events:
+            return
+        if self.achievement_queue.outbox:
+            self.achievement_service.add_pending_checks(list(events))
+        after_commit(getattr(self.movie_repo, "db", None), lambda: self.achievement_queue.enqueue(events))
+
+    def _count_user_stats(self, user_id: int, rated, count: int, comments: int, total: float) -> None:
+        # rated is the row returned by apply_rating_delta, whose genre keys the user's counters
+        if self.stats_repo is not None:
+            self.stats_repo.apply_deltas({(user_id, rated[1]): (count, int(comments), total)})
+
+    def _evict_movies(self, movie_ids) -> None:
+        # The cached movie and its rating both show the average that just changed
+        keys = rated_movie_keys(movie_ids)
+        if keys:
+            invalidate(self.cache, getattr(self.movie_repo, "db", None), keys)
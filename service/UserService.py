@@ -1,16 +1,28 @@
 import logging
+from typing import Iterator, Optional
 from fastapi import HTTPException, status
+from db import after_commit
 from model.UserORM import UserORM
-from model.DTOs.UserDTO import UserCreate, UserOut, UserUpdate
+from model.DTOs.UserDTO import UserCreate, UserOut, UserUpdate, UserGenreStats, UserStatsOut
+from repository.MovieRepository import MovieRepository
 from repository.UserRepository import UserRepository
+from repository.UserStatsRepository import UserStatsRepository
 from repository.exceptions import UserNotFoundException, UsernameExistsException, EmailExistsException
+from service.CacheKeys import (RATINGS_TAG, achievements_status_key, achievements_version_key, invalidate, rated_movie_keys,
+                               user_key)
+from service.CacheService import CacheService
 from service.ConfigService import ConfigService
+from service.NdjsonExport import ndjson_chunks
 
 class UserService():
 
-    def __init__(self, repository: UserRepository, config: ConfigService):
+    def __init__(self, repository: UserRepository, config: ConfigService, movie_repository: Optional[MovieRepository] = None,
+                 cache: Optional[CacheService] = None, stats_repository: Optional[UserStatsRepository] = None):
         self.repository = repository
         self.config = config
+        self.movie_repository = movie_repository
+        self.cache = cache
+        self.stats_repository = stats_repository
         self.logger = logging.getLogger(__name__)
 
     def create_user(self, dto: UserCreate) -> UserOut:
@@ -21,22 +33,75 @@ class UserService():
                 detail="Registration is currently disabled"
             )
         user = self.repository.create_user(dto)
+        # A lookup of the new id may have been cached as not found
+        self._invalidate(keys=[user_key(user.id)])
         return UserOut.model_validate(user)
 
     def delete_user(self, id: int):
-        return self.repository.delete_user(id)
+        # The user's ratings are removed by ON DELETE CASCADE, so take them out of the
+        # movie rating counters first, in the same transaction.
+        keys = [user_key(id), achievements_status_key(id), achievements_version_key(id)]
+        if self.movie_repository is not None:
+            keys += rated_movie_keys(self.movie_repository.subtract_user_ratings(id))
+        result = self.repository.delete_user(id)
+        self._invalidate(keys=keys)
+        return result
 
     def get_user(self, id: int) -> UserOut:
-        user = self.repository.get_user(id)
-        return UserOut.model_validate(user)
+        if self.cache is None:
+            return UserOut.model_validate(self.repository.get_user(id))
+        return self.cache.get_or_load(user_key(id), lambda: UserOut.model_validate(self.repository.get_user(id)),
+                                      not_found=UserNotFoundException,
+                                      refresh=lambda db: UserOut.model_validate(UserRepository(db).get_user(id)))
+
+    def get_user_stats(self, id: int) -> UserStatsOut:
+        """The user's rating totals, overall and per genre, read from the maintained user_stats counters."""
+        self.get_user(id)
+        rows = self.stats_repository.get_stats(id) if self.stats_repository is not None else []
+        genres = [
+            UserGenreStats(genre=genre, rating_count=count, average_rating=total / count)
+            for genre, count, _, total in sorted(rows, key=lambda row: row[0].value)
+        ]
+        rating_count = sum(row[1] for row in rows)
+        return UserStatsOut(
+            user_id=id,
+            rating_count=rating_count,
+            comment_count=sum(row[2] for row in rows),
+            average_rating=sum(row[3] for row in rows) / rating_count if rating_count else None,
+            distinct_genres=len(genres),
+            genres=genres,
+        )
 
-    def get_all_users(self) -> list[UserOut]:
-        users = self.repository.get_all_users()
+    def get_all_users(self, skip: int = 0, limit: Optional[int] = None) -> list[UserOut]:
+        if limit is None:
+            limit = self.config.get("default_page_size", 10)
+        limit = min(limit, self.config.get("max_page_size", 100))
+        users = self.repository.get_all_users(skip, limit)
         return [UserOut.model_validate(user) for user in users]
 
+    def export_users(self) -> Iterator[bytes]:
+        batch_size = self.config.get("export_batch_size", 1000)
+        yield from ndjson_chunks(self.repository.stream_all_users(batch_size), UserOut)
+
     def update_user(self, id: int, dto: UserUpdate) -> UserOut:
         user = self.repository.update_user(id, dto)
+        self._invalidate(keys=[user_key(id)])
         return UserOut.model_validate(user)
 
     def delete_all_users(self):
-        return self.repository.delete_all_users()
\ No newline at end of file
+        if self.movie_repository is not None:
+            self.movie_repository.reset_rating_counters()
+        result = self.repository.delete_all_users()
+        if self.cache is not None:
+            def clear():
+                for prefix in ("users_", "achievements_"):
+                    self.cache.clear_all_starting_with(prefix)
+            clear()
+            db = getattr(self.repository, "db", None)
+            if db is not None:
+                after_commit(db, clear)
+            self._invalidate(tags=[RATINGS_TAG])
+        return result
+
+    def _invalidate(self, keys=(), tags=()) -> None:
+        invalidate(self.cache, getattr(self.repository, "db", None), keys, tags)
\ No newline at end of file
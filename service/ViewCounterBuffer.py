@@ -0,0 +1,123 @@
+import asyncio
+import logging
+import threading
+from collections import defaultdict
+from typing import Callable, Dict, Optional
+
+from starlette.concurrency import run_in_threadpool
+
+from repository.MovieRepository import MovieRepository
+from service.Leaderboards import Leaderboards
+
+
+class ViewCounterBuffer:
+    """In-process buffer of view count deltas, sharded by movie id.
+
+    Requests only touch one shard under its own lock, so concurrent views of
+    different movies do not contend. The accumulated deltas are written out in
+    batches by ViewCountFlusher.
+    """
+
+    def __init__(self, shards: int = 16, flush_threshold: int = 1000):
+        self._shards = [defaultdict(int) for _ in range(shards)]
+        self._pending = [0] * shards
+        self._locks = [threading.Lock() for _ in range(shards)]
+        # Per-shard share of the threshold keeps the check local to one lock.
+        self._shard_threshold = max(1, flush_threshold // shards)
+        self.on_threshold: Optional[Callable[[], None]] = None
+
+    def increment(self, movie_id: int, delta: int = 1) -> None:
+        index = movie_id % len(self._shards)
+        with self._locks[index]:
+            self._shards[index][movie_id] += delta
+            self._pending[index] += delta
+            reached = self._pending[index] >= self._shard_threshold
+        if reached and self.on_threshold is not None:
+            self.on_threshold()
+
+    def drain(self) -> Dict[int, int]:
+        deltas: Dict[int, int] = {}
+        for index, lock in enumerate(self._locks):
+            with lock:
+                shard = self._shards[index]
+                self._shards[index] = defaultdict(int)
+                self._pending[index] = 0
+            deltas.update(shard)
+        return deltas
+
+    def pending(self) -> int:
+        return sum(self._pending)
+
+
+class ViewCountFlusher:
+    """Background task that writes buffered view counts to the database.
+
+    It flushes every ``interval`` seconds, or sooner when a shard of the buffer
+    passes its size threshold, and drains the buffer one last time on stop.
+    """
+
+    def __init__(self, buffer: ViewCounterBuffer, session_factory: Callable, interval: float = 5.0,
+                 leaderboards: Optional[Leaderboards] = None):
+        self.buffer = buffer
+        self.session_factory = session_factory
+        self.interval = interval
+        self.leaderboards = leaderboards
+        self.logger = logging.getLogger(__name__)
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+
+    async def start(self) -> None:
+        loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+        # increment() runs in threadpool workers, so the event is set through the loop.
+        self.buffer.on_threshold = lambda: loop.call_soon_threadsafe(self._wakeup.set)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        self._stopping = True
+        self.buffer.on_threshold = None
+        if self._task is not None:
+            self._wakeup.set()
+            await self._task
+            self._task = None
+        await self.flush()
+
+    async def flush(self) -> int:
+        deltas = self.buffer.drain()
+        if deltas:
+            await run_in_threadpool(self._write, deltas)
+        return len(deltas)
+
+    async def _run(self) -> None:
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            if self._stopping:
+                break
+            try:
+                await self.flush()
+            except Exception as e:
+                self.logger.error(f"View count flush failed: {e}")
+
+    def _write(self, deltas: Dict[int, int]) -> None:
+        db = self.session_factory()
+        try:
+            repository = MovieRepository(db)
+            try:
+                repository.add_view_counts(deltas)
+                db.commit()
+            except Exception:
+                # Put the views back so the next flush retries them.
+                for movie_id, delta in deltas.items():
+                    self.buffer.increment(movie_id, delta)
+                raise
+            if self.leaderboards is not None:
+                # One read of the new totals keeps the view count leaderboards current
+                self.leaderboards.update_movies(repository.get_leaderboard_entries(deltas.keys()))
+        finally:
+            db.close()
@@ -0,0 +1 @@
+class InvalidCursorException(Exception): pass
@@ -0,0 +1,45 @@
+import unittest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from db import Base
+from model.DTOs.MovieDTO import MovieGenre
+# Every model is imported so create_all builds all of their tables
+from model.AchievementORM import AchievementORM
+from model.AchievementOutboxORM import AchievementOutboxORM
+from model.MovieORM import MovieORM
+from model.RatingHistogramORM import RatingHistogramORM
+from model.UserAchievementORM import UserAchievementORM
+from model.UserORM import UserORM
+from model.UserRatingORM import UserRatingORM
+from model.UserStatsORM import UserStatsORM
+import repository.fulltext  # creates movies_fts together with movies
+
+
+class SqliteTestCase(unittest.TestCase):
+    """Runs repository tests against a fresh in-memory SQLite database built from the ORM models."""
+
+    def setUp(self):
+        # One shared connection, since every new connection to sqlite:// opens an empty database
+        self.engine = create_engine("sqlite://", poolclass=StaticPool)
+        Base.metadata.create_all(self.engine)
+        self.db = sessionmaker(bind=self.engine, autoflush=False)()
+
+    def tearDown(self):
+        self.db.close()
+        self.engine.dispose()
+
+    def add_user(self, id: int) -> UserORM:
+        user = UserORM(id=id, username=f"user{id}", email=f"user{id}@test.com", password="hashed")
+        self.db.add(user)
+        self.db.flush()
+        return user
+
+    def add_movie(self, id: int, **fields) -> MovieORM:
+        fields.setdefault("title", f"Movie {id}")
+        fields.setdefault("year", 2000)
+        fields.setdefault("genre", MovieGenre.DRAMA)
+        movie = MovieORM(id=id, view_count=0, **fields)
+        self.db.add(movie)
+        self.db.flush()
+        return movie
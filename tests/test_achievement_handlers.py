@@ -1,7 +1,11 @@
 import unittest
 from unittest.mock import MagicMock
 from sqlalchemy.orm import Session
-from service.AchievementHandlers import ReviewCountHandler, GenreMasterHandler
+from model.DTOs.MovieDTO import MovieGenre
+from service.AchievementHandlers import (ReviewCountHandler, GenreMasterHandler, CommentCountHandler, DistinctGenreHandler,
+                                         ContrarianHandler, UserStatsSnapshot, HandlerRegistry, SubscriptionIndex, BaseAchievementHandler,
+                                         COMMENT_ADDED, MOVIE_AVERAGE_CHANGED, RATING_CREATED, merge_events, rating_event)
+from model.AchievementORM import AchievementORM
 
 class TestAchievementHandlers(unittest.TestCase):
 
@@ -50,5 +54,94 @@ class TestAchievementHandlers(unittest.TestCase):
         # Assert
         self.assertTrue(result)
 
+    def test_snapshot_folds_per_genre_rows(self):
+        # Act
+        snapshot = UserStatsSnapshot.from_rows(1, [(MovieGenre.HORROR, 3, 2), (MovieGenre.DRAMA, 2, 0)], {(10, 5.0): 1})
+
+        # Assert
+        self.assertEqual(snapshot.review_count, 5)
+        self.assertEqual(snapshot.comment_count, 2)
+        self.assertEqual(snapshot.genre_counts, {"horror": 3, "drama": 2})
+        self.assertEqual(snapshot.distinct_genres, 2)
+        self.assertEqual(snapshot.contrarian_counts, {(10, 5.0): 1})
+
+    def test_handlers_evaluate_against_the_snapshot(self):
+        # Arrange
+        snapshot = UserStatsSnapshot(1, 5, 2, {"horror": 3, "drama": 2}, {(10, 5.0): 1})
+        mock_db = MagicMock(spec=Session)
+
+        # Act & Assert
+        self.assertTrue(ReviewCountHandler().evaluate(snapshot, {"threshold": 5}, mock_db))
+        self.assertFalse(ReviewCountHandler().evaluate(snapshot, {"threshold": 6}, mock_db))
+        self.assertTrue(GenreMasterHandler().evaluate(snapshot, {"genre": "Horror", "threshold": 3}, mock_db))
+        self.assertFalse(GenreMasterHandler().evaluate(snapshot, {"genre": "comedy", "threshold": 1}, mock_db))
+        self.assertFalse(CommentCountHandler().evaluate(snapshot, {"threshold": 3}, mock_db))
+        self.assertTrue(DistinctGenreHandler().evaluate(snapshot, {"threshold": 2}, mock_db))
+        self.assertTrue(ContrarianHandler().evaluate(snapshot, {"min_user_rating": 10, "max_movie_avg": 5.0}, mock_db))
+        self.assertFalse(ContrarianHandler().evaluate(snapshot, {"min_user_rating": 9, "max_movie_avg": 5.0}, mock_db))
+        mock_db.query.assert_not_called()
+
+    def test_rating_event_topics(self):
+        # Act
+        event = rating_event(MovieGenre.HORROR, commented=True)
+
+        # Assert
+        self.assertEqual(event, {RATING_CREATED, MOVIE_AVERAGE_CHANGED, COMMENT_ADDED, "genre:horror"})
+        self.assertIsNone(rating_event(None, commented=True))
+        self.assertEqual(merge_events(frozenset({RATING_CREATED}), frozenset({COMMENT_ADDED})), {RATING_CREATED, COMMENT_ADDED})
+        self.assertIsNone(merge_events(frozenset({RATING_CREATED}), None))
+
+    def test_registry_selects_handlers_subscribed_to_the_event(self):
+        # Arrange
+        achievements = [
+            AchievementORM(id=1, condition_type="COUNT_REVIEWS", condition_params={"threshold": 1}),
+            AchievementORM(id=2, condition_type="GENRE_MASTER", condition_params={"genre": "Horror", "threshold": 1}),
+            AchievementORM(id=3, condition_type="GENRE_MASTER", condition_params={"genre": "drama", "threshold": 1}),
+            AchievementORM(id=4, condition_type="COMMENT_COUNT", condition_params={"threshold": 1}),
+            AchievementORM(id=5, condition_type="DISTINCT_GENRE", condition_params={"threshold": 1}),
+            AchievementORM(id=6, condition_type="CONTRARIAN", condition_params={}),
+            AchievementORM(id=7, condition_type="UNKNOWN", condition_params={}),
+        ]
+
+        # Act
+        index = SubscriptionIndex(achievements)
+        on_rating = index.select(rating_event(MovieGenre.HORROR, commented=False))
+        on_average = index.select(frozenset({MOVIE_AVERAGE_CHANGED}))
+        on_anything = index.select()
+
+        # Assert
+        self.assertEqual([a.id for a, _ in on_rating], [1, 2, 5, 6])
+        self.assertEqual([a.id for a, _ in on_average], [6])
+        self.assertEqual([a.id for a, _ in on_anything], [1, 2, 3, 4, 5, 6])
+
+    def test_index_skips_earned_achievements(self):
+        # Arrange
+        index = HandlerRegistry.index([
+            AchievementORM(id=1, condition_type="COUNT_REVIEWS", condition_params={"threshold": 1}),
+            AchievementORM(id=2, condition_type="DISTINCT_GENRE", condition_params={"threshold": 2}),
+        ])
+
+        # Act
+        selected = index.select(frozenset({RATING_CREATED}), exclude_ids={1})
+
+        # Assert
+        self.assertEqual([a.id for a, _ in selected], [2])
+
+    def test_handlers_without_subscriptions_see_every_event(self):
+        # Arrange
+        class AlwaysHandler(BaseAchievementHandler):
+            def check(self, user_id, params, db):
+                return True
+
+        HandlerRegistry.register("ALWAYS", AlwaysHandler())
+        self.addCleanup(HandlerRegistry._handlers.pop, "ALWAYS")
+
+        # Act
+        index = SubscriptionIndex([AchievementORM(id=1, condition_type="ALWAYS", condition_params={})])
+        selected = index.select(frozenset({COMMENT_ADDED}))
+
+        # Assert
+        self.assertEqual(len(selected), 1)
+
 if __name__ == '__main__':
     unittest.main()
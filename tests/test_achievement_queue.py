@@ -0,0 +1,124 @@
+import asyncio
+import unittest
+from unittest.mock import MagicMock, patch
+from sqlalchemy.orm import Session
+from service.AchievementQueue import AchievementQueue
+from service.AchievementService import AchievementService
+from service.AchievementHandlers import COMMENT_ADDED, RATING_CREATED
+from repository.AchievementRepository import AchievementRepository
+
+
+class TestAchievementQueue(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.mock_db = MagicMock(spec=Session)
+        self.queue = AchievementQueue(lambda: self.mock_db, workers=2, dedupe_window=60)
+
+    async def test_drain_checks_each_user_once(self):
+        # Arrange
+        await self.queue.start()
+
+        # Act
+        with patch.object(AchievementService, "check_new_achievements") as mock_check:
+            self.queue.enqueue({1: None, 2: None})
+            self.queue.enqueue({1: None})
+            await asyncio.sleep(0)
+            await self.queue.drain()
+        await self.queue.stop()
+
+        # Assert
+        self.assertEqual(sorted(c.args[0] for c in mock_check.call_args_list), [1, 2])
+        self.assertEqual(self.queue.pending(), 0)
+        self.assertEqual(self.mock_db.commit.call_count, 2)
+
+    async def test_deduplicated_events_are_merged(self):
+        # Arrange
+        await self.queue.start()
+
+        # Act
+        with patch.object(AchievementService, "check_new_achievements") as mock_check:
+            self.queue.enqueue({1: frozenset({RATING_CREATED})})
+            self.queue.enqueue({1: frozenset({COMMENT_ADDED})})
+            await asyncio.sleep(0)
+            await self.queue.drain()
+        await self.queue.stop()
+
+        # Assert
+        mock_check.assert_called_once_with(1, frozenset({RATING_CREATED, COMMENT_ADDED}))
+
+    async def test_event_after_check_started_is_queued_again(self):
+        # Arrange
+        await self.queue.start()
+        with patch.object(AchievementService, "check_new_achievements") as mock_check:
+            self.queue.enqueue({5: None})
+            await asyncio.sleep(0)
+            await self.queue.drain()
+
+            # Act
+            self.queue.enqueue({5: None})
+            await asyncio.sleep(0)
+            await self.queue.drain()
+        await self.queue.stop()
+
+        # Assert
+        self.assertEqual(mock_check.call_count, 2)
+
+    async def test_stop_runs_held_checks(self):
+        # Arrange
+        await self.queue.start()
+
+        # Act
+        with patch.object(AchievementService, "check_new_achievements") as mock_check:
+            self.queue.enqueue({3: None})
+            await asyncio.sleep(0)
+            await self.queue.stop()
+
+        # Assert
+        mock_check.assert_called_once_with(3, None)
+
+    async def test_failed_check_is_rolled_back_and_does_not_stop_workers(self):
+        # Arrange
+        await self.queue.start()
+
+        # Act
+        with patch.object(AchievementService, "check_new_achievements", side_effect=[RuntimeError("db down"), []]) as mock_check:
+            self.queue.enqueue({1: None})
+            await asyncio.sleep(0)
+            await self.queue.drain()
+            self.queue.enqueue({2: None})
+            await asyncio.sleep(0)
+            await self.queue.drain()
+        await self.queue.stop()
+
+        # Assert
+        self.mock_db.rollback.assert_called_once()
+        self.assertEqual(mock_check.call_count, 2)
+
+    async def test_outbox_events_are_replayed_on_start_and_deleted_after_the_check(self):
+        # Arrange
+        queue = AchievementQueue(lambda: self.mock_db, dedupe_window=60, outbox=True)
+
+        # Act
+        with patch.object(AchievementRepository, "get_outbox_user_ids", return_value=[4]), \
+                patch.object(AchievementRepository, "get_last_outbox_id", return_value=17), \
+                patch.object(AchievementRepository, "delete_outbox_events") as mock_delete, \
+                patch.object(AchievementService, "check_new_achievements") as mock_check:
+            await queue.start()
+            await queue.drain()
+            await queue.stop()
+
+        # Assert
+        mock_check.assert_called_once_with(4, None)
+        mock_delete.assert_called_once_with(4, 17)
+
+    def test_enqueue_without_a_running_queue_checks_inline(self):
+        # Act
+        with patch.object(AchievementService, "check_new_achievements") as mock_check:
+            self.queue.enqueue({8: None})
+
+        # Assert
+        mock_check.assert_called_once_with(8, None)
+        self.mock_db.commit.assert_called_once()
+
+if __name__ == '__main__':
+    unittest.main()
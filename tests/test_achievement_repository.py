@@ -0,0 +1,61 @@
+import unittest
+from sqlalchemy import select
+from model.AchievementORM import AchievementORM
+from model.UserAchievementORM import UserAchievementORM
+from repository.AchievementRepository import AchievementRepository
+from tests.sqlite_fixture import SqliteTestCase
+
+
+class TestAchievementRepository(SqliteTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.repo = AchievementRepository(self.db)
+        self.add_user(1)
+        self.add_user(2)
+        for id in (1, 2, 3):
+            self.db.add(AchievementORM(id=id, name=f"Achievement {id}", description="D",
+                                       condition_type="COUNT_REVIEWS", condition_params={"threshold": id}))
+        self.db.flush()
+
+    def _awarded(self, user_id: int) -> list:
+        statement = select(UserAchievementORM.achievement_id).where(UserAchievementORM.user_id == user_id)
+        return sorted(self.db.scalars(statement))
+
+    def test_add_user_achievements_returns_only_new_awards(self):
+        # Arrange
+        self.assertEqual(sorted(self.repo.add_user_achievements(1, [1, 2])), [1, 2])
+
+        # Act
+        inserted = self.repo.add_user_achievements(1, [2, 3])
+
+        # Assert
+        self.assertEqual(inserted, [3])
+        self.assertEqual(self._awarded(1), [1, 2, 3])
+
+    def test_add_user_achievements_skips_conflicts_without_failing_the_transaction(self):
+        # Arrange
+        self.repo.add_user_achievements(1, [1])
+        self.db.commit()
+
+        # Act
+        inserted = self.repo.add_user_achievements(1, [1])
+        other_user = self.repo.add_user_achievements(2, [1])
+        self.db.commit()
+
+        # Assert
+        self.assertEqual(inserted, [])
+        self.assertEqual(other_user, [1])
+        self.assertEqual(self._awarded(1), [1])
+        self.assertEqual(self._awarded(2), [1])
+
+    def test_add_user_achievements_without_ids_writes_nothing(self):
+        # Act
+        inserted = self.repo.add_user_achievements(1, [])
+
+        # Assert
+        self.assertEqual(inserted, [])
+        self.assertEqual(self._awarded(1), [])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -5,13 +5,19 @@ from service.AchievementService import AchievementService
 from repository.AchievementRepository import AchievementRepository
 from model.AchievementORM import AchievementORM
 from model.UserAchievementORM import UserAchievementORM
-from service.AchievementHandlers import HandlerRegistry, BaseAchievementHandler
+from model.DTOs.MovieDTO import MovieGenre
+from service.AchievementHandlers import (HandlerRegistry, BaseAchievementHandler, UserStatsSnapshot, MOVIE_AVERAGE_CHANGED,
+                                         rating_event)
+from service.CacheService import CacheService
 
 class TestAchievementService(unittest.TestCase):
 
     def setUp(self):
         self.mock_repo = MagicMock(spec=AchievementRepository)
         self.mock_db = MagicMock()
+        self.mock_repo.get_genre_counts.return_value = []
+        self.mock_repo.get_contrarian_counts.side_effect = lambda user_id, rules: [0] * len(rules)
+        self.mock_repo.add_user_achievements.side_effect = lambda user_id, ids: list(ids)
         self.service = AchievementService(self.mock_repo, self.mock_db)
 
     def test_check_new_achievements_success(self):
@@ -27,7 +33,8 @@ class TestAchievementService(unittest.TestCase):
         self.mock_repo.get_user_achievement_ids.return_value = set()
 
         mock_handler = MagicMock(spec=BaseAchievementHandler)
-        mock_handler.check.return_value = True
+        mock_handler.contrarian_rules.return_value = []
+        mock_handler.evaluate.return_value = True
         
         with patch.object(HandlerRegistry, 'get_handler', return_value=mock_handler):
             # Act
@@ -36,8 +43,10 @@ class TestAchievementService(unittest.TestCase):
             # Assert
             self.assertEqual(len(new_achievements), 1)
             self.assertEqual(new_achievements[0].name, "Test Achievement")
-            self.mock_repo.add_user_achievement.assert_called_once_with(user_id, achievement.id)
-            mock_handler.check.assert_called_once_with(user_id, achievement.condition_params, self.mock_db)
+            self.mock_repo.add_user_achievements.assert_called_once_with(user_id, [achievement.id])
+            snapshot = mock_handler.evaluate.call_args.args[0]
+            self.assertEqual(snapshot, UserStatsSnapshot(user_id, 0, 0, {}, {}))
+            mock_handler.evaluate.assert_called_once_with(snapshot, achievement.condition_params, self.mock_db)
 
     def test_check_new_achievements_already_earned(self):
         # Arrange
@@ -51,7 +60,7 @@ class TestAchievementService(unittest.TestCase):
 
         # Assert
         self.assertEqual(len(new_achievements), 0)
-        self.mock_repo.add_user_achievement.assert_not_called()
+        self.mock_repo.add_user_achievements.assert_not_called()
 
     def test_check_new_achievements_condition_not_met(self):
         # Arrange
@@ -61,7 +70,8 @@ class TestAchievementService(unittest.TestCase):
         self.mock_repo.get_user_achievement_ids.return_value = set()
 
         mock_handler = MagicMock(spec=BaseAchievementHandler)
-        mock_handler.check.return_value = False
+        mock_handler.contrarian_rules.return_value = []
+        mock_handler.evaluate.return_value = False
         
         with patch.object(HandlerRegistry, 'get_handler', return_value=mock_handler):
             # Act
@@ -69,7 +79,69 @@ class TestAchievementService(unittest.TestCase):
 
             # Assert
             self.assertEqual(len(new_achievements), 0)
-            self.mock_repo.add_user_achievement.assert_not_called()
+            self.mock_repo.add_user_achievements.assert_called_once_with(user_id, [])
+
+    def test_check_new_achievements_reads_one_snapshot_for_all_handlers(self):
+        # Arrange
+        achievements = [
+            AchievementORM(id=1, name="Critic", condition_type="COUNT_REVIEWS", condition_params={"threshold": 3}),
+            AchievementORM(id=2, name="Horror fan", condition_type="GENRE_MASTER", condition_params={"genre": "horror", "threshold": 2}),
+            AchievementORM(id=3, name="Explorer", condition_type="DISTINCT_GENRE", condition_params={"threshold": 3}),
+            AchievementORM(id=4, name="Contrarian", condition_type="CONTRARIAN",
+                           condition_params={"min_user_rating": 9, "max_movie_avg": 5.0, "threshold": 1}),
+        ]
+        self.mock_repo.get_all_achievements.return_value = achievements
+        self.mock_repo.get_user_achievement_ids.return_value = set()
+        self.mock_repo.get_genre_counts.return_value = [(MovieGenre.HORROR, 2, 1), (MovieGenre.DRAMA, 1, 0)]
+        self.mock_repo.get_contrarian_counts.side_effect = lambda user_id, rules: [1]
+        self.mock_repo.add_user_achievements.side_effect = lambda user_id, ids: [i for i in ids if i != 2]
+
+        # Act
+        new_achievements = self.service.check_new_achievements(1)
+
+        # Assert
+        self.mock_repo.get_genre_counts.assert_called_once_with(1)
+        self.mock_repo.get_contrarian_counts.assert_called_once_with(1, [(9, 5.0)])
+        self.mock_repo.add_user_achievements.assert_called_once_with(1, [1, 2, 4])
+        # Achievement 2 was awarded concurrently, so it is not reported again
+        self.assertEqual([a.id for a in new_achievements], [1, 4])
+
+    def test_check_new_achievements_evaluates_only_subscribed_handlers(self):
+        # Arrange
+        achievements = [
+            AchievementORM(id=1, name="Critic", condition_type="COUNT_REVIEWS", condition_params={"threshold": 1}),
+            AchievementORM(id=2, name="Horror fan", condition_type="GENRE_MASTER", condition_params={"genre": "horror", "threshold": 1}),
+            AchievementORM(id=3, name="Drama fan", condition_type="GENRE_MASTER", condition_params={"genre": "drama", "threshold": 1}),
+            AchievementORM(id=4, name="Commenter", condition_type="COMMENT_COUNT", condition_params={"threshold": 1}),
+            AchievementORM(id=5, name="Contrarian", condition_type="CONTRARIAN",
+                           condition_params={"min_user_rating": 9, "max_movie_avg": 5.0, "threshold": 1}),
+        ]
+        self.mock_repo.get_all_achievements.return_value = achievements
+        self.mock_repo.get_user_achievement_ids.return_value = set()
+        self.mock_repo.get_genre_counts.return_value = [(MovieGenre.HORROR, 1, 0), (MovieGenre.DRAMA, 1, 1)]
+
+        # Act
+        new_achievements = self.service.check_new_achievements(1, rating_event(MovieGenre.HORROR, commented=False) - {MOVIE_AVERAGE_CHANGED})
+
+        # Assert
+        # The drama rating and the comment were seen by earlier checks, so only their own events award them
+        self.assertEqual([a.id for a in new_achievements], [1, 2])
+        self.mock_repo.get_contrarian_counts.assert_called_once_with(1, [])
+
+    def test_check_new_achievements_skips_queries_when_no_handler_is_subscribed(self):
+        # Arrange
+        self.mock_repo.get_all_achievements.return_value = [
+            AchievementORM(id=4, name="Commenter", condition_type="COMMENT_COUNT", condition_params={"threshold": 1}),
+        ]
+        self.mock_repo.get_user_achievement_ids.return_value = set()
+
+        # Act
+        new_achievements = self.service.check_new_achievements(1, frozenset({MOVIE_AVERAGE_CHANGED}))
+
+        # Assert
+        self.assertEqual(new_achievements, [])
+        self.mock_repo.get_genre_counts.assert_not_called()
+        self.mock_repo.add_user_achievements.assert_not_called()
 
     def test_get_user_achievements(self):
         # Arrange
@@ -88,7 +160,7 @@ class TestAchievementService(unittest.TestCase):
         self.assertEqual(result[0].name, "Test")
         self.assertEqual(result[0].earned_at, earned_at)
 
-    def test_check_new_achievements_commits(self):
+    def test_check_new_achievements_leaves_commit_to_caller(self):
         # Arrange
         user_id = 1
         ach = AchievementORM(id=1, name="Test", condition_type="REVIEW_COUNT", condition_params={"count": 5})
@@ -96,14 +168,16 @@ class TestAchievementService(unittest.TestCase):
         self.mock_repo.get_user_achievement_ids.return_value = []
         
         mock_handler = MagicMock()
-        mock_handler.check.return_value = True
+        mock_handler.contrarian_rules.return_value = []
+        mock_handler.evaluate.return_value = True
         
         with patch.object(HandlerRegistry, 'get_handler', return_value=mock_handler):
             # Act
             self.service.check_new_achievements(user_id)
 
         # Assert
-        self.mock_db.commit.assert_called_once()
+        self.mock_repo.add_user_achievements.assert_called_once()
+        self.mock_db.commit.assert_not_called()
 
     def test_get_achievements_status(self):
         # Arrange
@@ -125,5 +199,47 @@ class TestAchievementService(unittest.TestCase):
         self.assertEqual(result[1].id, 2)
         self.assertFalse(result[1].earned)
 
+    def test_achievements_status_is_cached_until_one_is_earned(self):
+        # Arrange
+        config = MagicMock()
+        config.get.side_effect = lambda key, default=None: default
+        service = AchievementService(self.mock_repo, None, CacheService(config))
+        achievement = AchievementORM(id=1, name="Ach1", description="D1", condition_type="T1", condition_params={})
+        self.mock_repo.get_all_achievements.return_value = [achievement]
+        self.mock_repo.get_user_achievements.return_value = []
+        self.mock_repo.get_user_achievement_ids.return_value = set()
+        mock_handler = MagicMock(spec=BaseAchievementHandler)
+        mock_handler.contrarian_rules.return_value = []
+        mock_handler.evaluate.return_value = True
+
+        # Act
+        service.get_achievements_status(1)
+        service.get_achievements_status(1)
+        with patch.object(HandlerRegistry, 'get_handler', return_value=mock_handler):
+            service.check_new_achievements(1)
+        service.get_achievements_status(1)
+
+        # Assert
+        self.assertEqual(self.mock_repo.get_user_achievements.call_count, 2)
+
+    def test_catalog_index_is_cached_across_checks(self):
+        # Arrange
+        config = MagicMock()
+        config.get.side_effect = lambda key, default=None: default
+        service = AchievementService(self.mock_repo, None, CacheService(config))
+        self.mock_repo.get_all_achievements.return_value = [
+            AchievementORM(id=1, name="Critic", condition_type="COUNT_REVIEWS", condition_params={"threshold": 1}),
+        ]
+        self.mock_repo.get_user_achievement_ids.return_value = set()
+        self.mock_repo.get_genre_counts.return_value = [(MovieGenre.DRAMA, 1, 0)]
+
+        # Act
+        first = service.check_new_achievements(1, rating_event(MovieGenre.DRAMA, commented=False))
+        second = service.check_new_achievements(2, rating_event(MovieGenre.DRAMA, commented=False))
+
+        # Assert
+        self.mock_repo.get_all_achievements.assert_called_once()
+        self.assertEqual([a.name for a in first + second], ["Critic", "Critic"])
+
 if __name__ == '__main__':
     unittest.main()
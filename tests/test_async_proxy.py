@@ -0,0 +1,63 @@
+import unittest
+from unittest.mock import MagicMock, AsyncMock
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from service.AsyncProxy import AsyncProxy
+from service.MovieService import MovieService
+
+class TestAsyncProxy(unittest.IsolatedAsyncioTestCase):
+
+    async def test_sync_session_runs_in_threadpool(self):
+        # Arrange
+        mock_service = MagicMock(spec=MovieService)
+        mock_service.get_movie_rating.return_value = 7.5
+        proxy = AsyncProxy(mock_service, MagicMock(spec=Session))
+
+        # Act
+        result = await proxy.get_movie_rating(1)
+
+        # Assert
+        self.assertEqual(result, 7.5)
+        mock_service.get_movie_rating.assert_called_once_with(1)
+
+    async def test_async_session_runs_through_run_sync(self):
+        # Arrange
+        mock_service = MagicMock(spec=MovieService)
+        mock_service.get_movie_rating.return_value = 7.5
+        mock_session = MagicMock(spec=AsyncSession)
+        mock_session.run_sync = AsyncMock(side_effect=lambda fn: fn(MagicMock(spec=Session)))
+        proxy = AsyncProxy(mock_service, mock_session)
+
+        # Act
+        result = await proxy.get_movie_rating(1)
+
+        # Assert
+        self.assertEqual(result, 7.5)
+        mock_session.run_sync.assert_awaited_once()
+        mock_service.get_movie_rating.assert_called_once_with(1)
+
+    async def test_exceptions_propagate(self):
+        # Arrange
+        mock_service = MagicMock(spec=MovieService)
+        mock_service.get_movie.side_effect = ValueError("boom")
+        proxy = AsyncProxy(mock_service)
+
+        # Act & Assert
+        with self.assertRaises(ValueError):
+            await proxy.get_movie(1)
+
+    async def test_generator_methods_become_async_generators(self):
+        # Arrange
+        class Exporter:
+            def export(self, n):
+                yield from range(n)
+        proxy = AsyncProxy(Exporter(), MagicMock(spec=Session))
+
+        # Act
+        items = [item async for item in proxy.export(3)]
+
+        # Assert
+        self.assertEqual(items, [0, 1, 2])
+
+if __name__ == '__main__':
+    unittest.main()
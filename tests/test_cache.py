@@ -1,12 +1,17 @@
+import asyncio
+import threading
+import time
 import unittest
-from unittest.mock import MagicMock
+from unittest.mock import MagicMock, patch
+from sqlalchemy.util.concurrency import await_only, greenlet_spawn
 from service.CacheService import CacheService
 
 class TestCache(unittest.TestCase):
 
     def setUp(self):
+        self.config = {"cache_ttl_seconds": 60, "cache_max_entries": 3, "cache_max_bytes": 1024 * 1024}
         self.mock_config = MagicMock()
-        self.mock_config.get.return_value = 60
+        self.mock_config.get.side_effect = lambda key, default=None: self.config.get(key, default)
         self.service = CacheService(self.mock_config)
         self.service._cache = {} 
 
@@ -46,5 +51,303 @@ class TestCache(unittest.TestCase):
         self.assertIsNone(self.service.get("prefix_2"))
         self.assertEqual(self.service.get("other_1"), "val3")
 
+    def test_least_recently_used_entry_is_evicted(self):
+        # Arrange
+        self.service.set("a", 1)
+        self.service.set("b", 2)
+        self.service.set("c", 3)
+        self.service.get("a")
+
+        # Act
+        self.service.set("d", 4)
+
+        # Assert
+        self.assertIsNone(self.service.get("b"))
+        self.assertEqual([self.service.get(k) for k in "acd"], [1, 3, 4])
+        self.assertEqual(len(self.service), 3)
+
+    def test_byte_budget_evicts_oldest_entries(self):
+        # Arrange
+        self.config["cache_max_entries"] = 100
+        self.config["cache_max_bytes"] = 5000
+        service = CacheService(self.mock_config)
+
+        # Act
+        service.set("first", "x" * 2000)
+        service.set("second", "x" * 2000)
+        service.set("third", "x" * 2000)
+        service.set("too_big", "x" * 10000)
+
+        # Assert
+        self.assertIsNone(service.get("first"))
+        self.assertIsNotNone(service.get("third"))
+        self.assertIsNone(service.get("too_big"))
+        self.assertLessEqual(service.size_bytes, 5000)
+
+    def test_per_key_ttl_overrides_default(self):
+        # Arrange
+        with patch("service.CacheService.time.monotonic", return_value=1000.0):
+            self.service.set("short", "val", ttl=5)
+            self.service.set("default", "val")
+
+        # Act
+        with patch("service.CacheService.time.monotonic", return_value=1010.0):
+            short, default = self.service.get("short"), self.service.get("default")
+
+        # Assert
+        self.assertIsNone(short)
+        self.assertEqual(default, "val")
+
+    def test_sweep_removes_expired_entries(self):
+        # Arrange
+        with patch("service.CacheService.time.monotonic", return_value=1000.0):
+            self.service.set("old", "val", ttl=1)
+            self.service.set("fresh", "val")
+
+        # Act
+        with patch("service.CacheService.time.monotonic", return_value=1002.0):
+            removed = self.service.sweep()
+
+        # Assert
+        self.assertEqual(removed, 1)
+        self.assertEqual(len(self.service), 1)
+
+    def test_invalidate_tags_drops_only_tagged_entries(self):
+        # Arrange
+        self.service.set("horror_page", "val1", tags=["genre:horror", "movie:1"])
+        self.service.set("comedy_page", "val2", tags=["genre:comedy", "movie:2"])
+        self.service.set("untagged", "val3")
+
+        # Act
+        removed = self.service.invalidate_tags(["movie:1"])
+
+        # Assert
+        self.assertEqual(removed, 1)
+        self.assertIsNone(self.service.get("horror_page"))
+        self.assertEqual(self.service.get("comedy_page"), "val2")
+        self.assertEqual(self.service.get("untagged"), "val3")
+        self.assertNotIn("genre:horror", self.service._tags)
+
+    # --- Single flight ---
+
+    def _slow_loader(self, value="loaded", delay=0.05):
+        calls = []
+
+        def load():
+            calls.append(1)
+            time.sleep(delay)
+            return value
+        return load, calls
+
+    def test_concurrent_misses_share_one_load(self):
+        # Arrange
+        loader, calls = self._slow_loader()
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(self.service.get_or_load("page", loader)))
+                   for _ in range(8)]
+
+        # Act
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        # Assert
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, ["loaded"] * 8)
+        stats = self.service.stats()
+        self.assertEqual(stats["loads"], 1)
+        self.assertEqual(stats["coalesced"] + stats["hits"], 7)
+
+    def test_without_single_flight_every_miss_loads(self):
+        # Arrange
+        self.config["cache_single_flight"] = False
+        service = CacheService(self.mock_config)
+        loader, calls = self._slow_loader()
+        threads = [threading.Thread(target=service.get_or_load, args=("page", loader)) for _ in range(4)]
+
+        # Act
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        # Assert
+        self.assertEqual(len(calls), 4)
+
+    def test_load_errors_reach_every_waiter_and_are_not_cached(self):
+        # Arrange
+        def failing():
+            time.sleep(0.05)
+            raise ValueError("boom")
+        errors = []
+
+        def call():
+            try:
+                self.service.get_or_load("page", failing)
+            except ValueError as e:
+                errors.append(e)
+        threads = [threading.Thread(target=call) for _ in range(3)]
+
+        # Act
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        # Assert
+        self.assertEqual(len(errors), 3)
+        self.assertEqual(self.service.stats()["load_errors"], 1)
+        self.assertIsNone(self.service.get("page"))
+
+    def test_load_racing_an_invalidation_is_not_stored(self):
+        # Arrange
+        def load():
+            self.service.invalidate_tags(["movie:1"])
+            return "old"
+
+        # Act
+        result = self.service.get_or_load("page", load, tags_of=lambda _: ["movie:1"])
+
+        # Assert
+        self.assertEqual(result, "old")
+        self.assertIsNone(self.service.get("page"))
+
+    def test_invalidating_other_tags_does_not_drop_a_concurrent_load(self):
+        # Arrange
+        loading = threading.Event()
+        release = threading.Event()
+
+        def load():
+            loading.set()
+            release.wait(1)
+            return "movie 2"
+
+        loader = threading.Thread(target=self.service.get_or_load,
+                                  args=("movies_id_2", load), kwargs={"tags_of": lambda _: ["movie:2"]})
+
+        # Act
+        loader.start()
+        loading.wait(1)
+        self.service.invalidate_tags(["movie:1"])
+        self.service.delete("movies_id_1")
+        release.set()
+        loader.join()
+
+        # Assert
+        self.assertEqual(self.service.get("movies_id_2"), "movie 2")
+
+    def test_load_racing_a_delete_of_its_key_is_not_stored(self):
+        # Arrange
+        def load():
+            self.service.clear_all_starting_with("movies_")
+            raise LookupError("Movie 9 not found")
+
+        # Act
+        with self.assertRaises(LookupError):
+            self.service.get_or_load("movies_id_9", load, not_found=LookupError)
+
+        # Assert
+        self.assertIsNone(self.service.get("movies_id_9"))
+        self.assertEqual(self.service.stats()["in_flight"], 0)
+
+    def test_not_found_is_cached_and_raised_again(self):
+        # Arrange
+        calls = []
+
+        def load():
+            calls.append(1)
+            raise LookupError("Movie 9 not found")
+
+        # Act
+        with self.assertRaises(LookupError):
+            self.service.get_or_load("movies_id_9", load, not_found=LookupError)
+        with self.assertRaises(LookupError) as raised:
+            self.service.get_or_load("movies_id_9", load, not_found=LookupError)
+
+        # Assert
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(str(raised.exception), "Movie 9 not found")
+        self.assertEqual(self.service.stats()["load_errors"], 0)
+
+    def test_negative_entries_expire_after_their_own_ttl(self):
+        # Arrange
+        self.config["cache_negative_ttl_seconds"] = 5
+        service = CacheService(self.mock_config)
+
+        def missing():
+            raise LookupError("missing")
+
+        with patch("service.CacheService.time.monotonic", return_value=1000.0):
+            with self.assertRaises(LookupError):
+                service.get_or_load("movies_id_9", missing, not_found=LookupError)
+
+        # Act
+        with patch("service.CacheService.time.monotonic", return_value=1006.0):
+            result = service.get_or_load("movies_id_9", lambda: "created", not_found=LookupError)
+
+        # Assert
+        self.assertEqual(result, "created")
+
+    def test_delete_drops_only_the_given_keys(self):
+        # Arrange
+        self.service.set("movies_id_1", "a")
+        self.service.set("movies_id_2", "b")
+
+        # Act
+        self.service.delete("movies_id_1")
+
+        # Assert
+        self.assertIsNone(self.service.get("movies_id_1"))
+        self.assertEqual(self.service.get("movies_id_2"), "b")
+
+    def test_stale_entry_is_served_while_one_caller_refreshes(self):
+        # Arrange
+        self.config["cache_stale_seconds"] = 30
+        service = CacheService(self.mock_config)
+        with patch("service.CacheService.time.monotonic", return_value=1000.0):
+            service.set("page", "old", ttl=1)
+        refreshing = threading.Event()
+        release = threading.Event()
+
+        def refresh():
+            refreshing.set()
+            release.wait(1)
+            return "new"
+
+        # Act
+        with patch("service.CacheService.time.monotonic", return_value=1005.0):
+            leader = threading.Thread(target=service.get_or_load, args=("page", refresh))
+            leader.start()
+            refreshing.wait(1)
+            during = service.get_or_load("page", lambda: self.fail("second refresh"))
+            release.set()
+            leader.join()
+            after = service.get("page")
+
+        # Assert
+        self.assertEqual(during, "old")
+        self.assertEqual(after, "new")
+        self.assertEqual(service.stats()["stale_hits"], 1)
+
+    def test_waiters_inside_greenlets_yield_to_the_event_loop(self):
+        # Arrange: loaders that wait on the loop, as sync ORM code does under AsyncSession.run_sync
+        calls = []
+
+        def load():
+            calls.append(1)
+            await_only(asyncio.sleep(0.05))
+            return "loaded"
+
+        async def run():
+            return await asyncio.gather(*(greenlet_spawn(self.service.get_or_load, "page", load) for _ in range(5)))
+
+        # Act
+        results = asyncio.run(asyncio.wait_for(run(), 5))
+
+        # Assert
+        self.assertEqual(results, ["loaded"] * 5)
+        self.assertEqual(len(calls), 1)
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,368 @@
+import asyncio
+import fnmatch
+import os
+import socketserver
+import tempfile
+import threading
+import time
+import unittest
+from unittest.mock import MagicMock
+from sqlalchemy.util.concurrency import greenlet_spawn
+from service.CacheBackend import MmapCacheBackend, RedisCacheBackend, RespClient, RespError
+from service.CacheService import CacheService
+from model.DTOs.MovieDTO import MovieOut, MovieGenre
+
+
+class FakeRespServer(socketserver.ThreadingTCPServer):
+    """In-process server speaking enough of the Redis protocol for RedisCacheBackend."""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), _FakeRespHandler)
+        self.data = {}
+        self.expiry = {}
+        self.lock = threading.Lock()
+        # command -> function run once before the next such command, outside the lock
+        self.before = {}
+
+    def live(self, key):
+        if key in self.expiry and self.expiry[key] <= time.monotonic():
+            self.data.pop(key, None)
+            self.expiry.pop(key, None)
+        return self.data.get(key)
+
+
+class _FakeRespHandler(socketserver.StreamRequestHandler):
+
+    def handle(self):
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            args = []
+            for _ in range(int(line[1:])):
+                length = int(self.rfile.readline()[1:])
+                args.append(self.rfile.read(length + 2)[:-2])
+            command = args[0].upper().decode()
+            hook = self.server.before.pop(command, None)
+            if hook is not None:
+                hook()
+            with self.server.lock:
+                reply = self.run(command, args[1:])
+            self.wfile.write(reply)
+
+    def run(self, command, args):
+        server = self.server
+        if command == "GET":
+            value = server.live(args[0])
+            return _bulk(value)
+        if command == "SET":
+            server.data[args[0]] = args[1]
+            server.expiry.pop(args[0], None)
+            if len(args) > 3 and args[2].upper() == b"PX":
+                server.expiry[args[0]] = time.monotonic() + int(args[3]) / 1000
+            return b"+OK\r\n"
+        if command == "SADD":
+            members = server.live(args[0]) or set()
+            members.update(args[1:])
+            server.data[args[0]] = members
+            return b":1\r\n"
+        if command == "PEXPIRE":
+            server.expiry[args[0]] = time.monotonic() + int(args[1]) / 1000
+            return b":1\r\n"
+        if command == "SMEMBERS":
+            members = server.live(args[0]) or set()
+            return b"*%d\r\n" % len(members) + b"".join(_bulk(m) for m in members)
+        if command == "DEL":
+            removed = sum(server.data.pop(key, None) is not None for key in args)
+            return b":%d\r\n" % removed
+        if command == "EVAL":
+            # Only the tag invalidation script is known; it runs under the lock like any script
+            if args[0].decode() != RedisCacheBackend.INVALIDATE_TAGS:
+                return b"-ERR unknown script\r\n"
+            removed = 0
+            for tag in args[2:2 + int(args[1])]:
+                for key in server.live(tag) or set():
+                    removed += server.live(key) is not None
+                    server.data.pop(key, None)
+                server.data.pop(tag, None)
+            return b":%d\r\n" % removed
+        if command == "SCAN":
+            pattern = args[args.index(b"MATCH") + 1].decode()
+            keys = [k for k in list(server.data) if server.live(k) is not None and fnmatch.fnmatchcase(k.decode(), pattern)]
+            return b"*2\r\n" + _bulk(b"0") + b"*%d\r\n" % len(keys) + b"".join(_bulk(k) for k in keys)
+        return b"-ERR unknown command '%s'\r\n" % command.encode()
+
+
+def _bulk(value):
+    return b"$-1\r\n" if value is None else b"$%d\r\n%s\r\n" % (len(value), value)
+
+
+class TestRedisCacheBackend(unittest.TestCase):
+
+    def setUp(self):
+        self.server = FakeRespServer()
+        threading.Thread(target=self.server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True).start()
+        self.url = f"redis://127.0.0.1:{self.server.server_address[1]}/0"
+        self.worker_a = RedisCacheBackend(self.url)
+        self.worker_b = RedisCacheBackend(self.url)
+
+    def tearDown(self):
+        self.worker_a.client.close()
+        self.worker_b.client.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_value_set_by_one_worker_is_read_by_another(self):
+        # Act
+        self.worker_a.set("movies_list_skip_0", b"\x00page", ttl=60)
+
+        # Assert
+        self.assertEqual(self.worker_b.get("movies_list_skip_0"), b"\x00page")
+        self.assertIsNone(self.worker_b.get("missing"))
+
+    def test_invalidate_tags_is_seen_by_all_workers(self):
+        # Arrange
+        self.worker_a.set("horror", b"1", ttl=60, tags=["genre:horror", "movie:1"])
+        self.worker_a.set("comedy", b"2", ttl=60, tags=["genre:comedy"])
+
+        # Act
+        removed = self.worker_b.invalidate_tags(["movie:1"])
+
+        # Assert
+        self.assertEqual(removed, 1)
+        self.assertIsNone(self.worker_a.get("horror"))
+        self.assertEqual(self.worker_a.get("comedy"), b"2")
+
+    def test_key_tagged_during_invalidation_stays_invalidatable(self):
+        # Arrange: worker B caches a new entry under the tag just as worker A invalidates it
+        self.worker_a.set("old", b"1", ttl=60, tags=["movie:1"])
+
+        def repopulate():
+            self.worker_b.set("new", b"2", ttl=60, tags=["movie:1"])
+
+        for command in ("DEL", "EVAL"):
+            self.server.before[command] = repopulate
+
+        # Act
+        self.worker_a.invalidate_tags(["movie:1"])
+        self.worker_a.invalidate_tags(["movie:1"])
+
+        # Assert: whichever way the writes interleaved, "new" was never left out of its tag set
+        self.assertIsNone(self.worker_a.get("old"))
+        self.assertIsNone(self.worker_a.get("new"))
+
+    def test_entries_expire(self):
+        # Act
+        self.worker_a.set("short", b"1", ttl=0.05)
+        time.sleep(0.1)
+
+        # Assert
+        self.assertIsNone(self.worker_b.get("short"))
+
+    def test_delete_prefix_only_touches_matching_keys(self):
+        # Arrange
+        self.worker_a.set("movies_1", b"1", ttl=60)
+        self.worker_a.set("users_1", b"2", ttl=60)
+
+        # Act
+        self.worker_b.delete_prefix("movies_")
+
+        # Assert
+        self.assertIsNone(self.worker_a.get("movies_1"))
+        self.assertEqual(self.worker_a.get("users_1"), b"2")
+
+    def test_delete_is_seen_by_all_workers(self):
+        # Arrange
+        self.worker_a.set("movies_id_1", b"1", ttl=60)
+        self.worker_a.set("movies_id_2", b"2", ttl=60)
+
+        # Act
+        self.worker_b.delete(["movies_id_1"])
+
+        # Assert
+        self.assertIsNone(self.worker_a.get("movies_id_1"))
+        self.assertEqual(self.worker_a.get("movies_id_2"), b"2")
+
+    def test_server_errors_are_raised(self):
+        # Arrange
+        client = RespClient(self.url)
+
+        # Act & Assert
+        with self.assertRaises(RespError):
+            client.execute("NOPE")
+        self.assertIsNone(client.execute("GET", "still-usable"))
+        client.close()
+
+    def test_cache_service_round_trips_models_through_backend(self):
+        # Arrange
+        config = MagicMock()
+        config.get.side_effect = lambda key, default=None: default
+        cache_a = CacheService(config, self.worker_a)
+        cache_b = CacheService(config, self.worker_b)
+        page = [MovieOut(id=1, title="Jaws", year=1975, genre=MovieGenre.HORROR, view_count=3)]
+
+        # Act
+        cache_a.set("movies_list", page, tags=["movie:1"])
+        hit = cache_b.get("movies_list")
+        cache_b.invalidate_tags(["movie:1"])
+
+        # Assert
+        self.assertEqual(hit, page)
+        self.assertIsNone(cache_a.get("movies_list"))
+
+    def test_concurrent_callers_do_not_wait_for_each_other(self):
+        # Arrange: the server stalls the first GET until the test lets it go
+        self.worker_a.set("a", b"1", ttl=60)
+        self.worker_a.set("b", b"2", ttl=60)
+        stalled = threading.Event()
+        release = threading.Event()
+        self.server.before["GET"] = lambda: (stalled.set(), release.wait(2))
+        results = []
+        first = threading.Thread(target=lambda: results.append(self.worker_a.get("a")))
+
+        # Act
+        first.start()
+        stalled.wait(1)
+        second = self.worker_a.get("b")
+        first_still_waiting = first.is_alive()
+        release.set()
+        first.join()
+
+        # Assert
+        self.assertEqual(second, b"2")
+        self.assertTrue(first_still_waiting)
+        self.assertEqual(results, [b"1"])
+
+    def test_cache_service_keeps_backend_calls_off_the_event_loop(self):
+        # Arrange
+        config = MagicMock()
+        config.get.side_effect = lambda key, default=None: default
+        cache = CacheService(config, self.worker_a)
+        cache.set("movies_id_1", "Jaws")
+        callers = []
+        get = self.worker_a.get
+        self.worker_a.get = lambda key: (callers.append(threading.current_thread()), get(key))[1]
+
+        async def run():
+            # As sync service code runs under AsyncSession.run_sync
+            return threading.current_thread(), await greenlet_spawn(cache.get, "movies_id_1")
+
+        # Act
+        loop_thread, result = asyncio.run(asyncio.wait_for(run(), 5))
+
+        # Assert
+        self.assertEqual(result, "Jaws")
+        self.assertEqual(len(callers), 1)
+        self.assertIsNot(callers[0], loop_thread)
+
+    def test_cache_service_treats_unreachable_backend_as_miss(self):
+        # Arrange
+        config = MagicMock()
+        config.get.side_effect = lambda key, default=None: default
+        self.server.shutdown()
+        self.server.server_close()
+        cache = CacheService(config, RedisCacheBackend("redis://127.0.0.1:1/0"))
+
+        # Act
+        cache.set("key", "value")
+
+        # Assert
+        self.assertIsNone(cache.get("key"))
+
+
+class TestMmapCacheBackend(unittest.TestCase):
+
+    def setUp(self):
+        handle, self.path = tempfile.mkstemp()
+        os.close(handle)
+        # Two instances over one file stand in for two worker processes
+        self.worker_a = MmapCacheBackend(self.path, slots=64, slot_size=1024)
+        self.worker_b = MmapCacheBackend(self.path, slots=64, slot_size=1024)
+
+    def tearDown(self):
+        self.worker_a.close()
+        self.worker_b.close()
+        os.remove(self.path)
+
+    def test_value_set_by_one_worker_is_read_by_another(self):
+        # Act
+        self.worker_a.set("movies_list_skip_0", b"\x00page", ttl=60, tags=["movie:1"])
+
+        # Assert
+        self.assertEqual(self.worker_b.get("movies_list_skip_0"), b"\x00page")
+        self.assertIsNone(self.worker_b.get("missing"))
+
+    def test_invalidate_tags_is_seen_by_all_workers(self):
+        # Arrange
+        self.worker_a.set("horror", b"1", ttl=60, tags=["genre:horror", "movie:1"])
+        self.worker_a.set("comedy", b"2", ttl=60, tags=["genre:comedy"])
+
+        # Act
+        self.worker_b.invalidate_tags(["movie:1"])
+
+        # Assert
+        self.assertIsNone(self.worker_a.get("horror"))
+        self.assertEqual(self.worker_a.get("comedy"), b"2")
+
+    def test_delete_is_seen_by_all_workers(self):
+        # Arrange
+        self.worker_a.set("movies_id_1", b"1", ttl=60)
+        self.worker_a.set("movies_id_2", b"2", ttl=60)
+
+        # Act
+        self.worker_b.delete(["movies_id_1"])
+
+        # Assert
+        self.assertIsNone(self.worker_a.get("movies_id_1"))
+        self.assertEqual(self.worker_a.get("movies_id_2"), b"2")
+
+    def test_clear_drops_every_entry(self):
+        # Arrange
+        self.worker_a.set("a", b"1", ttl=60)
+
+        # Act
+        self.worker_b.clear()
+
+        # Assert
+        self.assertIsNone(self.worker_a.get("a"))
+
+    def test_entries_expire(self):
+        # Act
+        self.worker_a.set("short", b"1", ttl=-1)
+
+        # Assert
+        self.assertIsNone(self.worker_b.get("short"))
+
+    def test_oversized_values_are_not_stored(self):
+        # Act
+        self.worker_a.set("big", b"x" * 2048, ttl=60)
+
+        # Assert
+        self.assertIsNone(self.worker_a.get("big"))
+
+    def test_full_set_evicts_and_keeps_recent_keys(self):
+        # Act
+        for i in range(200):
+            self.worker_a.set(f"key_{i}", str(i).encode(), ttl=60 + i)
+
+        # Assert
+        self.assertEqual(self.worker_b.get("key_199"), b"199")
+        stored = sum(self.worker_b.get(f"key_{i}") is not None for i in range(200))
+        self.assertLessEqual(stored, 64)
+
+    def test_reopening_with_other_geometry_resets_the_file(self):
+        # Arrange
+        self.worker_a.set("a", b"1", ttl=60)
+
+        # Act
+        other = MmapCacheBackend(self.path, slots=32, slot_size=1024)
+
+        # Assert
+        self.assertIsNone(other.get("a"))
+        other.close()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,93 @@
+import pickle
+import unittest
+from datetime import datetime
+from unittest.mock import MagicMock
+from model.DTOs.AchievementDTO import AchievementRule, AchievementStatusOut
+from model.DTOs.MovieDTO import MovieGenre, MovieOut, MoviePage
+from service import CacheCodec
+from service.AchievementHandlers import SubscriptionIndex, rating_event
+from service.CacheBackend import CacheBackend
+from service.CacheService import CacheService, NegativeEntry
+from service.EncodedResponse import EncodedBody
+
+
+class _Planted:
+    def __reduce__(self):
+        return (self.fail_if_loaded, ())
+
+    @staticmethod
+    def fail_if_loaded():
+        raise AssertionError("pickle payload was executed")
+
+
+class TestCacheCodec(unittest.TestCase):
+
+    def test_round_trips_cached_values(self):
+        # Arrange
+        movie = MovieOut(id=1, title="Jaws", year=1975, genre=MovieGenre.HORROR, view_count=3)
+        values = [
+            (1700000000.25, [movie]),
+            MoviePage(items=[movie], next_cursor="abc"),
+            [AchievementStatusOut(id=1, name="Critic", description="Rate", earned=True, earned_at=datetime(2024, 5, 1, 12, 30))],
+            EncodedBody(b"[\x00\xff]", b"\x1f\x8b", (("X-Next-Cursor", "abc"),), "v1"),
+            {"ratio": 0.5, "names": ("a", None, True)},
+        ]
+
+        # Act & Assert
+        for value in values:
+            self.assertEqual(CacheCodec.decode(CacheCodec.encode(value)), value)
+
+    def test_subscription_index_is_rebuilt_from_its_rules(self):
+        # Arrange
+        index = SubscriptionIndex([
+            AchievementRule(id=1, name="Critic", condition_type="COUNT_REVIEWS", condition_params={"threshold": 1}),
+            AchievementRule(id=2, name="Contrarian", condition_type="CONTRARIAN", condition_params={}),
+        ])
+
+        # Act
+        rebuilt = CacheCodec.decode(CacheCodec.encode(index))
+
+        # Assert
+        event = rating_event(MovieGenre.DRAMA, commented=False)
+        self.assertIsInstance(rebuilt, SubscriptionIndex)
+        self.assertEqual([a.id for a, _ in rebuilt.select(event)], [a.id for a, _ in index.select(event)])
+
+    def test_unregistered_types_are_refused(self):
+        # Act & Assert
+        with self.assertRaises(CacheCodec.CacheCodecError):
+            CacheCodec.encode(object())
+        document = b'{"$":"Popen","v":["sh"]}'
+        with self.assertRaisesRegex(CacheCodec.CacheCodecError, "Unknown cached type Popen"):
+            CacheCodec.decode(CacheCodec.MAGIC + len(document).to_bytes(4, "little") + document)
+
+    def test_cache_service_ignores_payloads_it_did_not_encode(self):
+        # Arrange: another writer of the shared backend planted a pickle
+        config = MagicMock()
+        config.get.side_effect = lambda key, default=None: default
+        backend = MagicMock(spec=CacheBackend)
+        backend.get.return_value = pickle.dumps((float("inf"), _Planted()))
+        cache = CacheService(config, backend)
+
+        # Act
+        result = cache.get_or_load("movies_id_1", lambda: "loaded")
+
+        # Assert
+        self.assertEqual(result, "loaded")
+
+    def test_cache_service_stores_negative_entries_in_the_backend(self):
+        # Arrange
+        config = MagicMock()
+        config.get.side_effect = lambda key, default=None: default
+        backend = MagicMock(spec=CacheBackend)
+        cache = CacheService(config, backend)
+
+        # Act
+        cache.set("movies_id_9", NegativeEntry("Movie 9 not found"))
+        fresh_until, entry = CacheCodec.decode(backend.set.call_args.args[1])
+
+        # Assert
+        self.assertIsInstance(entry, NegativeEntry)
+        self.assertEqual(entry.message, "Movie 9 not found")
+
+if __name__ == '__main__':
+    unittest.main()
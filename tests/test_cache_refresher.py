@@ -0,0 +1,76 @@
+import asyncio
+import unittest
+from unittest.mock import MagicMock, patch
+from sqlalchemy.orm import Session
+from service.CacheRefresher import CacheRefresher
+from service.CacheService import CacheService
+
+
+class TestCacheRefresher(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.config = {"cache_ttl_seconds": 60, "cache_stale_seconds": 30}
+        self.mock_config = MagicMock()
+        self.mock_config.get.side_effect = lambda key, default=None: self.config.get(key, default)
+        self.cache = CacheService(self.mock_config)
+        self.mock_db = MagicMock(spec=Session)
+        self.refresher = CacheRefresher(self.cache, lambda: self.mock_db, workers=1)
+        with patch("service.CacheService.time.monotonic", return_value=1000.0):
+            self.cache.set("page", "old", ttl=1)
+
+    async def test_stale_entry_is_served_while_refreshed_on_its_own_session(self):
+        # Arrange
+        await self.refresher.start()
+        sessions = []
+
+        def refresh(db):
+            sessions.append(db)
+            return "new"
+
+        # Act
+        with patch("service.CacheService.time.monotonic", return_value=1005.0):
+            first = self.cache.get_or_load("page", lambda: self.fail("loaded inline"), refresh=refresh)
+            second = self.cache.get_or_load("page", lambda: self.fail("loaded inline"), refresh=refresh)
+            await self.refresher.stop()
+            after = self.cache.get("page")
+
+        # Assert
+        self.assertEqual((first, second), ("old", "old"))
+        self.assertEqual(after, "new")
+        self.assertEqual(sessions, [self.mock_db])
+        self.mock_db.close.assert_called_once()
+        self.assertEqual(self.cache.stats()["stale_hits"], 2)
+
+    async def test_leader_reloads_inline_when_no_refresher_runs(self):
+        # Act
+        with patch("service.CacheService.time.monotonic", return_value=1005.0):
+            result = self.cache.get_or_load("page", lambda: "new", refresh=lambda db: self.fail("refreshed"))
+
+        # Assert
+        self.assertEqual(result, "new")
+        self.assertIsNone(self.cache.schedule_refresh)
+
+    async def test_failed_refresh_keeps_the_stale_value_and_frees_the_key(self):
+        # Arrange
+        await self.refresher.start()
+        calls = []
+
+        def refresh(db):
+            calls.append(db)
+            raise RuntimeError("database unavailable")
+
+        # Act
+        with patch("service.CacheService.time.monotonic", return_value=1005.0):
+            first = self.cache.get_or_load("page", lambda: self.fail("loaded inline"), refresh=refresh)
+            await asyncio.sleep(0)
+            await self.refresher._queue.join()
+            second = self.cache.get_or_load("page", lambda: self.fail("loaded inline"), refresh=refresh)
+            await self.refresher.stop()
+
+        # Assert
+        self.assertEqual((first, second), ("old", "old"))
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(self.cache.stats()["in_flight"], 0)
+
+if __name__ == '__main__':
+    unittest.main()
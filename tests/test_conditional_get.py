@@ -0,0 +1,58 @@
+import unittest
+from unittest.mock import MagicMock
+from service.ConditionalGet import content_version, not_modified, validators
+
+
+class TestConditionalGet(unittest.TestCase):
+
+    def setUp(self):
+        self.config = MagicMock()
+        self.config.get.side_effect = lambda key, default=None: {
+            "cache_control": {"/movies/{id}": "public, max-age=0, must-revalidate"}
+        }.get(key, default)
+
+    def _request(self, if_none_match=None):
+        request = MagicMock()
+        request.headers = {"if-none-match": if_none_match} if if_none_match else {}
+        return request
+
+    def test_validators_carry_etag_and_route_cache_control(self):
+        # Act
+        headers = validators("abc123", self.config, "/movies/{id}")
+
+        # Assert
+        self.assertEqual(headers["ETag"], 'W/"abc123"')
+        self.assertEqual(headers["Cache-Control"], "public, max-age=0, must-revalidate")
+        self.assertNotIn("Cache-Control", validators("abc123", self.config, "/movies"))
+
+    def test_content_version_depends_only_on_the_body(self):
+        # Act
+        version = content_version(b'{"id": 1}')
+
+        # Assert
+        self.assertEqual(version, content_version(b'{"id": 1}'))
+        self.assertNotEqual(version, content_version(b'{"id": 2}'))
+
+    def test_matching_if_none_match_gets_304_with_the_validators(self):
+        # Arrange
+        headers = validators("abc123", self.config, "/movies/{id}")
+
+        # Act
+        response = not_modified(self._request('"other", "abc123"'), headers)
+
+        # Assert
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.headers["etag"], 'W/"abc123"')
+        self.assertEqual(response.body, b"")
+
+    def test_other_etags_and_missing_versions_are_served_in_full(self):
+        # Arrange
+        headers = validators("abc123", self.config, "/movies/{id}")
+
+        # Act & Assert
+        self.assertIsNone(not_modified(self._request('W/"old"'), headers))
+        self.assertIsNone(not_modified(self._request(), headers))
+        self.assertIsNone(not_modified(self._request("*"), validators(None, self.config, "/movies/{id}")))
+
+if __name__ == '__main__':
+    unittest.main()
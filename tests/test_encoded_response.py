@@ -0,0 +1,56 @@
+import gzip
+import json
+import unittest
+from typing import List
+from unittest.mock import MagicMock
+from pydantic import TypeAdapter
+from model.DTOs.MovieDTO import MovieGenre, MovieOut
+from service.EncodedResponse import encode_body, encoded_response
+
+MOVIES = TypeAdapter(List[MovieOut])
+
+
+class TestEncodedResponse(unittest.TestCase):
+
+    def setUp(self):
+        self.items = [MovieOut(id=i, title=f"Movie {i}", year=2000, genre=MovieGenre.DRAMA, view_count=0) for i in range(20)]
+
+    def _request(self, accept_encoding=""):
+        request = MagicMock()
+        request.headers = {"accept-encoding": accept_encoding}
+        return request
+
+    def test_body_matches_the_response_model_encoding(self):
+        # Act
+        encoded = encode_body(self.items, MOVIES)
+
+        # Assert
+        self.assertEqual(json.loads(encoded.body), [item.model_dump(mode="json") for item in self.items])
+        self.assertIsNone(encoded.gzipped)
+
+    def test_large_bodies_are_also_gzipped(self):
+        # Act
+        encoded = encode_body(self.items, MOVIES, gzip_min_bytes=100)
+
+        # Assert
+        self.assertEqual(gzip.decompress(encoded.gzipped), encoded.body)
+        self.assertEqual(encode_body(self.items, MOVIES, gzip_min_bytes=100).gzipped, encoded.gzipped)
+
+    def test_gzip_is_sent_only_to_clients_accepting_it(self):
+        # Arrange
+        encoded = encode_body(self.items, MOVIES, gzip_min_bytes=100, headers=(("X-Next-Cursor", "abc"),))
+
+        # Act
+        zipped = encoded_response(encoded, self._request("gzip, deflate"))
+        plain = encoded_response(encoded, self._request())
+
+        # Assert
+        self.assertEqual(zipped.body, encoded.gzipped)
+        self.assertEqual(zipped.headers["content-encoding"], "gzip")
+        self.assertEqual(plain.body, encoded.body)
+        self.assertNotIn("content-encoding", plain.headers)
+        self.assertEqual(plain.headers["vary"], "Accept-Encoding")
+        self.assertEqual(plain.headers["x-next-cursor"], "abc")
+
+if __name__ == '__main__':
+    unittest.main()
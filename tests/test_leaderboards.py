@@ -0,0 +1,87 @@
+import unittest
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+from model.DTOs.MovieDTO import MovieGenre
+from repository.MovieRepository import MovieRepository
+from service.Leaderboards import Leaderboards
+
+class TestLeaderboards(unittest.TestCase):
+
+    def setUp(self):
+        self.boards = Leaderboards(size=2, slack=2)
+
+    def test_top_orders_by_score_then_id(self):
+        # Arrange
+        for movie_id, score in [(1, 7.0), (2, 9.0), (3, 7.0)]:
+            self.boards.update("average_rating", movie_id, MovieGenre.DRAMA, score)
+
+        # Act
+        result = self.boards.top("average_rating", n=10)
+
+        # Assert
+        self.assertEqual(result, [(2, 9.0), (1, 7.0)])
+
+    def test_boards_are_bounded_and_keep_the_best(self):
+        # Arrange
+        for movie_id in range(1, 11):
+            self.boards.update("view_count", movie_id, MovieGenre.ACTION, movie_id * 10)
+
+        # Act
+        result = self.boards.top("view_count", MovieGenre.ACTION, n=2)
+
+        # Assert
+        self.assertEqual(result, [(10, 100), (9, 90)])
+        self.assertEqual(len(self.boards._boards[("view_count", None)].scores), 4)
+
+    def test_dropped_score_is_replaced_from_slack(self):
+        # Arrange
+        for movie_id, score in [(1, 9.0), (2, 8.0), (3, 7.0)]:
+            self.boards.update("average_rating", movie_id, MovieGenre.DRAMA, score)
+
+        # Act
+        self.boards.update("average_rating", 1, MovieGenre.DRAMA, 1.0)
+
+        # Assert
+        self.assertEqual(self.boards.top("average_rating", MovieGenre.DRAMA), [(2, 8.0), (3, 7.0)])
+
+    def test_genre_boards_are_separate(self):
+        # Arrange
+        self.boards.update_movies([
+            SimpleNamespace(id=1, genre=MovieGenre.DRAMA, average_rating=5.0, view_count=3),
+            SimpleNamespace(id=2, genre=MovieGenre.HORROR, average_rating=6.0, view_count=1),
+        ])
+
+        # Act & Assert
+        self.assertEqual(self.boards.top("average_rating", MovieGenre.DRAMA), [(1, 5.0)])
+        self.assertEqual(self.boards.top("view_count"), [(1, 3), (2, 1)])
+
+    def test_remove_and_clear(self):
+        # Arrange
+        self.boards.update("average_rating", 1, MovieGenre.DRAMA, 5.0)
+        self.boards.update("view_count", 1, MovieGenre.DRAMA, 5)
+
+        # Act
+        self.boards.clear("average_rating")
+
+        # Assert
+        self.assertEqual(self.boards.top("average_rating"), [])
+        self.assertEqual(self.boards.top("view_count"), [(1, 5)])
+        self.boards.remove(1)
+        self.assertEqual(self.boards.top("view_count"), [])
+
+    def test_rebuild_replaces_every_board(self):
+        # Arrange
+        self.boards.update("average_rating", 99, MovieGenre.DRAMA, 10.0)
+        mock_repo = MagicMock(spec=MovieRepository)
+        mock_repo.get_top_scores.side_effect = lambda metric, genre, limit: [(1, 4.0)] if genre is None else []
+
+        # Act
+        self.boards.rebuild(mock_repo)
+
+        # Assert
+        self.assertEqual(self.boards.top("average_rating"), [(1, 4.0)])
+        self.assertEqual(self.boards.top("average_rating", MovieGenre.DRAMA), [])
+        mock_repo.get_top_scores.assert_any_call("view_count", MovieGenre.HORROR, 4)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+import unittest
+from service.MovieImport import MovieImportParser
+
+class TestMovieImportParser(unittest.TestCase):
+
+    def _parse(self, parser, body: bytes, chunk_size: int = 4):
+        records = []
+        for i in range(0, len(body), chunk_size):
+            records.extend(parser.feed(body[i:i + chunk_size]))
+        records.extend(parser.close())
+        return records
+
+    def test_ndjson_split_across_chunks(self):
+        # Arrange
+        parser = MovieImportParser("application/x-ndjson")
+        body = '{"title": "Amélie", "year": 2001}\n\n{"title": "Jaws"}'.encode()
+
+        # Act
+        records = self._parse(parser, body)
+
+        # Assert
+        self.assertEqual([r.row for r in records], [1, 3])
+        self.assertEqual(records[0].data["title"], "Amélie")
+        self.assertEqual(records[1].data, {"title": "Jaws"})
+
+    def test_ndjson_invalid_lines_are_reported(self):
+        # Arrange
+        parser = MovieImportParser("application/x-ndjson")
+
+        # Act
+        records = self._parse(parser, b'not json\n[1, 2]\n')
+
+        # Assert
+        self.assertEqual([(r.row, r.data is None) for r in records], [(1, True), (2, True)])
+        self.assertTrue(records[0].error.startswith("Invalid JSON"))
+        self.assertEqual(records[1].error, "Expected a JSON object")
+
+    def test_csv_with_header_and_quoted_newline(self):
+        # Arrange
+        parser = MovieImportParser("text/csv; charset=utf-8")
+        body = b'title,year,genre,description\nAlien,1979,horror,"In space,\nno one ""hears"""\nJaws,1975,horror,\n'
+
+        # Act
+        records = self._parse(parser, body)
+
+        # Assert
+        self.assertEqual(len(records), 2)
+        self.assertEqual(records[0].row, 2)
+        self.assertEqual(records[0].data["description"], 'In space,\nno one "hears"')
+        self.assertIsNone(records[1].data["description"])
+
+    def test_csv_wrong_column_count(self):
+        # Arrange
+        parser = MovieImportParser("text/csv")
+
+        # Act
+        records = self._parse(parser, b'title,year,genre\nAlien,1979\n')
+
+        # Assert
+        self.assertEqual(records[0].error, "Expected 3 columns, got 2")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,146 @@
+import unittest
+from sqlalchemy import func, select
+from model.DTOs.MovieDTO import MovieFilter, MovieGenre, MovieSort, SortOrder
+from model.RatingHistogramORM import RatingHistogramORM
+from model.UserRatingORM import UserRatingORM
+from repository.MovieRepository import MovieRepository
+from tests.sqlite_fixture import SqliteTestCase
+
+
+class TestMovieRepository(SqliteTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.repo = MovieRepository(self.db)
+
+    # --- Keyset pagination ---
+
+    def _seek_all(self, filters: MovieFilter, genre=None, limit: int = 2) -> list:
+        # Walks every page the way MovieService does: seek past the last (sort value, id)
+        pages = [self.repo.get_filtered(filters, genre, 0, limit)]
+        while len(pages[-1]) == limit:
+            last = pages[-1][-1]
+            after_key = getattr(last, filters.sort.value) if filters.sort else None
+            pages.append(self.repo.get_filtered(filters, genre, 0, limit, last.id, after_key))
+        return [row.id for page in pages for row in page]
+
+    def test_get_filtered_seeks_through_ties_in_both_directions(self):
+        # Arrange: three movies share 1999, so the id tie-breaker decides the order
+        years = {1: 1999, 2: 2005, 3: 1999, 4: 1980, 5: 1999, 6: 2010}
+        for id, year in years.items():
+            self.add_movie(id, year=year)
+
+        # Act
+        ascending = self._seek_all(MovieFilter(sort=MovieSort.YEAR))
+        descending = self._seek_all(MovieFilter(sort=MovieSort.YEAR, order=SortOrder.DESC))
+
+        # Assert
+        self.assertEqual(ascending, [4, 1, 3, 5, 2, 6])
+        self.assertEqual(descending, [6, 2, 5, 3, 1, 4])
+
+    def test_get_filtered_seek_keeps_filters_and_genre(self):
+        # Arrange
+        for id in range(1, 9):
+            self.add_movie(id, title=f"Movie {id}", average_rating=float(id % 4),
+                           genre=MovieGenre.HORROR if id % 2 else MovieGenre.DRAMA)
+        filters = MovieFilter(min_rating=1.0, sort=MovieSort.AVERAGE_RATING, order=SortOrder.DESC)
+
+        # Act
+        result = self._seek_all(filters, MovieGenre.HORROR, limit=1)
+
+        # Assert: horror is the odd ids, rated 1, 3, 1, 3
+        self.assertEqual(result, [7, 3, 5, 1])
+
+    def test_get_filtered_seeks_by_id_without_sort(self):
+        # Arrange
+        for id in range(1, 6):
+            self.add_movie(id, year=2000 + id)
+
+        # Act
+        result = self.repo.get_filtered(MovieFilter(year_min=2002), None, 0, 2, after_id=3)
+
+        # Assert
+        self.assertEqual([row.id for row in result], [4, 5])
+
+    # --- Rating histograms ---
+
+    def test_apply_histogram_deltas_matches_ratings_after_inserts_updates_and_deletes(self):
+        # Arrange
+        self.add_user(1)
+        self.add_user(2)
+        self.add_movie(1)
+        self.add_movie(2)
+        ratings = [UserRatingORM(user_id=user_id, movie_id=movie_id, rating=rating)
+                   for user_id, movie_id, rating in [(1, 1, 7), (2, 1, 7), (1, 2, 3)]]
+        self.db.add_all(ratings)
+        self.db.flush()
+        self.repo.apply_histogram_deltas({(1, 7): 2, (2, 3): 1})
+
+        # Act: one rating moves from 7 to 10, another is deleted, as in one executemany
+        ratings[0].rating = 10
+        self.db.delete(ratings[2])
+        self.db.flush()
+        self.repo.apply_histogram_deltas({(1, 7): -1, (1, 10): 1, (2, 3): -1, (2, 5): 0})
+
+        # Assert
+        stored = {(movie_id, rating): count for movie_id, rating, count in self.db.execute(
+            select(RatingHistogramORM.movie_id, RatingHistogramORM.rating, RatingHistogramORM.count)) if count}
+        recomputed = {(movie_id, round(rating)): count for movie_id, rating, count in self.db.execute(
+            select(UserRatingORM.movie_id, UserRatingORM.rating, func.count())
+            .group_by(UserRatingORM.movie_id, UserRatingORM.rating))}
+        self.assertEqual(stored, recomputed)
+        self.assertEqual(self.repo.get_rating_histogram(1), [0, 0, 0, 0, 0, 0, 0, 1, 0, 0, 1])
+        self.assertEqual(self.repo.get_rating_histogram(2), [0] * 11)
+
+    # --- Full-text search ---
+
+    def test_search_ranks_title_matches_above_description_matches(self):
+        # Arrange
+        self.add_movie(1, title="Quiet Evening", description="An alien lands in a small town")
+        self.add_movie(2, title="Alien", description="A crew meets something on a ship")
+        self.add_movie(3, title="Heat", director="Michael Mann")
+
+        # Act
+        result = self.repo.search("alien", 10)
+
+        # Assert
+        self.assertEqual([row.id for row in result], [2, 1])
+        self.assertGreater(result[0].rank, result[1].rank)
+
+    def test_search_pages_by_rank_cursor(self):
+        # Arrange: equal ranks, so pages continue by id
+        for id in range(1, 6):
+            self.add_movie(id, title=f"Space Story {id}")
+
+        # Act
+        first = self.repo.search("space story", 2)
+        second = self.repo.search("space story", 2, (first[-1].rank, first[-1].id))
+        rest = self.repo.search("space story", 10, (second[-1].rank, second[-1].id))
+
+        # Assert
+        self.assertEqual([row.id for row in first + second + rest], [1, 2, 3, 4, 5])
+
+    def test_search_follows_title_updates_and_deletes(self):
+        # Arrange
+        movie = self.add_movie(1, title="Working Title")
+        self.add_movie(2, title="Another Working Title")
+
+        # Act
+        movie.title = "Final Cut"
+        self.db.flush()
+        self.repo.delete_movie(2)
+
+        # Assert
+        self.assertEqual([row.id for row in self.repo.search("final", 10)], [1])
+        self.assertEqual(self.repo.search("working", 10), [])
+
+    def test_search_treats_query_syntax_as_words(self):
+        # Arrange
+        self.add_movie(1, title="Alien")
+
+        # Act & Assert
+        self.assertEqual([row.id for row in self.repo.search('alien OR "', 10)], [])
+        self.assertEqual([row.id for row in self.repo.search("ALIEN*", 10)], [1])
+
+if __name__ == '__main__':
+    unittest.main()
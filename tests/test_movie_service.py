@@ -1,13 +1,22 @@
+import json
 import unittest
+from types import SimpleNamespace
 from unittest.mock import MagicMock
 from service.MovieService import MovieService
 from repository.MovieRepository import MovieRepository
 from repository.UserRatingRepository import UserRatingRepository
 from service.CacheService import CacheService
 from service.ConfigService import ConfigService
-from model.DTOs.MovieDTO import MovieCreate, MovieOut, MovieGenre, MovieUpdate
+from model.DTOs.MovieDTO import MovieCreate, MovieOut, MovieGenre, MovieUpdate, MoviePage, MovieFilter, MovieSort, SortOrder
 from model.MovieORM import MovieORM
 from repository.exceptions import MovieNotFoundException
+from service.exceptions import InvalidCursorException
+from service.ConditionalGet import content_version
+from service.PageCursor import encode_cursor, decode_cursor
+from service.Leaderboards import Leaderboards
+from service.TitlePrefixIndex import TitlePrefixIndex
+from service.ViewCounterBuffer import ViewCounterBuffer
+from service.MovieImport import ImportRecord
 
 class TestMovieService(unittest.TestCase):
 
@@ -16,6 +25,8 @@ class TestMovieService(unittest.TestCase):
         self.mock_rating_repo = MagicMock(spec=UserRatingRepository)
         self.mock_cache = MagicMock(spec=CacheService)
         self.mock_config = MagicMock(spec=ConfigService)
+        self.mock_cache.get.return_value = None
+        self.mock_cache.get_or_load.side_effect = self._cache_through
         
         self.service = MovieService(
             self.mock_repo, 
@@ -24,6 +35,15 @@ class TestMovieService(unittest.TestCase):
             self.mock_config
         )
 
+    def _cache_through(self, key, loader, ttl=None, tags_of=None, not_found=None, refresh=None):
+        # Read-through over the mocked get/set, so tests can stub hits and assert stores
+        cached = self.mock_cache.get(key)
+        if cached is not None:
+            return cached
+        value = loader()
+        self.mock_cache.set(key, value, tags=tags_of(value) if tags_of else [])
+        return value
+
     # --- CRUD ---
 
     def test_create_success(self):
@@ -53,6 +73,73 @@ class TestMovieService(unittest.TestCase):
         self.assertEqual(result.id, movie_id)
         self.mock_repo.get_movie.assert_called_once_with(movie_id)
 
+    def test_get_movie_is_served_from_cache(self):
+        # Arrange
+        cached = MovieOut(id=1, title="Test", year=2023, genre=MovieGenre.DRAMA, view_count=0)
+        self.mock_cache.get.return_value = cached
+
+        # Act
+        result = self.service.get_movie(1)
+
+        # Assert
+        self.assertIs(result, cached)
+        self.mock_repo.get_movie.assert_not_called()
+
+    def test_create_evicts_cached_lookups_of_the_new_id(self):
+        # Arrange
+        dto = MovieCreate(title="Test Movie", description="Desc", year=2023, genre=MovieGenre.DRAMA)
+        self.mock_repo.create_movie.return_value = MovieORM(id=5, title="Test Movie", description="Desc", year=2023,
+                                                             genre=MovieGenre.DRAMA, view_count=0)
+
+        # Act
+        self.service.create_movie(dto)
+
+        # Assert
+        self.mock_cache.delete.assert_called_once_with("movies_id_5", "movies_rating_5")
+
+    def test_movies_page_encoded_caches_the_json_body(self):
+        # Arrange
+        self.mock_config.get.side_effect = lambda key, default=None: default
+        self.mock_repo.get_paginated.return_value = [
+            MovieORM(id=i, title=f"Movie {i}", year=2023, genre=MovieGenre.DRAMA, view_count=0) for i in (1, 2)
+        ]
+
+        # Act
+        encoded = self.service.get_movies_page_encoded(limit=2)
+
+        # Assert
+        self.assertEqual([movie["id"] for movie in json.loads(encoded.body)], [1, 2])
+        self.assertEqual(dict(encoded.headers)["X-Next-Cursor"], encode_cursor(2, None))
+        key, value = self.mock_cache.set.call_args.args
+        self.assertTrue(key.startswith("movies_json_"))
+        self.assertIs(value, encoded)
+        self.assertIn("movie:2", self.mock_cache.set.call_args.kwargs["tags"])
+        self.assertEqual(encoded.version, content_version(encoded.body))
+
+    def test_movie_version_is_derived_from_the_movie(self):
+        # Arrange
+        config = MagicMock()
+        config.get.side_effect = lambda key, default=None: default
+        cache = CacheService(config)
+        service = MovieService(self.mock_repo, self.mock_rating_repo, cache, self.mock_config)
+        movie_orm = MovieORM(id=1, title="Test", description="D", year=2023, genre=MovieGenre.DRAMA, view_count=0)
+        renamed = MovieORM(id=1, title="Renamed", description="D", year=2023, genre=MovieGenre.DRAMA, view_count=0)
+        self.mock_repo.get_movie.return_value = movie_orm
+        self.mock_repo.update_movie.return_value = renamed
+        first = service.get_movie_version(1)
+
+        # Act
+        cache.clear()
+        reloaded = service.get_movie_version(1)
+        self.mock_repo.get_movie.return_value = renamed
+        service.update_movie(1, MovieUpdate(title="Renamed"))
+
+        # Assert
+        self.assertEqual(reloaded, first)
+        self.assertNotEqual(service.get_movie_version(1), first)
+        self.assertEqual(MovieService(self.mock_repo, self.mock_rating_repo, CacheService(config), self.mock_config)
+                         .get_movie_version(1), service.get_movie_version(1))
+
     def test_update_success(self):
         # Arrange
         movie_id = 1
@@ -193,19 +280,52 @@ class TestMovieService(unittest.TestCase):
         self.service.create_movie(dto)
 
         # Assert
-        self.mock_cache.clear_all_starting_with.assert_called_once_with("movies_")
+        self.mock_cache.clear_all_starting_with.assert_not_called()
+        self.mock_cache.invalidate_tags.assert_called_once_with(["movies:genre:drama", "movies:genre:all", "movies:search"])
 
     def test_update_movie_invalidates_cache(self):
         # Arrange
         movie_id = 1
         dto = MovieUpdate(title="Updated")
+        self.mock_repo.get_movie.return_value = MovieORM(id=1, genre=MovieGenre.DRAMA)
         self.mock_repo.update_movie.return_value = MovieORM(id=1, title="Updated", description="D", year=2023, genre=MovieGenre.DRAMA, view_count=0)
 
         # Act
         self.service.update_movie(movie_id, dto)
 
         # Assert
-        self.mock_cache.clear_all_starting_with.assert_called_once_with("movies_")
+        self.mock_cache.clear_all_starting_with.assert_not_called()
+        tags = self.mock_cache.invalidate_tags.call_args[0][0]
+        self.assertEqual(set(tags), {"movie:1", "movies:filtered:all", "movies:filtered:drama", "movies:search"})
+
+    def test_update_movie_genre_invalidates_both_genres(self):
+        # Arrange
+        self.mock_repo.get_movie.return_value = MovieORM(id=1, genre=MovieGenre.DRAMA)
+        self.mock_repo.update_movie.return_value = MovieORM(id=1, title="T", year=2023, genre=MovieGenre.COMEDY, view_count=0)
+
+        # Act
+        self.service.update_movie(1, MovieUpdate(genre=MovieGenre.COMEDY))
+
+        # Assert
+        tags = set(self.mock_cache.invalidate_tags.call_args[0][0])
+        self.assertTrue({"movies:genre:drama", "movies:genre:comedy"} <= tags)
+        self.assertNotIn("movies:genre:all", tags)
+        self.assertNotIn("movies:search", tags)
+
+    def test_list_pages_are_tagged_by_genre_and_movie(self):
+        # Arrange
+        self.mock_cache.get.return_value = None
+        self.mock_repo.get_by_genre.return_value = [
+            MovieORM(id=4, title="A", year=2000, genre=MovieGenre.HORROR, view_count=0),
+            MovieORM(id=7, title="B", year=2001, genre=MovieGenre.HORROR, view_count=0),
+        ]
+
+        # Act
+        self.service.get_all_movies(0, 2, MovieGenre.HORROR)
+
+        # Assert
+        tags = self.mock_cache.set.call_args.kwargs["tags"]
+        self.assertEqual(set(tags), {"movies:genre:horror", "movie:4", "movie:7"})
 
     def test_get_movie_rating_none(self):
         # Arrange
@@ -236,5 +356,355 @@ class TestMovieService(unittest.TestCase):
         self.assertEqual(result[0].genre, MovieGenre.DRAMA)
         self.mock_repo.get_by_genre.assert_called_once_with(genre, 0, 10)
 
+    # --- Cursor pagination ---
+
+    def test_get_all_movies_with_cursor_uses_keyset(self):
+        # Arrange
+        self.mock_cache.get.return_value = None
+        self.mock_repo.get_page_after.return_value = []
+
+        # Act
+        self.service.get_all_movies(skip=100, limit=5, genre=MovieGenre.DRAMA, cursor=encode_cursor(42))
+
+        # Assert
+        self.mock_repo.get_page_after.assert_called_once_with(42, 5, MovieGenre.DRAMA)
+        self.mock_repo.get_by_genre.assert_not_called()
+
+    def test_get_movies_page_full_page_returns_next_cursor(self):
+        # Arrange
+        self.mock_cache.get.return_value = None
+        self.mock_repo.get_paginated.return_value = [
+            MovieORM(id=i, title=f"Movie {i}", year=2023, genre=MovieGenre.DRAMA, view_count=0) for i in (1, 2)
+        ]
+
+        # Act
+        page = self.service.get_movies_page(limit=2)
+
+        # Assert
+        self.assertEqual(len(page.items), 2)
+        self.assertEqual(decode_cursor(page.next_cursor), (2, None))
+
+    def test_get_movies_page_last_page_has_no_cursor(self):
+        # Arrange
+        self.mock_cache.get.return_value = None
+        self.mock_repo.get_page_after.return_value = [
+            MovieORM(id=3, title="Movie 3", year=2023, genre=MovieGenre.DRAMA, view_count=0)
+        ]
+
+        # Act
+        page = self.service.get_movies_page(limit=2, cursor=encode_cursor(2))
+
+        # Assert
+        self.assertIsNone(page.next_cursor)
+
+    def test_get_all_movies_invalid_cursor(self):
+        # Act & Assert
+        with self.assertRaises(InvalidCursorException):
+            self.service.get_all_movies(limit=5, cursor="not-a-cursor")
+
+    # --- Filtering and sorting ---
+
+    def test_get_all_movies_with_filters_uses_filtered_query(self):
+        # Arrange
+        self.mock_cache.get.return_value = None
+        self.mock_repo.get_filtered.return_value = []
+        filters = MovieFilter(year_min=1990, min_rating=7, sort=MovieSort.AVERAGE_RATING, order=SortOrder.DESC)
+
+        # Act
+        self.service.get_all_movies(skip=0, limit=5, genre=MovieGenre.DRAMA, filters=filters)
+
+        # Assert
+        self.mock_repo.get_filtered.assert_called_once_with(filters, MovieGenre.DRAMA, 0, 5, None, None)
+        self.mock_repo.get_by_genre.assert_not_called()
+
+    def test_filter_cache_key_is_canonical(self):
+        # Arrange
+        self.mock_cache.get.return_value = None
+        self.mock_repo.get_filtered.return_value = []
+
+        # Act
+        self.service.get_all_movies(limit=5, filters=MovieFilter(year_max=2000, director="Nolan"))
+        self.service.get_all_movies(limit=5, filters=MovieFilter(director="Nolan", year_max=2000, order=SortOrder.ASC))
+
+        # Assert
+        first, second = [c.args[0] for c in self.mock_cache.get.call_args_list]
+        self.assertEqual(first, second)
+        self.assertEqual(first, "movies_list_director=Nolan&year_max=2000_skip_0_limit_5")
+
+    def test_sorted_page_cursor_carries_sort_key(self):
+        # Arrange
+        self.mock_cache.get.return_value = None
+        self.mock_repo.get_filtered.return_value = [
+            MovieORM(id=i, title=f"Movie {i}", year=2000 + i, genre=MovieGenre.DRAMA, view_count=0) for i in (4, 2)
+        ]
+        filters = MovieFilter(sort=MovieSort.YEAR, order=SortOrder.DESC)
+
+        # Act
+        page = self.service.get_movies_page(limit=2, filters=filters)
+        self.service.get_all_movies(limit=2, cursor=page.next_cursor, filters=filters)
+
+        # Assert
+        self.assertEqual(decode_cursor(page.next_cursor, "year", "desc"), (2, 2002))
+        self.mock_repo.get_filtered.assert_called_with(filters, None, 0, 2, 2, 2002)
+
+    def test_sorted_listing_rejects_cursor_without_sort_key(self):
+        # Act & Assert
+        with self.assertRaises(InvalidCursorException):
+            self.service.get_all_movies(limit=2, cursor=encode_cursor(2), filters=MovieFilter(sort=MovieSort.TITLE))
+
+    def test_sorted_listing_rejects_cursor_of_another_sort_or_order(self):
+        # Arrange
+        by_rating = encode_cursor(2, 6.5, "average_rating", "asc")
+
+        # Act & Assert
+        for filters in (MovieFilter(sort=MovieSort.TITLE), MovieFilter(sort=MovieSort.AVERAGE_RATING, order=SortOrder.DESC), MovieFilter()):
+            with self.assertRaises(InvalidCursorException):
+                self.service.get_all_movies(limit=2, cursor=by_rating, filters=filters)
+        self.mock_repo.get_filtered.assert_not_called()
+
+    def test_sorted_listing_rejects_sort_key_of_the_wrong_type(self):
+        # Arrange
+        self.mock_config.get.side_effect = lambda key, default=None: default
+
+        # Act & Assert
+        with self.assertRaises(InvalidCursorException):
+            self.service.get_all_movies(limit=2, cursor=encode_cursor(2, "Alien", "year"), filters=MovieFilter(sort=MovieSort.YEAR))
+        with self.assertRaises(InvalidCursorException):
+            self.service.search_movies("star", cursor=encode_cursor(2, 2002, "year"))
+
+    # --- Search ---
+
+    def test_search_movies_returns_ranked_page_with_cursor(self):
+        # Arrange
+        self.mock_config.get.side_effect = lambda key, default=None: default
+        self.mock_cache.get.return_value = None
+        rows = [
+            SimpleNamespace(id=7, title="Star Wars", year=1977, genre=MovieGenre.ACTION, view_count=0, rank=0.9),
+            SimpleNamespace(id=3, title="Stargate", year=1994, genre=MovieGenre.SCI_FI, view_count=0, rank=0.4),
+        ]
+        self.mock_repo.search.return_value = rows
+
+        # Act
+        page = self.service.search_movies("  Star ", limit=2)
+
+        # Assert
+        self.mock_repo.search.assert_called_once_with("star", 2, None)
+        self.assertEqual([m.id for m in page.items], [7, 3])
+        self.assertEqual(decode_cursor(page.next_cursor, "rank"), (3, 0.4))
+        self.mock_cache.set.assert_called_once_with("movies_search_star_after_None_limit_2", page,
+                                                    tags=["movies:search", "movie:7", "movie:3"])
+
+    def test_search_movies_cursor_seeks_past_last_rank(self):
+        # Arrange
+        self.mock_config.get.side_effect = lambda key, default=None: default
+        self.mock_cache.get.return_value = None
+        self.mock_repo.search.return_value = []
+
+        # Act
+        page = self.service.search_movies("star", limit=2, cursor=encode_cursor(3, 0.4, "rank"))
+
+        # Assert
+        self.mock_repo.search.assert_called_once_with("star", 2, (0.4, 3))
+        self.assertEqual(page.items, [])
+        self.assertIsNone(page.next_cursor)
+
+    def test_search_movies_cache_hit(self):
+        # Arrange
+        self.mock_config.get.side_effect = lambda key, default=None: default
+        cached_page = MoviePage(items=[])
+        self.mock_cache.get.return_value = cached_page
+
+        # Act
+        page = self.service.search_movies("star")
+
+        # Assert
+        self.assertIs(page, cached_page)
+        self.mock_repo.search.assert_not_called()
+
+    def test_search_movies_cursor_without_rank_is_invalid(self):
+        # Arrange
+        self.mock_config.get.side_effect = lambda key, default=None: default
+
+        # Act & Assert
+        with self.assertRaises(InvalidCursorException):
+            self.service.search_movies("star", cursor=encode_cursor(3))
+
+    # --- Autocomplete ---
+
+    def test_create_movie_adds_title_to_index(self):
+        # Arrange
+        index = TitlePrefixIndex()
+        service = MovieService(self.mock_repo, self.mock_rating_repo, self.mock_cache, self.mock_config, title_index=index)
+        self.mock_repo.create_movie.return_value = MovieORM(id=5, title="Alien", year=1979, genre=MovieGenre.HORROR, view_count=0)
+        self.mock_config.get.side_effect = lambda key, default=None: default
+
+        # Act
+        service.create_movie(MovieCreate(title="Alien", year=1979, genre=MovieGenre.HORROR))
+        result = service.autocomplete("al")
+
+        # Assert
+        self.assertEqual([(s.id, s.title) for s in result], [(5, "Alien")])
+
+    def test_delete_movie_removes_title_from_index(self):
+        # Arrange
+        index = TitlePrefixIndex()
+        index.add(5, "Alien")
+        service = MovieService(self.mock_repo, self.mock_rating_repo, self.mock_cache, self.mock_config, title_index=index)
+
+        # Act
+        service.delete_movie(5)
+
+        # Assert
+        self.assertEqual(index.search("al"), [])
+
+    def test_autocomplete_caps_limit(self):
+        # Arrange
+        mock_index = MagicMock(spec=TitlePrefixIndex)
+        mock_index.search.return_value = []
+        service = MovieService(self.mock_repo, self.mock_rating_repo, self.mock_cache, self.mock_config, title_index=mock_index)
+        self.mock_config.get.side_effect = lambda key, default=None: {"max_page_size": 20}.get(key, default)
+
+        # Act
+        service.autocomplete("st", limit=500, by="average_rating")
+
+        # Assert
+        mock_index.search.assert_called_once_with("st", 20, "average_rating")
+
+    # --- Leaderboards ---
+
+    def test_get_top_movies_keeps_leaderboard_order(self):
+        # Arrange
+        boards = Leaderboards(size=10)
+        boards.update("view_count", 1, MovieGenre.DRAMA, 5)
+        boards.update("view_count", 2, MovieGenre.DRAMA, 50)
+        service = MovieService(self.mock_repo, self.mock_rating_repo, self.mock_cache, self.mock_config, leaderboards=boards)
+        self.mock_repo.get_by_ids.return_value = [
+            MovieORM(id=i, title=f"Movie {i}", year=2023, genre=MovieGenre.DRAMA, view_count=0) for i in (1, 2)
+        ]
+
+        # Act
+        result = service.get_top_movies("view_count", MovieGenre.DRAMA, 5)
+
+        # Assert
+        self.assertEqual([m.id for m in result], [2, 1])
+        self.mock_repo.get_by_ids.assert_called_once_with([2, 1])
+
+    def test_delete_movie_removes_it_from_leaderboards(self):
+        # Arrange
+        boards = Leaderboards(size=10)
+        boards.update("average_rating", 1, MovieGenre.DRAMA, 9.0)
+        service = MovieService(self.mock_repo, self.mock_rating_repo, self.mock_cache, self.mock_config, leaderboards=boards)
+
+        # Act
+        service.delete_movie(1)
+
+        # Assert
+        self.assertEqual(boards.top("average_rating"), [])
+
+    # --- Rating histogram ---
+
+    def test_rating_histogram_summarizes_buckets(self):
+        # Arrange
+        self.mock_repo.get_rating_histogram.return_value = [0, 0, 0, 0, 0, 1, 0, 0, 2, 0, 1]
+
+        # Act
+        result = self.service.get_rating_histogram(1)
+
+        # Assert
+        self.mock_repo.get_movie.assert_called_once_with(1)
+        self.assertEqual(result.count, 4)
+        self.assertEqual(result.mean, 7.75)
+        self.assertEqual(result.median, 8)
+
+    def test_rating_histogram_not_found(self):
+        # Arrange
+        self.mock_repo.get_movie.side_effect = MovieNotFoundException(1)
+
+        # Act & Assert
+        with self.assertRaises(MovieNotFoundException):
+            self.service.get_rating_histogram(1)
+        self.mock_repo.get_rating_histogram.assert_not_called()
+
+    # --- Views ---
+
+    def test_watch_movie_buffers_view(self):
+        # Arrange
+        mock_counter = MagicMock(spec=ViewCounterBuffer)
+        service = MovieService(self.mock_repo, self.mock_rating_repo, self.mock_cache, self.mock_config, mock_counter)
+
+        # Act
+        service.watch_movie(1)
+
+        # Assert
+        self.mock_repo.get_movie.assert_called_once_with(1)
+        mock_counter.increment.assert_called_once_with(1)
+        self.mock_repo.increment_view_count.assert_not_called()
+
+    def test_watch_movie_not_found(self):
+        # Arrange
+        mock_counter = MagicMock(spec=ViewCounterBuffer)
+        service = MovieService(self.mock_repo, self.mock_rating_repo, self.mock_cache, self.mock_config, mock_counter)
+        self.mock_repo.get_movie.side_effect = MovieNotFoundException("Movie 999 not found")
+
+        # Act & Assert
+        with self.assertRaises(MovieNotFoundException):
+            service.watch_movie(999)
+        mock_counter.increment.assert_not_called()
+
+    # --- Bulk import ---
+
+    def test_import_movies_reports_invalid_and_duplicate_rows(self):
+        # Arrange
+        records = [
+            ImportRecord(1, {"title": "Alien", "year": 1979, "genre": "horror"}),
+            ImportRecord(2, {"title": "Jaws", "year": 1975, "genre": "horror"}),
+            ImportRecord(3, {"title": "Alien", "year": 1979, "genre": "horror"}),
+            ImportRecord(4, {"title": "No", "year": 1800}),
+            ImportRecord(5, None, "Invalid JSON"),
+        ]
+        self.mock_repo.bulk_create_movies.return_value = {"Alien": 1}
+
+        # Act
+        report = self.service.import_movies(records)
+
+        # Assert
+        inserted_dtos = self.mock_repo.bulk_create_movies.call_args[0][0]
+        self.assertEqual([dto.title for dto in inserted_dtos], ["Alien", "Jaws"])
+        self.assertEqual(report.received, 5)
+        self.assertEqual(report.inserted, 1)
+        self.assertEqual(report.duplicates, 2)
+        self.assertEqual(sorted(e.row for e in report.errors), [2, 3, 4, 5])
+        self.mock_cache.clear_all_starting_with.assert_not_called()
+
+    def test_import_movies_accumulates_report(self):
+        # Arrange
+        self.mock_repo.bulk_create_movies.side_effect = [{"Alien": 1}, {"Jaws": 2}]
+        report = self.service.import_movies([ImportRecord(1, {"title": "Alien", "year": 1979, "genre": "horror"})])
+
+        # Act
+        self.service.import_movies([ImportRecord(2, {"title": "Jaws", "year": 1975, "genre": "horror"})], report)
+        self.service.finish_import(report)
+
+        # Assert
+        self.assertEqual(report.received, 2)
+        self.assertEqual(report.inserted, 2)
+        self.mock_cache.clear_all_starting_with.assert_called_once_with("movies_")
+
+    def test_import_movies_indexes_each_chunk_with_one_update(self):
+        # Arrange
+        mock_index = MagicMock(spec=TitlePrefixIndex)
+        service = MovieService(self.mock_repo, self.mock_rating_repo, self.mock_cache, self.mock_config, title_index=mock_index)
+        self.mock_repo.bulk_create_movies.return_value = {"Alien": 1, "Jaws": 2}
+
+        # Act
+        service.import_movies([
+            ImportRecord(1, {"title": "Alien", "year": 1979, "genre": "horror"}),
+            ImportRecord(2, {"title": "Jaws", "year": 1975, "genre": "horror"}),
+        ])
+
+        # Assert
+        mock_index.add_titles.assert_called_once_with({1: "Alien", 2: "Jaws"})
+        mock_index.add.assert_not_called()
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,51 @@
+import unittest
+from service.RatingHistogram import summarize
+
+class TestRatingHistogram(unittest.TestCase):
+
+    def test_empty_histogram(self):
+        # Act
+        result = summarize(1, [0] * 11)
+
+        # Assert
+        self.assertEqual(result.count, 0)
+        self.assertIsNone(result.mean)
+        self.assertIsNone(result.median)
+        self.assertEqual(result.percentiles, {})
+
+    def test_odd_count_median_is_middle_rating(self):
+        # Arrange
+        buckets = [0] * 11
+        buckets[2], buckets[7], buckets[9] = 1, 1, 1
+
+        # Act
+        result = summarize(1, buckets)
+
+        # Assert
+        self.assertEqual(result.count, 3)
+        self.assertEqual(result.mean, 6.0)
+        self.assertEqual(result.median, 7)
+
+    def test_even_count_median_averages_middle_ratings(self):
+        # Arrange
+        buckets = [0] * 11
+        buckets[4], buckets[7] = 2, 2
+
+        # Act
+        result = summarize(1, buckets)
+
+        # Assert
+        self.assertEqual(result.median, 5.5)
+
+    def test_percentiles_use_nearest_rank(self):
+        # Arrange: ratings 1..10, one each
+        buckets = [0] + [1] * 10
+
+        # Act
+        result = summarize(1, buckets)
+
+        # Assert
+        self.assertEqual(result.percentiles, {"p10": 1, "p25": 3, "p75": 8, "p90": 9})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,94 @@
+import unittest
+from types import SimpleNamespace
+from service.TitlePrefixIndex import TitlePrefixIndex
+
+class TestTitlePrefixIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.index = TitlePrefixIndex()
+        self.index.load([
+            SimpleNamespace(id=1, title="Star Wars", view_count=50, average_rating=8.0),
+            SimpleNamespace(id=2, title="Stargate", view_count=90, average_rating=6.5),
+            SimpleNamespace(id=3, title="Stalker", view_count=10, average_rating=9.1),
+            SimpleNamespace(id=4, title="Alien", view_count=70, average_rating=8.4),
+        ])
+
+    def test_search_ranks_by_view_count(self):
+        # Act
+        result = self.index.search("sta", limit=2)
+
+        # Assert
+        self.assertEqual(result, [(2, "Stargate"), (1, "Star Wars")])
+
+    def test_search_ranks_by_average_rating(self):
+        # Act
+        result = self.index.search("STA", limit=2, by="average_rating")
+
+        # Assert
+        self.assertEqual(result, [(3, "Stalker"), (1, "Star Wars")])
+
+    def test_search_matches_only_prefix(self):
+        # Act & Assert
+        self.assertEqual(self.index.search("star w"), [(1, "Star Wars")])
+        self.assertEqual(self.index.search("lien"), [])
+
+    def test_add_replaces_previous_title(self):
+        # Act
+        self.index.search("st")
+        self.index.add(2, "Alien Resurrection", view_count=90)
+
+        # Assert
+        self.assertEqual(self.index.search("st"), [(1, "Star Wars"), (3, "Stalker")])
+        self.assertEqual(self.index.search("alien"), [(2, "Alien Resurrection"), (4, "Alien")])
+
+    def test_add_titles_merges_new_titles_in_order(self):
+        # Arrange
+        self.index.search("st")
+
+        # Act
+        self.index.add_titles({5: "Stardust", 6: "Aliens", 2: "Stalingrad"})
+
+        # Assert
+        self.assertEqual(len(self.index), 6)
+        self.assertEqual(self.index.search("star"), [(1, "Star Wars"), (5, "Stardust")])
+        self.assertEqual(self.index.search("st"), [(1, "Star Wars"), (3, "Stalker"), (2, "Stalingrad"), (5, "Stardust")])
+        self.assertEqual(self.index.search("alien"), [(4, "Alien"), (6, "Aliens")])
+
+    def test_remove_and_clear(self):
+        # Act
+        self.index.remove(1)
+
+        # Assert
+        self.assertEqual(self.index.search("star"), [(2, "Stargate")])
+        self.index.clear()
+        self.assertEqual(len(self.index), 0)
+        self.assertEqual(self.index.search("a"), [])
+
+    def test_set_rating_changes_memoized_ranking(self):
+        # Arrange
+        self.assertEqual(self.index.search("st", limit=1, by="average_rating"), [(3, "Stalker")])
+
+        # Act
+        self.index.set_rating(2, 9.5)
+
+        # Assert
+        self.assertEqual(self.index.search("st", limit=1, by="average_rating"), [(2, "Stargate")])
+
+    def test_clear_ratings_keeps_titles(self):
+        # Act
+        self.index.clear_ratings()
+
+        # Assert
+        self.assertEqual(self.index.search("st", limit=3, by="average_rating"), [(1, "Star Wars"), (2, "Stargate"), (3, "Stalker")])
+
+    def test_add_views_changes_ranking(self):
+        # Act
+        self.index.add_views(3, 100)
+
+        # Assert
+        self.assertEqual(self.index.search("star", limit=1), [(2, "Stargate")])
+        self.assertEqual(self.index.search("stal"), [(3, "Stalker")])
+        self.assertEqual(self.index.search("sta", limit=1), [(3, "Stalker")])
+
+if __name__ == '__main__':
+    unittest.main()
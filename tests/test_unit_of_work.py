@@ -0,0 +1,36 @@
+import unittest
+from unittest.mock import MagicMock
+from sqlalchemy.orm import Session
+from dependencies import get_unit_of_work
+
+class TestUnitOfWork(unittest.IsolatedAsyncioTestCase):
+
+    async def test_commits_when_request_succeeds(self):
+        # Arrange
+        mock_db = MagicMock(spec=Session)
+        unit_of_work = get_unit_of_work(mock_db)
+
+        # Act
+        db = await unit_of_work.__anext__()
+        with self.assertRaises(StopAsyncIteration):
+            await unit_of_work.__anext__()
+
+        # Assert
+        self.assertIs(db, mock_db)
+        mock_db.commit.assert_called_once()
+        mock_db.rollback.assert_not_called()
+
+    async def test_rolls_back_when_request_fails(self):
+        # Arrange
+        mock_db = MagicMock(spec=Session)
+        unit_of_work = get_unit_of_work(mock_db)
+        await unit_of_work.__anext__()
+
+        # Act & Assert
+        with self.assertRaises(ValueError):
+            await unit_of_work.athrow(ValueError("boom"))
+        mock_db.rollback.assert_called_once()
+        mock_db.commit.assert_not_called()
+
+if __name__ == '__main__':
+    unittest.main()
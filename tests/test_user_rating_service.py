@@ -1,3 +1,4 @@
+import json
 import unittest
 from unittest.mock import MagicMock
 from datetime import datetime
@@ -10,6 +11,14 @@ from model.DTOs.UserRatingDTO import UserRatingCreate, UserRatingOut, UserRating
 from model.UserRatingORM import UserRatingORM
 from model.MovieORM import MovieORM
 from repository.exceptions import UserRatingExistsException
+from model.DTOs.MovieDTO import MovieGenre
+from service.CacheService import CacheService
+from service.ConfigService import ConfigService
+from service.Leaderboards import Leaderboards
+from service.TitlePrefixIndex import TitlePrefixIndex
+from repository.UserStatsRepository import UserStatsRepository
+from service.AchievementQueue import AchievementQueue
+from service.AchievementHandlers import COMMENT_ADDED, MOVIE_AVERAGE_CHANGED, RATING_CREATED
 
 class TestUserRatingService(unittest.TestCase):
 
@@ -94,6 +103,42 @@ class TestUserRatingService(unittest.TestCase):
         # Assert
         self.mock_rating_repo.delete_rating.assert_called_once_with(rating_id)
 
+    def test_rating_changes_evict_the_cached_movie(self):
+        # Arrange
+        mock_cache = MagicMock(spec=CacheService)
+        service = UserRatingService(self.mock_rating_repo, self.mock_user_repo, self.mock_movie_repo,
+                                    self.mock_achievement_service, cache=mock_cache)
+        self.mock_rating_repo.get_rating.return_value = UserRatingORM(id=1, user_id=1, movie_id=4, rating=6)
+        self.mock_movie_repo.apply_rating_delta.return_value = (6.0, MovieGenre.DRAMA)
+
+        # Act
+        service.delete_rating(1)
+
+        # Assert
+        mock_cache.delete.assert_called_once_with("movies_id_4", "movies_rating_4", "movies_version_4")
+
+    def test_rating_changes_update_the_user_stats(self):
+        # Arrange
+        mock_stats_repo = MagicMock(spec=UserStatsRepository)
+        service = UserRatingService(self.mock_rating_repo, self.mock_user_repo, self.mock_movie_repo,
+                                    self.mock_achievement_service, stats_repo=mock_stats_repo)
+        self.mock_user_repo.get_user.return_value = MagicMock()
+        self.mock_movie_repo.get_movie.return_value = MovieORM(id=4, view_count=0)
+        self.mock_rating_repo.find_rating_by_user_movie.return_value = None
+        self.mock_rating_repo.create_rating.return_value = UserRatingORM(
+            id=1, user_id=1, movie_id=4, rating=8, comment="Scary", created_at=datetime.utcnow(), updated_at=datetime.utcnow()
+        )
+        self.mock_rating_repo.get_rating.return_value = UserRatingORM(id=1, user_id=1, movie_id=4, rating=8, comment="Scary")
+        self.mock_movie_repo.apply_rating_delta.return_value = (8.0, MovieGenre.HORROR)
+
+        # Act
+        service.create_rating(UserRatingCreate(user_id=1, movie_id=4, rating=8, comment="Scary"))
+        service.delete_rating(1)
+
+        # Assert
+        self.assertEqual(mock_stats_repo.apply_deltas.call_args_list[0].args[0], {(1, MovieGenre.HORROR): (1, 1, 8)})
+        self.assertEqual(mock_stats_repo.apply_deltas.call_args_list[1].args[0], {(1, MovieGenre.HORROR): (-1, -1, -8)})
+
     def test_create_duplicate(self):
         # Arrange
         dto = UserRatingCreate(user_id=1, movie_id=1, rating=10)
@@ -173,13 +218,13 @@ class TestUserRatingService(unittest.TestCase):
             id=1, user_id=1, movie_id=1, rating=10, 
             comment="", created_at=datetime.utcnow(), updated_at=datetime.utcnow()
         )
-        self.mock_rating_repo.get_average_rating.return_value = 9.5
 
         # Act
         self.service.create_rating(dto)
 
         # Assert
-        self.mock_movie_repo.update_average_rating.assert_called_once_with(1, 9.5)
+        self.mock_movie_repo.apply_rating_delta.assert_called_once_with(1, 10, 1)
+        self.mock_rating_repo.get_average_rating.assert_not_called()
 
     def test_update_rating_updates_average(self):
         # Arrange
@@ -197,13 +242,12 @@ class TestUserRatingService(unittest.TestCase):
             comment="", created_at=datetime.utcnow(), updated_at=datetime.utcnow()
         )
         self.mock_rating_repo.update_rating.return_value = updated_rating
-        self.mock_rating_repo.get_average_rating.return_value = 7.5
 
         # Act
         self.service.update_rating(rating_id, dto)
 
         # Assert
-        self.mock_movie_repo.update_average_rating.assert_called_once_with(1, 7.5)
+        self.mock_movie_repo.apply_rating_delta.assert_called_once_with(1, -5, 0)
 
     def test_delete_rating_updates_average(self):
         # Arrange
@@ -213,13 +257,89 @@ class TestUserRatingService(unittest.TestCase):
             comment="", created_at=datetime.utcnow(), updated_at=datetime.utcnow()
         )
         self.mock_rating_repo.get_rating.return_value = existing_rating
-        self.mock_rating_repo.get_average_rating.return_value = 8.0
 
         # Act
         self.service.delete_rating(rating_id)
 
         # Assert
-        self.mock_movie_repo.update_average_rating.assert_called_once_with(1, 8.0)
+        self.mock_movie_repo.apply_rating_delta.assert_called_once_with(1, -10, -1)
+
+    def test_rating_changes_move_histogram_buckets(self):
+        # Arrange
+        self.mock_rating_repo.get_rating.return_value = UserRatingORM(
+            id=1, user_id=1, movie_id=3, rating=10,
+            comment="", created_at=datetime.utcnow(), updated_at=datetime.utcnow()
+        )
+        self.mock_rating_repo.update_rating.return_value = self.mock_rating_repo.get_rating.return_value
+        self.mock_movie_repo.apply_rating_delta.return_value = None
+
+        # Act
+        self.service.update_rating(1, UserRatingUpdate(rating=6))
+        self.service.delete_rating(1)
+
+        # Assert
+        update_deltas, delete_deltas = [c.args[0] for c in self.mock_movie_repo.apply_histogram_deltas.call_args_list]
+        self.assertEqual(dict(update_deltas), {(3, 6): 1, (3, 10): -1})
+        self.assertEqual(dict(delete_deltas), {(3, 10): -1})
+
+    def test_rating_change_updates_leaderboard(self):
+        # Arrange
+        boards = Leaderboards(size=10)
+        service = UserRatingService(self.mock_rating_repo, self.mock_user_repo, self.mock_movie_repo,
+                                    self.mock_achievement_service, MagicMock(spec=ConfigService), boards)
+        self.mock_rating_repo.get_rating.return_value = UserRatingORM(
+            id=1, user_id=1, movie_id=3, rating=10,
+            comment="", created_at=datetime.utcnow(), updated_at=datetime.utcnow()
+        )
+        self.mock_rating_repo.update_rating.return_value = UserRatingORM(
+            id=1, user_id=1, movie_id=3, rating=6,
+            comment="", created_at=datetime.utcnow(), updated_at=datetime.utcnow()
+        )
+        self.mock_movie_repo.apply_rating_delta.return_value = (6.0, MovieGenre.COMEDY)
+
+        # Act
+        service.update_rating(1, UserRatingUpdate(rating=6))
+
+        # Assert
+        self.assertEqual(boards.top("average_rating", MovieGenre.COMEDY), [(3, 6.0)])
+        self.assertEqual(boards.top("average_rating"), [(3, 6.0)])
+
+    def test_rating_changes_update_the_title_index(self):
+        # Arrange
+        index = TitlePrefixIndex()
+        index.add(3, "Stalker", average_rating=6.5)
+        index.add(4, "Star Wars", average_rating=7.0)
+        service = UserRatingService(self.mock_rating_repo, self.mock_user_repo, self.mock_movie_repo,
+                                    self.mock_achievement_service, title_index=index)
+        self.mock_rating_repo.get_rating.return_value = UserRatingORM(id=1, user_id=1, movie_id=3, rating=10)
+        self.mock_movie_repo.apply_rating_delta.return_value = (9.0, MovieGenre.DRAMA)
+        self.assertEqual(index.search("sta", limit=1, by="average_rating"), [(4, "Star Wars")])
+
+        # Act
+        service.delete_rating(1)
+
+        # Assert
+        self.assertEqual(index.search("sta", limit=1, by="average_rating"), [(3, "Stalker")])
+
+    def test_bulk_ratings_update_the_title_index(self):
+        # Arrange
+        index = TitlePrefixIndex()
+        index.add(1, "Alien", average_rating=0.0)
+        service = UserRatingService(self.mock_rating_repo, self.mock_user_repo, self.mock_movie_repo,
+                                    self.mock_achievement_service, title_index=index)
+        self.mock_user_repo.get_existing_ids.return_value = {1}
+        self.mock_movie_repo.get_existing_ids.return_value = {1}
+        self.mock_rating_repo.bulk_create_ratings.return_value = [(1, 1, 8)]
+        self.mock_movie_repo.get_leaderboard_entries.return_value = [
+            MovieORM(id=1, genre=MovieGenre.HORROR, average_rating=8.0, view_count=0),
+        ]
+        index.add(2, "Aliens", average_rating=7.0)
+
+        # Act
+        service.bulk_create_ratings([UserRatingCreate(user_id=1, movie_id=1, rating=8)])
+
+        # Assert
+        self.assertEqual(index.search("ali", limit=1, by="average_rating"), [(1, "Alien")])
 
     def test_create_rating_triggers_achievements(self):
         # Arrange
@@ -232,11 +352,41 @@ class TestUserRatingService(unittest.TestCase):
             comment="", created_at=datetime.utcnow(), updated_at=datetime.utcnow()
         )
 
+        self.mock_movie_repo.apply_rating_delta.return_value = (10.0, MovieGenre.HORROR)
+
         # Act
         self.service.create_rating(dto)
 
         # Assert
-        self.mock_achievement_service.check_new_achievements.assert_called_once_with(1)
+        self.mock_achievement_service.check_new_achievements.assert_called_once_with(
+            1, frozenset({RATING_CREATED, MOVIE_AVERAGE_CHANGED, "genre:horror"})
+        )
+
+    def test_create_rating_with_queue_defers_achievements(self):
+        # Arrange
+        mock_queue = MagicMock(spec=AchievementQueue)
+        mock_queue.outbox = True
+        service = UserRatingService(self.mock_rating_repo, self.mock_user_repo, self.mock_movie_repo,
+                                    self.mock_achievement_service, achievement_queue=mock_queue)
+        self.mock_user_repo.get_user.return_value = MagicMock()
+        self.mock_movie_repo.get_movie.return_value = MovieORM(id=1, view_count=0)
+        self.mock_rating_repo.find_rating_by_user_movie.return_value = None
+        self.mock_rating_repo.create_rating.return_value = UserRatingORM(
+            id=1, user_id=1, movie_id=1, rating=10,
+            comment="", created_at=datetime.utcnow(), updated_at=datetime.utcnow()
+        )
+
+        self.mock_movie_repo.apply_rating_delta.return_value = (10.0, MovieGenre.DRAMA)
+
+        # Act
+        service.create_rating(UserRatingCreate(user_id=1, movie_id=1, rating=10, comment="Moving"))
+
+        # Assert
+        self.mock_achievement_service.check_new_achievements.assert_not_called()
+        self.mock_achievement_service.add_pending_checks.assert_called_once_with([1])
+        mock_queue.enqueue.assert_called_once_with(
+            {1: frozenset({RATING_CREATED, MOVIE_AVERAGE_CHANGED, COMMENT_ADDED, "genre:drama"})}
+        )
 
     def test_create_rating_user_not_found(self):
         # Arrange
@@ -257,5 +407,114 @@ class TestUserRatingService(unittest.TestCase):
         with self.assertRaises(Exception):
             self.service.create_rating(dto)
 
+    def test_delete_all_ratings_resets_counters(self):
+        # Act
+        self.service.delete_all_ratings()
+
+        # Assert
+        self.mock_movie_repo.reset_rating_counters.assert_called_once()
+        self.mock_rating_repo.delete_all_ratings.assert_called_once()
+
+    # --- Bulk ---
+
+    def test_bulk_create_ratings(self):
+        # Arrange
+        dtos = [
+            UserRatingCreate(user_id=1, movie_id=1, rating=8),
+            UserRatingCreate(user_id=2, movie_id=1, rating=6),
+            UserRatingCreate(user_id=1, movie_id=2, rating=4),
+            UserRatingCreate(user_id=9, movie_id=1, rating=5),
+            UserRatingCreate(user_id=1, movie_id=1, rating=3),
+        ]
+        self.mock_user_repo.get_existing_ids.return_value = {1, 2}
+        self.mock_movie_repo.get_existing_ids.return_value = {1, 2}
+        self.mock_rating_repo.bulk_create_ratings.return_value = [(1, 1, 8), (2, 1, 6)]
+
+        # Act
+        report = self.service.bulk_create_ratings(dtos)
+
+        # Assert
+        self.mock_user_repo.get_existing_ids.assert_called_once_with({1, 2, 9})
+        self.assertEqual(len(self.mock_rating_repo.bulk_create_ratings.call_args[0][0]), 3)
+        self.mock_movie_repo.apply_rating_deltas.assert_called_once_with({1: (14.0, 2)})
+        self.assertEqual(report.inserted, 2)
+        self.assertEqual(report.duplicates, 2)
+        self.assertEqual([e.row for e in report.errors], [3, 4, 5])
+        self.assertEqual(
+            [c.args for c in self.mock_achievement_service.check_new_achievements.call_args_list],
+            [(1, None), (2, None)]
+        )
+
+    def test_bulk_create_ratings_checks_each_user_for_their_genres(self):
+        # Arrange
+        service = UserRatingService(self.mock_rating_repo, self.mock_user_repo, self.mock_movie_repo,
+                                    self.mock_achievement_service, leaderboards=Leaderboards(size=10))
+        dtos = [
+            UserRatingCreate(user_id=1, movie_id=1, rating=8),
+            UserRatingCreate(user_id=1, movie_id=2, rating=4, comment="Meh"),
+        ]
+        self.mock_user_repo.get_existing_ids.return_value = {1}
+        self.mock_movie_repo.get_existing_ids.return_value = {1, 2}
+        self.mock_rating_repo.bulk_create_ratings.return_value = [(1, 1, 8), (1, 2, 4)]
+        self.mock_movie_repo.get_leaderboard_entries.return_value = [
+            MovieORM(id=1, genre=MovieGenre.HORROR, average_rating=8.0, view_count=0),
+            MovieORM(id=2, genre=MovieGenre.COMEDY, average_rating=4.0, view_count=0),
+        ]
+
+        # Act
+        service.bulk_create_ratings(dtos)
+
+        # Assert
+        self.mock_achievement_service.check_new_achievements.assert_called_once_with(
+            1, frozenset({RATING_CREATED, MOVIE_AVERAGE_CHANGED, COMMENT_ADDED, "genre:horror", "genre:comedy"})
+        )
+
+    def test_update_rating_checks_only_movie_average_achievements(self):
+        # Arrange
+        self.mock_rating_repo.get_rating.return_value = UserRatingORM(id=1, user_id=3, movie_id=1, rating=7)
+        self.mock_rating_repo.update_rating.return_value = UserRatingORM(
+            id=1, user_id=3, movie_id=1, rating=10,
+            comment="", created_at=datetime.utcnow(), updated_at=datetime.utcnow()
+        )
+
+        # Act
+        self.service.update_rating(1, UserRatingUpdate(rating=10))
+
+        # Assert
+        self.mock_achievement_service.check_new_achievements.assert_called_once_with(3, frozenset({MOVIE_AVERAGE_CHANGED}))
+
+    def test_export_ratings_streams_ratings_without_comment(self):
+        # Arrange
+        now = datetime.utcnow()
+        ratings = [
+            UserRatingORM(id=1, user_id=1, movie_id=1, rating=7, comment="Fine", created_at=now, updated_at=now),
+            UserRatingORM(id=2, user_id=2, movie_id=1, rating=3, comment=None, created_at=now, updated_at=now),
+        ]
+        self.mock_rating_repo.stream_all_ratings.return_value = iter(ratings)
+
+        # Act
+        body = b"".join(self.service.export_ratings())
+
+        # Assert
+        lines = body.decode().splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertIsNone(UserRatingOut.model_validate_json(lines[1]).comment)
+
+    def test_export_ratings_ends_with_error_record_when_a_row_fails(self):
+        # Arrange
+        now = datetime.utcnow()
+        good = UserRatingORM(id=1, user_id=1, movie_id=1, rating=7, comment=None, created_at=now, updated_at=now)
+        broken = UserRatingORM(id=2, user_id=2, movie_id=1, rating=None, comment=None, created_at=now, updated_at=now)
+        self.mock_rating_repo.stream_all_ratings.return_value = iter([good, broken, good])
+
+        # Act
+        body = b"".join(self.service.export_ratings())
+
+        # Assert
+        lines = body.decode().splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertEqual(UserRatingOut.model_validate_json(lines[0]).id, 1)
+        self.assertEqual(json.loads(lines[1]), {"error": "export failed", "exported": 1})
+
 if __name__ == '__main__':
     unittest.main()
@@ -3,7 +3,11 @@ from unittest.mock import MagicMock
 from fastapi import HTTPException
 from service.UserService import UserService
 from repository.UserRepository import UserRepository
+from repository.MovieRepository import MovieRepository
+from repository.UserStatsRepository import UserStatsRepository
+from model.DTOs.MovieDTO import MovieGenre
 from repository.exceptions import UserNotFoundException, UsernameExistsException, EmailExistsException
+from service.CacheService import CacheService
 from service.ConfigService import ConfigService
 from model.DTOs.UserDTO import UserCreate, UserOut, UserUpdate
 from model.UserORM import UserORM, UserRole
@@ -114,6 +118,7 @@ class TestUserService(unittest.TestCase):
     def test_get_list_success(self):
         # Arrange
         user_orm = UserORM(id=1, username="test", email="t@t.com", role=UserRole.USER, created_at=datetime.utcnow())
+        self.mock_config.get.return_value = 10
         self.mock_repo.get_all_users.return_value = [user_orm]
 
         # Act
@@ -125,6 +130,7 @@ class TestUserService(unittest.TestCase):
 
     def test_get_list_empty(self):
         # Arrange
+        self.mock_config.get.return_value = 10
         self.mock_repo.get_all_users.return_value = []
 
         # Act
@@ -163,5 +169,124 @@ class TestUserService(unittest.TestCase):
         self.assertEqual(result.avatar_url, "http://new.avatar")
         self.mock_repo.update_user.assert_called_once_with(user_id, update_dto)
 
+    def test_delete_user_subtracts_ratings_from_movie_counters(self):
+        # Arrange
+        mock_movie_repo = MagicMock(spec=MovieRepository)
+        service = UserService(self.mock_repo, self.mock_config, mock_movie_repo)
+
+        # Act
+        service.delete_user(1)
+
+        # Assert
+        mock_movie_repo.subtract_user_ratings.assert_called_once_with(1)
+        self.mock_repo.delete_user.assert_called_once_with(1)
+
+    def test_get_user_is_cached_until_updated(self):
+        # Arrange
+        config = MagicMock()
+        config.get.side_effect = lambda key, default=None: default
+        service = UserService(self.mock_repo, self.mock_config, cache=CacheService(config))
+        user_orm = UserORM(id=1, username="test", email="test@test.com", role=UserRole.USER, created_at=datetime.utcnow())
+        self.mock_repo.get_user.return_value = user_orm
+        self.mock_repo.update_user.return_value = user_orm
+
+        # Act
+        service.get_user(1)
+        service.get_user(1)
+        service.update_user(1, UserUpdate(username="test"))
+        service.get_user(1)
+
+        # Assert
+        self.assertEqual(self.mock_repo.get_user.call_count, 2)
+
+    def test_missing_user_is_cached_until_created(self):
+        # Arrange
+        config = MagicMock()
+        config.get.side_effect = lambda key, default=None: default
+        service = UserService(self.mock_repo, self.mock_config, cache=CacheService(config))
+        self.mock_config.get.return_value = True
+        self.mock_repo.get_user.side_effect = UserNotFoundException("User 1 not found")
+        self.mock_repo.create_user.return_value = UserORM(
+            id=1, username="test", email="test@test.com", role=UserRole.USER, created_at=datetime.utcnow()
+        )
+
+        # Act & Assert
+        for _ in range(2):
+            with self.assertRaises(UserNotFoundException):
+                service.get_user(1)
+        self.assertEqual(self.mock_repo.get_user.call_count, 1)
+        service.create_user(UserCreate(username="test", email="test@test.com", password="password123"))
+        self.mock_repo.get_user.side_effect = None
+        self.mock_repo.get_user.return_value = self.mock_repo.create_user.return_value
+        self.assertEqual(service.get_user(1).id, 1)
+
+    def test_delete_user_evicts_the_movies_they_rated(self):
+        # Arrange
+        mock_movie_repo = MagicMock(spec=MovieRepository)
+        mock_movie_repo.subtract_user_ratings.return_value = [7]
+        mock_cache = MagicMock(spec=CacheService)
+        service = UserService(self.mock_repo, self.mock_config, mock_movie_repo, mock_cache)
+
+        # Act
+        service.delete_user(1)
+
+        # Assert
+        mock_cache.delete.assert_called_once_with("users_id_1", "achievements_status_1", "achievements_version_1",
+                                                  "movies_id_7", "movies_rating_7", "movies_version_7")
+
+    def test_get_all_users_limit_is_capped(self):
+        # Arrange
+        self.mock_config.get.side_effect = lambda key, default=None: {"max_page_size": 100}.get(key, default)
+        self.mock_repo.get_all_users.return_value = []
+
+        # Act
+        self.service.get_all_users(skip=20, limit=5000)
+
+        # Assert
+        self.mock_repo.get_all_users.assert_called_once_with(20, 100)
+
+    def test_export_users_streams_ndjson(self):
+        # Arrange
+        self.mock_config.get.return_value = 2
+        users = [
+            UserORM(id=i, username=f"user{i}", email=f"u{i}@test.com", role=UserRole.USER, created_at=datetime.utcnow())
+            for i in range(1, 4)
+        ]
+        self.mock_repo.stream_all_users.return_value = iter(users)
+
+        # Act
+        body = b"".join(self.service.export_users())
+
+        # Assert
+        lines = body.decode().splitlines()
+        self.assertEqual(len(lines), 3)
+        self.assertEqual(UserOut.model_validate_json(lines[2]).username, "user3")
+        self.mock_repo.stream_all_users.assert_called_once_with(2)
+
+    def test_get_user_stats_totals_the_genre_counters(self):
+        # Arrange
+        mock_stats_repo = MagicMock(spec=UserStatsRepository)
+        service = UserService(self.mock_repo, self.mock_config, stats_repository=mock_stats_repo)
+        self.mock_repo.get_user.return_value = UserORM(id=1, username="test", email="test@test.com", role=UserRole.USER, created_at=datetime.utcnow())
+        mock_stats_repo.get_stats.return_value = [(MovieGenre.HORROR, 3, 1, 24.0), (MovieGenre.DRAMA, 1, 0, 4.0)]
+
+        # Act
+        result = service.get_user_stats(1)
+
+        # Assert
+        self.assertEqual(result.rating_count, 4)
+        self.assertEqual(result.comment_count, 1)
+        self.assertEqual(result.average_rating, 7.0)
+        self.assertEqual(result.distinct_genres, 2)
+        self.assertEqual([(g.genre, g.average_rating) for g in result.genres], [(MovieGenre.DRAMA, 4.0), (MovieGenre.HORROR, 8.0)])
+
+    def test_get_user_stats_not_found(self):
+        # Arrange
+        self.mock_repo.get_user.side_effect = UserNotFoundException("User 999 not found")
+
+        # Act & Assert
+        with self.assertRaises(UserNotFoundException):
+            self.service.get_user_stats(999)
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,164 @@
+import unittest
+from unittest.mock import MagicMock
+from sqlalchemy import func, select
+from model.DTOs.MovieDTO import MovieGenre
+from model.DTOs.UserRatingDTO import UserRatingCreate, UserRatingUpdate
+from model.MovieORM import MovieORM
+from model.RatingHistogramORM import RatingHistogramORM
+from model.UserRatingORM import UserRatingORM
+from model.UserStatsORM import UserStatsORM
+from repository.MovieRepository import MovieRepository
+from repository.UserRatingRepository import UserRatingRepository
+from repository.UserRepository import UserRepository
+from repository.UserStatsRepository import UserStatsRepository
+from service.AchievementHandlers import MOVIE_AVERAGE_CHANGED
+from service.AchievementService import AchievementService
+from service.ConfigService import ConfigService
+from service.UserRatingService import UserRatingService
+from tests.sqlite_fixture import SqliteTestCase
+
+
+class TestUserStatsRepository(SqliteTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.repo = UserStatsRepository(self.db)
+        self.add_user(1)
+        self.add_user(2)
+        self.add_movie(1, genre=MovieGenre.DRAMA)
+        self.add_movie(2, genre=MovieGenre.HORROR)
+        self.add_movie(3, genre=MovieGenre.HORROR)
+
+    def _rate(self, user_id: int, movie_id: int, rating: float, comment=None) -> UserRatingORM:
+        rating_obj = UserRatingORM(user_id=user_id, movie_id=movie_id, rating=rating, comment=comment)
+        self.db.add(rating_obj)
+        self.db.flush()
+        return rating_obj
+
+    def _stored(self) -> dict:
+        rows = self.db.execute(select(UserStatsORM.user_id, UserStatsORM.genre, UserStatsORM.rating_count,
+                                      UserStatsORM.comment_count, UserStatsORM.rating_sum))
+        # Rows whose ratings were all deleted stay behind as zeros
+        return {(user_id, genre): (count, comments, total) for user_id, genre, count, comments, total in rows if count}
+
+    def _recomputed(self) -> dict:
+        # Full aggregate over user_ratings, which the counters must always equal
+        rows = self.db.execute(
+            select(UserRatingORM.user_id, MovieORM.genre, func.count(), func.count(UserRatingORM.comment),
+                   func.sum(UserRatingORM.rating))
+            .join(MovieORM, MovieORM.id == UserRatingORM.movie_id)
+            .group_by(UserRatingORM.user_id, MovieORM.genre)
+        )
+        return {(user_id, genre): (count, comments, total) for user_id, genre, count, comments, total in rows}
+
+    def test_apply_deltas_follows_inserts_updates_and_deletes(self):
+        # Arrange: inserts, applied as one executemany like the bulk path does
+        first = self._rate(1, 1, 8, "Good")
+        second = self._rate(1, 2, 4)
+        self._rate(1, 3, 6, "Meh")
+        self._rate(2, 2, 10)
+        self.repo.apply_deltas({(1, MovieGenre.DRAMA): (1, 1, 8.0), (1, MovieGenre.HORROR): (2, 1, 10.0),
+                                (2, MovieGenre.HORROR): (1, 0, 10.0)})
+
+        # Act: an update moves only the sum, a delete takes back all three counters
+        second.rating = 9
+        self.repo.apply_deltas({(1, MovieGenre.HORROR): (0, 0, 5.0)})
+        self.db.delete(first)
+        self.db.flush()
+        self.repo.apply_deltas({(1, MovieGenre.DRAMA): (-1, -1, -8.0)})
+
+        # Assert
+        self.assertEqual(self._stored(), self._recomputed())
+        self.assertEqual(self._stored(), {(1, MovieGenre.HORROR): (2, 1, 15.0), (2, MovieGenre.HORROR): (1, 0, 10.0)})
+        self.assertEqual(self.repo.find_mismatches(), [])
+
+    def test_apply_deltas_skips_all_zero_deltas(self):
+        # Act
+        self.repo.apply_deltas({(1, MovieGenre.DRAMA): (0, 0, 0.0)})
+
+        # Assert
+        self.assertEqual(self.db.scalar(select(func.count()).select_from(UserStatsORM)), 0)
+
+    def test_movie_genre_change_and_delete_keep_counters_equal_to_ratings(self):
+        # Arrange
+        self._rate(1, 2, 7, "Scary")
+        self._rate(2, 2, 3)
+        self._rate(2, 3, 5)
+        self.repo.rebuild()
+
+        # Act
+        self.repo.move_movie_genre(2, MovieGenre.HORROR, MovieGenre.COMEDY)
+        self.db.get(MovieORM, 2).genre = MovieGenre.COMEDY
+        self.db.flush()
+        self.repo.subtract_movie(3)
+        MovieRepository(self.db).delete_movie(3)
+
+        # Assert
+        self.assertEqual(self._stored(), self._recomputed())
+        self.assertEqual(self.repo.find_mismatches(), [])
+
+
+class TestRatingWritesKeepCountersInStep(SqliteTestCase):
+    """Drives UserRatingService on real repositories and checks every counter it maintains."""
+
+    def setUp(self):
+        super().setUp()
+        self.add_user(1)
+        self.add_user(2)
+        self.add_movie(1, genre=MovieGenre.DRAMA)
+        self.add_movie(2, genre=MovieGenre.HORROR)
+        self.movie_repo = MovieRepository(self.db)
+        self.stats_repo = UserStatsRepository(self.db)
+        config = MagicMock(spec=ConfigService)
+        config.get.side_effect = lambda key, default=None: default
+        self.achievement_service = MagicMock(spec=AchievementService)
+        self.service = UserRatingService(UserRatingRepository(self.db), UserRepository(self.db), self.movie_repo,
+                                         self.achievement_service, config, stats_repo=self.stats_repo)
+
+    def _histograms(self) -> dict:
+        rows = self.db.execute(select(RatingHistogramORM.movie_id, RatingHistogramORM.rating, RatingHistogramORM.count))
+        return {(movie_id, rating): count for movie_id, rating, count in rows if count}
+
+    def _recomputed_histograms(self) -> dict:
+        rows = self.db.execute(
+            select(UserRatingORM.movie_id, UserRatingORM.rating, func.count())
+            .group_by(UserRatingORM.movie_id, UserRatingORM.rating)
+        )
+        return {(movie_id, round(rating)): count for movie_id, rating, count in rows}
+
+    def test_create_bulk_update_and_delete(self):
+        # Arrange
+        created = self.service.create_rating(UserRatingCreate(user_id=1, movie_id=1, rating=8, comment="Good"))
+        self.service.bulk_create_ratings([
+            UserRatingCreate(user_id=1, movie_id=2, rating=4),
+            UserRatingCreate(user_id=2, movie_id=2, rating=4, comment="Fine"),
+            UserRatingCreate(user_id=2, movie_id=1, rating=10),
+        ])
+        moved = self.service.rating_repo.find_rating_by_user_movie(1, 2)
+
+        # Act
+        self.service.update_rating(moved.id, UserRatingUpdate(rating=9))
+        self.service.delete_rating(created.id)
+
+        # Assert
+        self.assertEqual(self.stats_repo.find_mismatches(), [])
+        self.assertEqual(self._histograms(), self._recomputed_histograms())
+        self.assertEqual(self._histograms(), {(1, 10): 1, (2, 4): 1, (2, 9): 1})
+        self.assertEqual(self.movie_repo.get_rating_histogram(2), [0, 0, 0, 0, 1, 0, 0, 0, 0, 1, 0])
+
+    def test_update_rating_checks_movie_average_achievements_on_the_session_row(self):
+        # Arrange: the repository hands back the same identity-mapped row the service read
+        created = self.service.create_rating(UserRatingCreate(user_id=1, movie_id=1, rating=8))
+        self.achievement_service.reset_mock()
+
+        # Act
+        self.service.update_rating(created.id, UserRatingUpdate(rating=3))
+        self.service.update_rating(created.id, UserRatingUpdate(rating=3))
+
+        # Assert: only the update that changed the rating runs the check
+        self.achievement_service.check_new_achievements.assert_called_once_with(1, frozenset({MOVIE_AVERAGE_CHANGED}))
+        self.assertEqual(self._histograms(), {(1, 3): 1})
+        self.assertEqual(self.stats_repo.find_mismatches(), [])
+
+if __name__ == '__main__':
+    unittest.main()
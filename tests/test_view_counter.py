@@ -0,0 +1,85 @@
+import unittest
+from unittest.mock import MagicMock, patch
+from sqlalchemy.orm import Session
+from service.ViewCounterBuffer import ViewCounterBuffer, ViewCountFlusher
+from repository.MovieRepository import MovieRepository
+
+class TestViewCounterBuffer(unittest.TestCase):
+
+    def test_increment_and_drain(self):
+        # Arrange
+        buffer = ViewCounterBuffer(shards=4)
+        for movie_id in (1, 1, 2, 5, 1):
+            buffer.increment(movie_id)
+
+        # Act
+        deltas = buffer.drain()
+
+        # Assert
+        self.assertEqual(deltas, {1: 3, 2: 1, 5: 1})
+        self.assertEqual(buffer.pending(), 0)
+        self.assertEqual(buffer.drain(), {})
+
+    def test_threshold_triggers_callback(self):
+        # Arrange
+        buffer = ViewCounterBuffer(shards=2, flush_threshold=4)
+        callback = MagicMock()
+        buffer.on_threshold = callback
+
+        # Act
+        buffer.increment(2)
+        buffer.increment(2)
+
+        # Assert
+        callback.assert_called_once()
+
+class TestViewCountFlusher(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.buffer = ViewCounterBuffer(shards=4)
+        self.mock_db = MagicMock(spec=Session)
+        self.flusher = ViewCountFlusher(self.buffer, lambda: self.mock_db, interval=60)
+
+    async def test_flush_writes_batched_deltas(self):
+        # Arrange
+        self.buffer.increment(3)
+        self.buffer.increment(3)
+        self.buffer.increment(1)
+
+        # Act
+        with patch.object(MovieRepository, "add_view_counts") as mock_add:
+            flushed = await self.flusher.flush()
+
+        # Assert
+        self.assertEqual(flushed, 2)
+        mock_add.assert_called_once_with({3: 2, 1: 1})
+        self.mock_db.commit.assert_called_once()
+        self.mock_db.close.assert_called_once()
+
+    async def test_stop_drains_buffer(self):
+        # Arrange
+        await self.flusher.start()
+        self.buffer.increment(7)
+
+        # Act
+        with patch.object(MovieRepository, "add_view_counts") as mock_add:
+            await self.flusher.stop()
+
+        # Assert
+        mock_add.assert_called_once_with({7: 1})
+        self.assertEqual(self.buffer.pending(), 0)
+
+    async def test_failed_flush_keeps_views(self):
+        # Arrange
+        self.buffer.increment(4)
+
+        # Act
+        with patch.object(MovieRepository, "add_view_counts", side_effect=RuntimeError("db down")):
+            with self.assertRaises(RuntimeError):
+                await self.flusher.flush()
+
+        # Assert
+        self.assertEqual(self.buffer.drain(), {4: 1})
+
+if __name__ == '__main__':
+    unittest.main()